@@ -1,18 +1,27 @@
 """AI Agent for contact management — Claude API + Tool Use."""
 
 import logging
+from collections import Counter
 from datetime import date
 
-import anthropic
-
-from sheets import get_all_contacts, get_valid_tags
-from sheets_entities import get_all_entities
+from cache import shared_cache
+from contact_index import DirectoryIndex
+from llm import llm
+from sheets import CACHE_TTL, contacts_cache_version, get_all_contacts, get_valid_tags
+from sheets_entities import entities_cache_version, get_all_entities
 
 logger = logging.getLogger(__name__)
 
 _ENTITY_TOOL_NAMES = frozenset({
     "add_entity", "update_entity", "delete_entity", "search_entity", "add_opp_to_entity"
 })
+_LOOKUP_TOOL_NAME = "lookup_records"
+
+# Retrieval: records put into the prompt per message, and lookup-tool limits
+CONTEXT_TOP_CONTACTS = 15
+CONTEXT_TOP_ENTITIES = 8
+LOOKUP_MAX_RESULTS = 20
+MAX_LOOKUP_ROUNDS = 3
 
 CONTACT_TOOLS = [
     {
@@ -192,97 +201,141 @@ CONTACT_TOOLS = [
             "required": ["name", "opp_title"],
         },
     },
+    {
+        "name": _LOOKUP_TOOL_NAME,
+        "description": (
+            "연락처/비즈니스 엔티티 기록을 조회합니다 (이름, 소속, 태그, 관심사 등 자유 검색어). "
+            "시스템 프롬프트의 '관련 기록'에 없는 대상은 이 툴로 먼저 조회하세요. "
+            "즉시 실행되며 결과는 사용자에게 표시되지 않습니다."
+        ),
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "query": {"type": "string", "description": "검색어"},
+                "kind": {"type": "string", "enum": ["contact", "entity", "any"]},
+                "limit": {"type": "integer", "description": f"최대 결과 수 (최대 {LOOKUP_MAX_RESULTS})"},
+            },
+            "required": ["query"],
+        },
+    },
 ]
 
 
-def _build_contacts_summary():
-    """Build a summary of all contacts for the system prompt."""
-    contacts = get_all_contacts()
-    if not contacts:
-        return "현재 등록된 연락처가 없습니다."
-
-    lines = ["## 등록된 연락처 목록"]
-    for c in contacts:
-        name_ko = c.get("name_ko", "")
-        name_en = c.get("name_en", "")
-        name_display = f"{name_ko} ({name_en})" if name_ko and name_en else (name_ko or name_en or c["name"])
-        display = f"{name_display}({c['employer']})" if c.get("employer") else name_display
-        parts = [display]
-        if c.get("title"):
-            parts.append(c["title"])
-        if c.get("contact_priority"):
-            parts.append(c["contact_priority"])
-        if c.get("follow_up_priority"):
-            parts.append(c["follow_up_priority"])
-        if c.get("last_contact"):
-            parts.append(f"최근연락: {c['last_contact']}")
-        if c.get("key_value_interest"):
-            parts.append(f"관심사: {c['key_value_interest']}")
-        if c.get("tag"):
-            parts.append(f"태그: {c['tag']}")
-        lines.append("- " + " | ".join(parts))
+def _format_contact(c):
+    """One prompt line for a contact."""
+    name_ko = c.get("name_ko", "")
+    name_en = c.get("name_en", "")
+    name_display = f"{name_ko} ({name_en})" if name_ko and name_en else (name_ko or name_en or c["name"])
+    display = f"{name_display}({c['employer']})" if c.get("employer") else name_display
+    parts = [display]
+    if c.get("title"):
+        parts.append(c["title"])
+    if c.get("contact_priority"):
+        parts.append(c["contact_priority"])
+    if c.get("follow_up_priority"):
+        parts.append(c["follow_up_priority"])
+    if c.get("last_contact"):
+        parts.append(f"최근연락: {c['last_contact']}")
+    if c.get("key_value_interest"):
+        parts.append(f"관심사: {c['key_value_interest']}")
+    if c.get("tag"):
+        parts.append(f"태그: {c['tag']}")
+    return "- " + " | ".join(parts)
+
+
+def _format_entity(e):
+    """One prompt line for a business entity."""
+    parts = [e["name"]]
+    if e.get("business_priority"):
+        parts.append(f"BP:{e['business_priority']}")
+    if e.get("follow_up_priority"):
+        parts.append(e["follow_up_priority"])
+    if e.get("follow_up_date"):
+        parts.append(f"FU일:{e['follow_up_date']}")
+    if e.get("tag"):
+        parts.append(f"태그:{e['tag']}")
+    if e.get("related_individuals"):
+        parts.append(f"관련:{e['related_individuals']}")
+    return "- " + " | ".join(parts)
+
+
+def _load_entities():
+    try:
+        return get_all_entities()
+    except Exception as e:
+        logger.warning("Entity load failed for contact agent: %s", e)
+        return []
+
 
+def _top_counts(values, limit):
+    counts = Counter(v for v in values if v)
+    return ", ".join(f"{k} {n}" for k, n in counts.most_common(limit)) or "(없음)"
+
+
+def _build_overview_summary():
+    """Aggregate stats over all contacts/entities (no per-record lines)."""
+    contacts = get_all_contacts()
+    entities = _load_entities()
+    tags = [t.strip() for c in contacts for t in (c.get("tag") or "").split(",")]
+    lines = [
+        f"## 연락처 현황 (전체 {len(contacts)}명)",
+        f"- 연락 우선순위: {_top_counts((c.get('contact_priority') for c in contacts), 12)}",
+        f"- Follow-up 우선순위: {_top_counts((c.get('follow_up_priority') for c in contacts), 6)}",
+        f"- 태그 상위: {_top_counts(tags, 15)}",
+        f"- 소속 상위: {_top_counts((c.get('employer') for c in contacts), 15)}",
+        "",
+        f"## 비즈니스 엔티티 현황 (전체 {len(entities)}건)",
+        f"- Business 우선순위: {_top_counts((e.get('business_priority') for e in entities), 6)}",
+        f"- Follow-up 우선순위: {_top_counts((e.get('follow_up_priority') for e in entities), 6)}",
+    ]
     return "\n".join(lines)
 
 
-def _build_entities_summary():
-    """Build a summary of all business entities for the system prompt."""
-    try:
-        entities = get_all_entities()
-    except Exception:
-        return "(엔티티 로드 실패)"
-
-    if not entities:
-        return "현재 등록된 비즈니스 엔티티가 없습니다."
-
-    lines = ["## 등록된 비즈니스 엔티티 목록"]
-    for e in entities:
-        parts = [e["name"]]
-        if e.get("business_priority"):
-            parts.append(f"BP:{e['business_priority']}")
-        if e.get("follow_up_priority"):
-            parts.append(e["follow_up_priority"])
-        if e.get("follow_up_date"):
-            parts.append(f"FU일:{e['follow_up_date']}")
-        if e.get("tag"):
-            parts.append(f"태그:{e['tag']}")
-        if e.get("related_individuals"):
-            parts.append(f"관련:{e['related_individuals']}")
-        lines.append("- " + " | ".join(parts))
+def _directory_index():
+    return DirectoryIndex.for_records(get_all_contacts(), _load_entities())
+
 
+def _retrieve_context(user_message, conversation_history):
+    """Top-K contacts/entities for this message, ranked against recent turns too."""
+    recent = " ".join(
+        m["content"] for m in conversation_history[-4:] if isinstance(m.get("content"), str)
+    )
+    index = _directory_index()
+    contacts = index.contacts.search(user_message, CONTEXT_TOP_CONTACTS, context=recent)
+    entities = index.entities.search(user_message, CONTEXT_TOP_ENTITIES, context=recent)
+    lines = ["## 관련 기록 (메시지와 관련도가 높은 순, 일부만 표시)", "### 연락처"]
+    lines += [_format_contact(c) for c, _ in contacts] or ["(관련 연락처 없음)"]
+    lines.append("### 비즈니스 엔티티")
+    lines += [_format_entity(e) for e, _ in entities] or ["(관련 엔티티 없음)"]
     return "\n".join(lines)
 
 
-def _build_system_prompt():
-    """Build the system prompt for the contact AI agent."""
-    contacts_summary = _build_contacts_summary()
-    entities_summary = _build_entities_summary()
+def _lookup_records(query, kind="any", limit=10):
+    """Execute the lookup_records tool; returns text for the tool_result."""
     try:
-        tags = get_valid_tags()
-        tags_str = ", ".join(tags) if tags else "(없음)"
-    except Exception:
-        tags_str = "(태그 로드 실패)"
+        limit = max(1, min(int(limit or 10), LOOKUP_MAX_RESULTS))
+    except (TypeError, ValueError):
+        limit = 10
+    index = _directory_index()
+    lines = []
+    if kind in ("contact", "any"):
+        lines += [_format_contact(c) for c, _ in index.contacts.search(query, limit)]
+    if kind in ("entity", "any"):
+        lines += [_format_entity(e) for e, _ in index.entities.search(query, limit)]
+    return "\n".join(lines) if lines else "일치하는 기록이 없습니다."
 
-    today_str = date.today().isoformat()
-
-    return f"""당신은 개인 연락처 및 비즈니스 기회 관리 AI 비서입니다.
 
-## 오늘 날짜
-{today_str}
-"오늘", "내일", "어제", "이번 주" 등 상대적 날짜 표현은 반드시 이 날짜를 기준으로 계산하세요.
+_STATIC_INSTRUCTIONS = """당신은 개인 연락처 및 비즈니스 기회 관리 AI 비서입니다.
 
 ## [ENTITY: CONTACTS]
 사용자의 개인 연락처를 관리하고, 만남/통화 기록을 정리하며, 정보를 검색하고 업데이트합니다.
 
-{contacts_summary}
-
 ## [ENTITY: BUSINESS OPPORTUNITIES]
 회사/기관 관계 및 비즈니스 딜/프로젝트를 관리합니다.
 
-{entities_summary}
-
-## 사용 가능한 태그
-{tags_str}
+## 연락처/엔티티 기록
+- 시스템 프롬프트에는 전체 현황 통계와, 사용자 메시지와 관련도가 높은 기록 일부만 포함됩니다.
+- 언급된 사람/회사가 '관련 기록'에 없으면 lookup_records 툴로 먼저 조회하세요. 조회 없이 "없는 연락처"라고 단정하지 마세요.
 
 ## 엔티티 판별 규칙
 - 사람 이름, 만남/통화/연락 → contact 툴 사용
@@ -339,6 +392,45 @@ def _build_system_prompt():
 항상 한국어로 응답하세요."""
 
 
+def _build_overview_block():
+    """Aggregate stats block, shared across workers per cache version.
+
+    Keyed on both sheet cache versions so it is rebuilt only after a write;
+    identical text across requests keeps the prompt-cache prefix stable.
+    """
+    key = f"{contacts_cache_version()}:{entities_cache_version()}"
+    return shared_cache.get_or_set("agent.overview", _build_overview_summary, CACHE_TTL, key=key)
+
+
+def _build_system_prompt(user_message="", conversation_history=()):
+    """Build the system prompt as cacheable blocks.
+
+    Order matters for prompt caching: static instructions, then the
+    contacts/entities overview (both with cache breakpoints), then the
+    per-request tail (today's date, tags, retrieved records), never cached.
+    """
+    try:
+        tags = get_valid_tags()
+        tags_str = ", ".join(tags) if tags else "(없음)"
+    except Exception:
+        tags_str = "(태그 로드 실패)"
+
+    today_str = date.today().isoformat()
+
+    return [
+        {"type": "text", "text": _STATIC_INSTRUCTIONS, "cache_control": {"type": "ephemeral"}},
+        {"type": "text", "text": _build_overview_block(), "cache_control": {"type": "ephemeral"}},
+        {"type": "text", "text": f"""## 오늘 날짜
+{today_str}
+"오늘", "내일", "어제", "이번 주" 등 상대적 날짜 표현은 반드시 이 날짜를 기준으로 계산하세요.
+
+## 사용 가능한 태그
+{tags_str}
+
+{_retrieve_context(user_message, list(conversation_history))}"""},
+    ]
+
+
 def _parse_tool_calls(response):
     """Extract text and action list from tool use response."""
     message_text = ""
@@ -347,41 +439,85 @@ def _parse_tool_calls(response):
         if block.type == "text":
             message_text += block.text
         elif block.type == "tool_use":
+            if block.name == _LOOKUP_TOOL_NAME:
+                continue  # answered server-side in _create_with_lookups
             entity_type = "business_entity" if block.name in _ENTITY_TOOL_NAMES else "contact"
             action = {"action": block.name, "entity_type": entity_type, **block.input}
             actions.append(action)
     return message_text.strip(), actions
 
 
-def chat_contact(user_message, conversation_history):
-    """Process a chat message with the contact AI agent.
+def _log_usage(response):
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return
+    logger.info(
+        "Contact agent tokens: input=%s cache_read=%s cache_write=%s output=%s",
+        usage.input_tokens,
+        getattr(usage, "cache_read_input_tokens", 0),
+        getattr(usage, "cache_creation_input_tokens", 0),
+        usage.output_tokens,
+    )
 
-    Args:
-        user_message: user's current message
-        conversation_history: list of {"role": ..., "content": ...}
 
-    Returns:
-        dict with keys:
-            message (str) — display text
-            actions (list) — parsed tool call items
-            raw (str) — full raw response content
-    """
-    system_prompt = _build_system_prompt()
+def _lookup_tool_uses(response):
+    """Tool calls to answer server-side, or None if the response needs the user."""
+    tool_uses = [b for b in response.content if b.type == "tool_use"]
+    if not tool_uses or any(b.name != _LOOKUP_TOOL_NAME for b in tool_uses):
+        return None
+    return tool_uses
+
+
+def _append_lookup_results(messages, response, tool_uses):
+    messages.append({"role": "assistant", "content": response.content})
+    messages.append({"role": "user", "content": [
+        {
+            "type": "tool_result",
+            "tool_use_id": b.id,
+            "content": _lookup_records(
+                b.input.get("query", ""), b.input.get("kind", "any"), b.input.get("limit", 10)
+            ),
+        }
+        for b in tool_uses
+    ]})
+
+
+def _create_with_lookups(messages, **kwargs):
+    """messages.create, answering lookup_records calls until the model stops using them.
 
+    Only responses whose tool calls are all lookups are continued; a response
+    that also proposes write actions is returned as-is for user confirmation.
+    """
+    messages = list(messages)
+    for _ in range(MAX_LOOKUP_ROUNDS):
+        response = llm.create(messages=messages, **kwargs)
+        _log_usage(response)
+        tool_uses = _lookup_tool_uses(response)
+        if tool_uses is None:
+            return response
+        _append_lookup_results(messages, response, tool_uses)
+    response = llm.create(messages=messages, **kwargs)
+    _log_usage(response)
+    return response
+
+
+def _agent_request(user_message, conversation_history):
+    """(messages, create kwargs) for one contact-agent turn."""
     messages = []
     for msg in conversation_history:
         messages.append({"role": msg["role"], "content": msg["content"]})
     messages.append({"role": "user", "content": user_message})
-
-    client = anthropic.Anthropic()
-    response = client.messages.create(
+    kwargs = dict(
         model="claude-sonnet-4-6",
         max_tokens=4096,
-        system=system_prompt,
+        system=_build_system_prompt(user_message, conversation_history),
         tools=CONTACT_TOOLS,
-        messages=messages,
     )
+    return messages, kwargs
+
 
+def _finish_turn(messages, kwargs, response):
+    """Parse the final response, retrying once if it promised buttons without a tool call."""
     message_text, actions = _parse_tool_calls(response)
 
     # If the AI mentions confirmation buttons but didn't actually use a tool,
@@ -392,13 +528,8 @@ def chat_contact(user_message, conversation_history):
         and "버튼" in message_text
     ):
         logger.warning("AI mentioned buttons but produced no tool call — retrying with tool_choice=any")
-        retry_response = client.messages.create(
-            model="claude-sonnet-4-6",
-            max_tokens=4096,
-            system=system_prompt,
-            tools=CONTACT_TOOLS,
-            tool_choice={"type": "any"},
-            messages=messages,
+        retry_response = _create_with_lookups(
+            messages, tool_choice={"type": "any"}, **kwargs
         )
         retry_text, retry_actions = _parse_tool_calls(retry_response)
         if retry_actions:
@@ -415,3 +546,46 @@ def chat_contact(user_message, conversation_history):
         "actions": actions,
         "raw": str(response.content),
     }
+
+
+def chat_contact(user_message, conversation_history):
+    """Process a chat message with the contact AI agent.
+
+    Args:
+        user_message: user's current message
+        conversation_history: list of {"role": ..., "content": ...}
+
+    Returns:
+        dict with keys:
+            message (str) — display text
+            actions (list) — parsed tool call items
+            raw (str) — full raw response content
+    """
+    messages, kwargs = _agent_request(user_message, conversation_history)
+    response = _create_with_lookups(messages, **kwargs)
+    return _finish_turn(messages, kwargs, response)
+
+
+def stream_chat_contact(user_message, conversation_history):
+    """Streaming variant of chat_contact.
+
+    Yields {"type": "text", "text"} as text arrives, {"type": "tool", "name"}
+    when a tool_use block completes, and finally {"type": "done", **result}
+    with the same result dict chat_contact returns (its message replaces the
+    streamed text, since lookups/retries may change it).
+    """
+    messages, kwargs = _agent_request(user_message, conversation_history)
+    for round_no in range(MAX_LOOKUP_ROUNDS + 1):
+        with llm.stream(messages=messages, **kwargs) as stream:
+            for event in stream:
+                if event.type == "text":
+                    yield {"type": "text", "text": event.text}
+                elif event.type == "content_block_stop" and event.content_block.type == "tool_use":
+                    yield {"type": "tool", "name": event.content_block.name}
+            response = stream.get_final_message()
+        _log_usage(response)
+        tool_uses = _lookup_tool_uses(response)
+        if tool_uses is None or round_no == MAX_LOOKUP_ROUNDS:
+            break
+        _append_lookup_results(messages, response, tool_uses)
+    yield {"type": "done", **_finish_turn(messages, kwargs, response)}
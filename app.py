@@ -2,8 +2,6 @@ import anthropic
 import logging
 import os
 import re
-import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import date, datetime, timedelta, timezone
 from functools import wraps
 from pathlib import Path
@@ -16,18 +14,32 @@ from dotenv import load_dotenv
 _env_path = Path(__file__).resolve().parent / ".env"
 if _env_path.exists():
     load_dotenv(_env_path)
-from flask import Flask, flash, jsonify, redirect, render_template, request, send_from_directory, session, url_for
+from flask import Flask, Response, flash, jsonify, redirect, render_template, request, send_file, send_from_directory, session, stream_with_context, url_for
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from flask_login import LoginManager, current_user, login_required, login_user, logout_user
 from flask_wtf.csrf import CSRFProtect, generate_csrf
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
 
 from config import Config
 import json
 
-from models import AnkiCard, AnkiDeck, Article, ChatMessage, Compliment, ContactChatMessage, InsightKeyword, LoginLog, MyBook, MyScreen, NewsInsight, NotificationPreference, PushSubscription, ReadArticle, Recommendation, SavedBook, SavedScreen, ScreenChatMessage, User, db, init_default_user
+from cache import shared_cache
+from chat_history import clear_summary, load_history
+import counters
+import goodreads_import
+import images
+import insights
+import library_stats
+import profiles
+import tmdb
+from llm import BACKGROUND, INTERACTIVE, llm
+from jobs import job_queue
+
+from models import AnkiCard, AnkiDeck, Article, ChatMessage, Compliment, ContactChatMessage, InsightKeyword, LoginLog, MyBook, MyScreen, NewsInsight, NotificationPreference, PushSubscription, ReadArticle, Recommendation, RecommendationSnapshot, SavedBook, SavedScreen, ScreenChatMessage, User, db, init_default_user
 from pywebpush import webpush, WebPushException
-from recommender import chat_recommendation, chat_screen_recommendation, generate_recommendations
+from recommender import chat_recommendation, chat_screen_recommendation, diff_snapshots, generate_recommendations, generate_topup_recommendations, library_snapshot, prune_recommendations, snapshot_fingerprint, stream_chat_recommendation, stream_chat_screen_recommendation
 import requests as http_requests
 from scraper import scrape_acdeeptech, scrape_ai_robotics_companies, scrape_aitimes, scrape_amazon_charts, scrape_deeplearning_batch, scrape_fieldai_news, scrape_geek_news_weekly, scrape_ifr_press_releases, scrape_irobotnews, scrape_mk_today, scrape_nyt_tech, scrape_robotreport, scrape_the_decoder, scrape_vention_press, scrape_wsj_ai, scrape_yes24_bestseller
 
@@ -52,6 +64,7 @@ csrf = CSRFProtect(app)
 
 app.config["SEND_FILE_MAX_AGE_DEFAULT"] = 86400  # 1 day for static files
 db.init_app(app)
+job_queue.init_app(app)
 
 
 def _client_ip_for_rate_limit():
@@ -94,20 +107,26 @@ def inject_push_config():
     return {'vapid_public_key': Config.VAPID_PUBLIC_KEY}
 
 
+@app.template_filter("proxied")
+def proxied_image(url, size="poster"):
+    """{{ poster_url|proxied('thumb') }} — serve a third-party image through /img."""
+    return images.proxy_url(url, size)
+
+
 PASSWORD_EXPIRY_DAYS = 30
 ADMIN_USERNAME = "tornadogrowth"
 
 HABITS = ["아침 조깅/테니스/골프 + 스트레칭/명상"]
 FAMILY_HABITS = ["아이와 놀기", "와이프 데이트"]
 
-# --- Dashboard Cache (60s TTL, date-keyed) ---
-_dashboard_cache = {"data": None, "ts": 0, "date_key": ""}
+# --- Dashboard Cache (60s TTL per widget, date-keyed, shared across workers) ---
 DASHBOARD_CACHE_TTL = 60
 
-def _invalidate_dashboard_cache():
-    _dashboard_cache["data"] = None
-    _dashboard_cache["ts"] = 0
-    _dashboard_cache["date_key"] = ""
+def _invalidate_dashboard_cache(*widgets):
+    """Drop the cached dashboard widgets given (all widgets if none given)."""
+    for name in widgets or DASHBOARD_WIDGETS:
+        shared_cache.invalidate(f"dashboard.{name}")
+
 _WEEKDAY_KO = ["월", "화", "수", "목", "금", "토", "일"]
 _KST = timezone(timedelta(hours=9))
 
@@ -224,81 +243,172 @@ def handle_rate_limit(_error):
 
 # --- Background Recommendation Regeneration ---
 
-def _regenerate_recommendations_background():
-    """Regenerate recommendations in a background thread."""
-    with app.app_context():
+NUM_RECOMMENDATIONS = 10
+REC_TOPUP_MAX_CHANGES = 5  # more added/changed books than this -> full regeneration
+REC_TOPUP_MIN = 3  # new books per top-up when the taste inputs changed
+REC_FULL_REFRESH_DAYS = 14  # top-ups only build on a full run this recent
+REC_DEBOUNCE_SECONDS = 45  # quiet period after the last library change
+REC_JOB_KEY = "recommendations"
+
+
+def _refresh_recommendations(books, priority=BACKGROUND, force=False):
+    """Bring the stored recommendations up to date with books.
+
+    The library is fingerprinted over the inputs the prompt is built from
+    (titles, shelves, ratings, hall-of-fame flags, years read). Unless force:
+    an unchanged fingerprint reuses the stored rows without an API call, and a
+    small change since a recent full run asks only for a few new books on top
+    of the still-valid ones.
+
+    The replacement is one transaction that starts by advancing the snapshot
+    version seen at the start; if another run replaced the recommendations in
+    the meantime, this run's result is dropped instead of interleaved.
+    Returns (mode, count), mode "cached"|"topup"|"full"|"superseded".
+    """
+    snapshot = library_snapshot(books)
+    fingerprint = snapshot_fingerprint(snapshot)
+    state = RecommendationSnapshot.query.first()
+    seen_version = state.version if state else None
+    current = Recommendation.query.order_by(Recommendation.id).all()
+    saved_books = SavedBook.query.all()
+
+    mode = "full"
+    if not force and state and current:
+        if state.fingerprint == fingerprint:
+            return "cached", len(current)
+        added, changed, _removed = diff_snapshots(json.loads(state.library or "{}"), snapshot)
+        recent = state.full_generated_at and (
+            datetime.utcnow() - state.full_generated_at < timedelta(days=REC_FULL_REFRESH_DAYS)
+        )
+        if recent and len(added) + len(changed) <= REC_TOPUP_MAX_CHANGES:
+            mode = "topup"
+
+    if mode == "topup":
+        # Drop recommendations the reader has since added to the library.
+        kept = prune_recommendations(current, books)
+        touched = [b for b in books if str(b.id) in added | changed]
+        new_recs = []
+        if touched or len(kept) < NUM_RECOMMENDATIONS:
+            count = max(REC_TOPUP_MIN if touched else 0, NUM_RECOMMENDATIONS - len(kept))
+            new_recs = generate_topup_recommendations(books, touched, kept, count, priority=priority,
+                                                      saved_books=saved_books)
+        recs = new_recs + [
+            {"title": r.title, "author": r.author, "reason": r.reason, "category": r.category}
+            for r in kept
+        ]
+        recs = recs[:NUM_RECOMMENDATIONS]
+    else:
+        recs = generate_recommendations(books, NUM_RECOMMENDATIONS, priority=priority,
+                                        saved_books=saved_books)
+
+    if not _advance_rec_snapshot(seen_version, fingerprint, snapshot, full=(mode == "full")):
+        db.session.rollback()
+        logger.info("Recommendation %s run superseded by a concurrent refresh", mode)
+        return "superseded", Recommendation.query.count()
+    Recommendation.query.delete()
+    for r in recs:
+        db.session.add(Recommendation(
+            title=r["title"],
+            author=r["author"],
+            reason=r["reason"],
+            category=r["category"],
+        ))
+    db.session.commit()
+    return mode, len(recs)
+
+
+def _advance_rec_snapshot(seen_version, fingerprint, snapshot, full):
+    """Move the snapshot row on from seen_version (None: no row yet). Does not commit.
+
+    A conditional UPDATE, so of two runs racing to replace the
+    recommendations exactly one gets True.
+    """
+    values = {
+        "fingerprint": fingerprint,
+        "library": json.dumps(snapshot, ensure_ascii=False),
+        "updated_at": datetime.utcnow(),
+    }
+    if full:
+        values["full_generated_at"] = datetime.utcnow()
+    if seen_version is None:
         try:
-            books = MyBook.query.all()
-            if not books:
-                return
-            recs = generate_recommendations(books)
-            Recommendation.query.delete()
-            for r in recs:
-                db.session.add(Recommendation(
-                    title=r["title"],
-                    author=r["author"],
-                    reason=r["reason"],
-                    category=r["category"],
-                ))
-            db.session.commit()
-            logger.info("Recommendations auto-regenerated (%d)", len(recs))
-        except Exception as e:
-            logger.error("Background recommendation regeneration failed: %s", e)
+            db.session.add(RecommendationSnapshot(id=1, version=1, **values))
+            db.session.flush()
+        except IntegrityError:
+            return False
+        return True
+    result = db.session.execute(
+        update(RecommendationSnapshot)
+        .where(RecommendationSnapshot.version == seen_version)
+        .values(version=RecommendationSnapshot.version + 1, **values)
+    )
+    return result.rowcount == 1
+
+
+def _regenerate_recommendations_background():
+    """Job body: refresh recommendations (runs on the job queue)."""
+    if job_queue.pending(REC_JOB_KEY):
+        # The library changed again after this run was queued; the follow-up
+        # run will see the newer state, so skip the API call here.
+        logger.info("Recommendation refresh superseded before it started")
+        return
+    books = MyBook.query.all()
+    if not books:
+        return
+    mode, count = _refresh_recommendations(books)
+    logger.info("Recommendations auto-refreshed: %s (%d)", mode, count)
 
 
 def auto_regenerate_recommendations():
-    """Trigger recommendation regeneration in a background thread (non-blocking)."""
-    thread = threading.Thread(target=_regenerate_recommendations_background, daemon=True)
-    thread.start()
+    """Schedule a recommendation refresh once library edits go quiet.
 
+    Debounced on the job queue: a burst of adds/ratings becomes one run
+    REC_DEBOUNCE_SECONDS after the last edit, and an edit during a run queues
+    a single follow-up instead of an overlapping run.
+    """
+    job_queue.debounce(REC_JOB_KEY, _regenerate_recommendations_background,
+                       delay=REC_DEBOUNCE_SECONDS)
 
-# --- Background Scraping ---
 
-def _scrape_background(source):
+def scheduled_check_recommendations():
+    """Start a debounced refresh whose timer was lost with its worker."""
     with app.app_context():
-        try:
-            count = run_scrape(source)
-            logger.info("Background scrape for %s: %d new articles", source, count)
-        except Exception as e:
-            logger.error("Background scrape failed for %s: %s", source, e)
+        job_queue.submit_due(REC_JOB_KEY, _regenerate_recommendations_background)
+
+
+# --- Background Scraping ---
+
+def _scrape_job(source):
+    count = run_scrape(source)
+    logger.info("Background scrape for %s: %d new articles", source, count)
 
 
-_auto_scrape_ts = {}
 _AUTO_SCRAPE_INTERVAL = 1800  # 30 minutes
 
 
 def auto_scrape(source):
-    """Trigger scraping in a background thread, throttled to once per 30 min per source."""
-    import time as _time
-    now = _time.time()
-    if now - _auto_scrape_ts.get(source, 0) < _AUTO_SCRAPE_INTERVAL:
-        return
-    _auto_scrape_ts[source] = now
-    thread = threading.Thread(target=_scrape_background, args=(source,), daemon=True)
-    thread.start()
+    """Queue a scrape for source, throttled to once per 30 min per source across workers."""
+    return job_queue.submit(f"scrape:{source}", _scrape_job, source,
+                            min_interval=_AUTO_SCRAPE_INTERVAL)
+
+
+def _auto_scrape_news_sources():
+    """Job body: queue throttled scrapes for every news source."""
+    queued = [src for src in NEWS_SOURCES if auto_scrape(src)]
+    if queued:
+        logger.info("Auto-scrape queued for: %s", ", ".join(queued))
 
 
 # --- Scheduler ---
 
+SCHEDULED_SCRAPE_SOURCES = NEWS_SOURCES + ["bestseller", "bestseller_kr"]
+
+
 def scheduled_scrape():
-    """Run scraping job within app context."""
+    """Queue a scrape for every source; leases keep workers from duplicating them."""
     with app.app_context():
-        run_scrape("mk")
-        run_scrape("irobot")
-        run_scrape("robotreport")
-        run_scrape("ai_robotics")
-        run_scrape("geek_weekly")
-        run_scrape("dl_batch")
-        run_scrape("the_decoder")
-        run_scrape("wsj_ai")
-        run_scrape("nyt_tech")
-        run_scrape("acdeeptech")
-        run_scrape("aitimes")
-        run_scrape("fieldai")
-        run_scrape("vention")
-        run_scrape("ifr_press")
-        run_scrape("bestseller")
-        run_scrape("bestseller_kr")
+        for source in SCHEDULED_SCRAPE_SOURCES:
+            job_queue.submit(f"scrape:{source}", _scrape_job, source)
 
 
 def run_scrape(source="mk"):
@@ -409,131 +519,24 @@ def run_scrape(source="mk"):
     return count
 
 
-def _generate_insight(keyword):
-    """Generate a structured insight for a keyword using Claude API with web search."""
-    try:
-        client = anthropic.Anthropic()
-        is_korean = bool(re.search(r'[가-힣]', keyword))
-        search_lang = "Search in Korean." if is_korean else "Search in English."
-        response = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=1500,
-            tools=[{"type": "web_search_20250305", "name": "web_search", "max_uses": 3}],
-            system=(
-                "You are a business intelligence analyst for a CEO. "
-                "Use web search to find recent news about the given keyword. "
-                f"{search_lang} "
-                "Write your analysis in Korean."
-            ),
-            messages=[{"role": "user", "content": (
-                f"키워드: {keyword}\n\n"
-                "이 키워드에 대한 최근 24시간의 주요 뉴스를 웹에서 검색하고 분석해주세요.\n\n"
-                "다음 형식으로 작성:\n"
-                "## 한줄 요약\n(이 키워드의 현재 상황을 한 문장으로)\n\n"
-                "## 주요 동향\n"
-                "- **[이슈명]**: 핵심 팩트 + 수치 (1-2문장)\n"
-                "- **[이슈명]**: 핵심 팩트 + 수치 (1-2문장)\n"
-                "- **[이슈명]**: 핵심 팩트 + 수치 (1-2문장)\n\n"
-                "## 액션 포인트\n"
-                "- 구체적 대응 방안 또는 모니터링 포인트 (1-2개)"
-            )}],
-        )
-
-        if response.stop_reason != "end_turn":
-            logger.warning(
-                "Insight for '%s' stopped with reason: %s",
-                keyword, response.stop_reason,
-            )
-
-        insight_text = ""
-        source_articles = []
-        seen_urls = set()
-
-        for block in response.content:
-            if block.type == "text":
-                insight_text += block.text
-                if hasattr(block, 'citations') and block.citations:
-                    for cite in block.citations:
-                        if hasattr(cite, 'url') and cite.url not in seen_urls:
-                            seen_urls.add(cite.url)
-                            source_articles.append({
-                                "title": getattr(cite, 'title', cite.url),
-                                "url": cite.url,
-                            })
-
-        insight_text = insight_text.strip()
-        logger.info(
-            "Insight tokens for '%s': input=%d, output=%d",
-            keyword, response.usage.input_tokens, response.usage.output_tokens,
-        )
-
-        if not insight_text:
-            logger.warning(
-                "Empty insight for '%s' (stop_reason=%s, blocks=%d)",
-                keyword, response.stop_reason, len(response.content),
-            )
-            return None, []
-        return insight_text, source_articles
-    except Exception as e:
-        logger.error("Failed to generate insight for '%s': %s", keyword, e)
-        return None, []
-
-
-_insight_status = {"running": False, "completed": [], "total": 0}
-
-
-def generate_all_insights():
-    """Generate insights for all tracked keywords (parallel)."""
-    global _insight_status
-    keywords = InsightKeyword.query.all()
-    if not keywords:
-        return
-    _insight_status = {"running": True, "completed": [], "total": len(keywords)}
-
-    def _process_keyword(kw_id, keyword_text):
-        """Worker: API call only, no DB access."""
-        insight_text, source_articles = _generate_insight(keyword_text)
-        return kw_id, keyword_text, insight_text, source_articles
-
-    max_workers = min(3, len(keywords))
-    try:
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = [
-                executor.submit(_process_keyword, kw.id, kw.keyword)
-                for kw in keywords
-            ]
-            for future in as_completed(futures):
-                try:
-                    kw_id, keyword_text, insight_text, source_articles = future.result()
-                except Exception as e:
-                    logger.error("Insight worker failed: %s", e)
-                    continue
-                if insight_text:
-                    insight = NewsInsight(
-                        keyword_id=kw_id,
-                        insight_text=insight_text,
-                        source_articles_json=json.dumps(source_articles, ensure_ascii=False),
-                    )
-                    db.session.add(insight)
-                    logger.info("Generated insight for '%s'", keyword_text)
-                else:
-                    logger.info("No insight generated for keyword '%s'", keyword_text)
-                _insight_status["completed"].append(kw_id)
+def scheduled_generate_insights():
+    """Queue the scheduled batch run; the lease keeps workers from starting it twice."""
+    with app.app_context():
+        job_queue.submit("insights:batch", insights.start_batch_run, lease_seconds=600)
 
-        db.session.commit()
-    finally:
-        _insight_status["running"] = False
 
-    # Cleanup: keep only last 30 days of insights
-    cutoff = datetime.now(timezone.utc) - timedelta(days=30)
-    NewsInsight.query.filter(NewsInsight.generated_at < cutoff).delete()
-    db.session.commit()
+INSIGHT_CHECK_MINUTES = 2
 
 
-def scheduled_generate_insights():
-    """Run insight generation within app context."""
+def scheduled_check_insight_runs():
+    """Keep the unfinished insight runs moving: poll the batch or resume the sync tasks."""
     with app.app_context():
-        generate_all_insights()
+        for run in insights.active_runs():
+            if run.mode == "batch":
+                job_queue.submit("insights:batch", insights.advance_batch_run, run.id, lease_seconds=600)
+            else:
+                # No-op while the run's job still holds its lease
+                job_queue.submit("insights", insights.run_sync, run.id, lease_seconds=1800)
 
 
 scheduler = BackgroundScheduler()
@@ -656,6 +659,21 @@ scheduler.add_job(
     id="daily_insights",
 )
 
+scheduler.add_job(
+    scheduled_check_insight_runs,
+    "interval",
+    minutes=INSIGHT_CHECK_MINUTES,
+    id="insight_run_check",
+)
+
+
+scheduler.add_job(
+    scheduled_check_recommendations,
+    "interval",
+    minutes=5,
+    id="recommendation_check",
+)
+
 
 def _prewarm_sheets_cache():
     """Pre-warm Google Sheets caches so page loads never block on API calls."""
@@ -669,6 +687,13 @@ def _prewarm_sheets_cache():
         get_all_entities()
     except Exception as e:
         logger.warning("Sheets prewarm (entities) failed: %s", e)
+    # Pick up edits made directly in the sheets
+    with app.app_context():
+        try:
+            _sync_sheet_counters()
+        except Exception as e:
+            db.session.rollback()
+            logger.warning("Sheets counter sync failed: %s", e)
 
 
 scheduler.add_job(
@@ -686,6 +711,26 @@ def service_worker():
     return send_from_directory("static", "sw.js", mimetype="application/javascript")
 
 
+@app.route("/img/<size>")
+@login_required
+def image_proxy(size):
+    """Resized, disk-cached copy of an allow-listed third-party image (see images.py)."""
+    url = request.args.get("u", "")
+    if size not in images.SIZES or not images.allowed(url):
+        return jsonify({"error": "지원하지 않는 이미지입니다."}), 404
+    found = images.get(url, size)
+    if found is None:
+        # Not on disk yet (now queued) or upstream failed — let the browser
+        # load the original this time; no-store so the next view asks again
+        resp = redirect(url)
+        resp.headers["Cache-Control"] = "no-store"
+        return resp
+    path, digest = found
+    resp = send_file(path, mimetype="image/webp", etag=digest, conditional=True)
+    resp.headers["Cache-Control"] = f"private, max-age={images.CACHE_MAX_AGE}, immutable"
+    return resp
+
+
 def _get_client_ip():
     """Get client IP, preferring X-Forwarded-For for reverse proxies."""
     forwarded = request.headers.get("X-Forwarded-For", "")
@@ -777,57 +822,52 @@ def change_password():
 @app.route("/")
 @login_required
 def index():
-    import time as _time
-    fresh = request.args.get("fresh") == "1"
-    if fresh:
+    if request.args.get("fresh") == "1":
         from sheets import invalidate_contacts_cache
         invalidate_contacts_cache()
         _invalidate_dashboard_cache()
+    # Shell only — landing.js loads each widget from api_dashboard_widget
+    return render_template("landing.html", **_dashboard_base_context())
+
+
+@app.route("/api/dashboard/widgets/<name>")
+@login_required
+def api_dashboard_widget(name):
+    """Render one dashboard widget's fragments (and any JS seed data) as JSON."""
+    if name not in DASHBOARD_WIDGETS:
+        return jsonify({"error": "Unknown widget"}), 404
+    ctx = {**_dashboard_base_context(), **_dashboard_widget(name)}
+    html = {
+        slot: render_template(f"_dashboard_{slot}.html", **ctx)
+        for slot in DASHBOARD_WIDGET_SLOTS[name]
+    }
+    data = {}
+    if name == "contacts":
+        data = {"contactSeed": ctx["top5"] + ctx["incoming"], "validTags": ctx["valid_tags"]}
+    elif name == "entities":
+        data = {"entitySeed": ctx["entity_top5"]}
+    return jsonify({"widget": name, "html": html, "data": data})
+
+
+def _dashboard_widget(name):
+    """Return one widget's context, cached per widget and keyed by KST date."""
+    return shared_cache.get_or_set(
+        f"dashboard.{name}", DASHBOARD_WIDGETS[name], DASHBOARD_CACHE_TTL,
+        key=_kst_today().isoformat(),
+    )
 
-    # Dashboard cache check
-    today_key = _kst_today().isoformat()
-    now = _time.time()
-    if (not fresh
-        and _dashboard_cache["data"] is not None
-        and _dashboard_cache["date_key"] == today_key
-        and (now - _dashboard_cache["ts"]) < DASHBOARD_CACHE_TTL):
-        return render_template("landing.html", **_dashboard_cache["data"])
-
-    ctx = _build_dashboard_context()
-    _dashboard_cache["data"] = ctx
-    _dashboard_cache["ts"] = _time.time()
-    _dashboard_cache["date_key"] = today_key
-    return render_template("landing.html", **ctx)
-
-
-def _build_dashboard_context():
-    """Build all template context for the dashboard landing page."""
-    from sqlalchemy import func as sa_func
-
-    try:
-        from sheets import get_all_contacts
-        from scoring import sort_contacts_by_score
-        contacts = sort_contacts_by_score(get_all_contacts())
-    except Exception:
-        contacts = []
-
-    try:
-        from sheets_entities import get_all_entities
-        from scoring import sort_entities_by_score
-        entities = sort_entities_by_score(get_all_entities())
-    except Exception:
-        entities = []
 
+def _dashboard_base_context():
     today = _kst_today()
-    today_str = today.isoformat()
+    return {
+        "today_str": today.strftime("%Y년 %m월 %d일"),
+        "today_str_iso": today.isoformat(),
+    }
 
-    # 최근 7일 일별 last_contact 집계
-    last_contact_counts = {}
-    for c in contacts:
-        lc = c.get("last_contact", "")
-        if lc:
-            last_contact_counts[lc] = last_contact_counts.get(lc, 0) + 1
 
+def _counter_stats(metric, today):
+    """7-day bars plus 4-week/52-week averages for one DailyCounter metric."""
+    daily = counters.daily_counts(metric, today - timedelta(days=6), today)
     weekly_stats = []
     for i in range(6, -1, -1):
         d = today - timedelta(days=i)
@@ -836,101 +876,37 @@ def _build_dashboard_context():
             "date": d_str,
             "label": d.strftime("%-m/%-d"),
             "weekday": _WEEKDAY_KO[d.weekday()],
-            "count": last_contact_counts.get(d_str, 0),
+            "count": daily.get(d_str, 0),
             "is_today": i == 0,
         })
-
-    weekly_total = sum(s["count"] for s in weekly_stats)
-    max_daily = max((s["count"] for s in weekly_stats), default=1) or 1
-    one_month_ago_str = (today - timedelta(days=28)).isoformat()
-    one_year_ago_str  = (today - timedelta(days=365)).isoformat()
-    contact_monthly_count = sum(v for k, v in last_contact_counts.items() if k >= one_month_ago_str)
-    contact_yearly_count  = sum(v for k, v in last_contact_counts.items() if k >= one_year_ago_str)
-    contact_monthly_avg = round(contact_monthly_count / 4, 1)
-    contact_yearly_avg  = round(contact_yearly_count / 52, 1)
-
-    # ReadArticle: SQL GROUP BY instead of .all() + Python loop
-    one_year_ago_dt = datetime.combine(
-        today - timedelta(days=365), datetime.min.time()
+    monthly_count, yearly_count = counters.window_totals(
+        metric, today - timedelta(days=28), today - timedelta(days=365)
     )
-    article_daily_counts = {}
-    try:
-        rows = db.session.query(
-            sa_func.date(ReadArticle.read_at),
-            sa_func.count(ReadArticle.id)
-        ).filter(
-            ReadArticle.read_at >= one_year_ago_dt
-        ).group_by(
-            sa_func.date(ReadArticle.read_at)
-        ).all()
-        for d_str, cnt in rows:
-            if d_str:
-                article_daily_counts[str(d_str)] = cnt
-    except Exception:
-        article_daily_counts = {}
-
-    article_weekly_stats = []
-    for i in range(6, -1, -1):
-        d = today - timedelta(days=i)
-        d_str = d.isoformat()
-        article_weekly_stats.append({
-            "date": d_str,
-            "label": d.strftime("%-m/%-d"),
-            "weekday": _WEEKDAY_KO[d.weekday()],
-            "count": article_daily_counts.get(d_str, 0),
-            "is_today": i == 0,
-        })
-
-    article_weekly_total = sum(s["count"] for s in article_weekly_stats)
-    article_max_daily = max((s["count"] for s in article_weekly_stats), default=1) or 1
-    article_monthly_count = sum(v for k, v in article_daily_counts.items() if k >= one_month_ago_str)
-    article_yearly_count  = sum(v for k, v in article_daily_counts.items() if k >= one_year_ago_str)
-    article_monthly_avg = round(article_monthly_count / 4, 1)
-    article_yearly_avg  = round(article_yearly_count / 52, 1)
-    article_today_count = article_weekly_stats[-1]["count"] if article_weekly_stats else 0
-
-    # Compliment: SQL GROUP BY instead of .all() + Python loop
-    compliment_daily_counts = {}
-    one_year_ago_date = today - timedelta(days=365)
+    return {
+        "weekly_stats": weekly_stats,
+        "weekly_total": sum(s["count"] for s in weekly_stats),
+        "max_daily": max((s["count"] for s in weekly_stats), default=1) or 1,
+        "today_count": weekly_stats[-1]["count"],
+        "monthly_count": monthly_count,
+        "yearly_count": yearly_count,
+        "monthly_avg": round(monthly_count / 4, 1),
+        "yearly_avg": round(yearly_count / 52, 1),
+    }
+
+
+def _widget_contacts():
     try:
-        rows = db.session.query(
-            Compliment.given_at,
-            sa_func.count(Compliment.id)
-        ).filter(
-            Compliment.given_at >= one_year_ago_date
-        ).group_by(
-            Compliment.given_at
-        ).all()
-        for given_at, cnt in rows:
-            if given_at:
-                compliment_daily_counts[given_at.isoformat()] = cnt
+        from sheets import get_all_contacts
+        from scoring import sort_contacts_by_score
+        contacts = sort_contacts_by_score(get_all_contacts())
     except Exception:
-        compliment_daily_counts = {}
-
-    compliment_weekly_stats = []
-    for i in range(6, -1, -1):
-        d = today - timedelta(days=i)
-        d_str = d.isoformat()
-        compliment_weekly_stats.append({
-            "date": d_str,
-            "label": d.strftime("%-m/%-d"),
-            "weekday": _WEEKDAY_KO[d.weekday()],
-            "count": compliment_daily_counts.get(d_str, 0),
-            "is_today": i == 0,
-        })
+        contacts = []
 
-    compliment_weekly_total = sum(s["count"] for s in compliment_weekly_stats)
-    compliment_max_daily = max((s["count"] for s in compliment_weekly_stats), default=1) or 1
-    compliment_monthly_count = sum(v for k, v in compliment_daily_counts.items() if k >= one_month_ago_str)
-    compliment_yearly_count  = sum(v for k, v in compliment_daily_counts.items() if k >= one_year_ago_str)
-    compliment_monthly_avg = round(compliment_monthly_count / 4, 1)
-    compliment_yearly_avg  = round(compliment_yearly_count / 52, 1)
-    compliment_today_count = compliment_weekly_stats[-1]["count"] if compliment_weekly_stats else 0
-    total_compliments = sum(compliment_daily_counts.values())
+    today = _kst_today()
+    today_str = today.isoformat()
 
-    total_contacts = len(contacts)
-    fu0_count = sum(1 for c in contacts if c.get("follow_up_priority") == "FU0")
-    overdue_count = sum(1 for c in contacts if c.get("follow_up_date", "") and c.get("follow_up_date", "") < today_str)
+    # 최근 7일 일별 last_contact 집계 (DailyCounter)
+    stats = _counter_stats(counters.CONTACT_LAST, today)
 
     eligible = [
         c for c in contacts
@@ -947,6 +923,43 @@ def _build_dashboard_context():
     _sort_key = lambda c: (-c.get("score", 0), c.get("follow_up_date", "9999-99-99"))
     top5 = sorted(overdue, key=_sort_key) + sorted(not_overdue, key=_sort_key)[:max(0, 5 - len(overdue))]
 
+    incoming = [
+        c for c in contacts
+        if "입사 후보자" in (c.get("key_value_interest") or "")
+        or "입사 후보자" in (c.get("tag") or "")
+    ]
+
+    try:
+        from sheets import get_valid_tags
+        valid_tags = get_valid_tags()
+    except Exception:
+        valid_tags = []
+
+    return dict(
+        top5=top5,
+        incoming=incoming,
+        total_contacts=len(contacts),
+        fu0_count=sum(1 for c in contacts if c.get("follow_up_priority") == "FU0"),
+        overdue_count=sum(1 for c in contacts if c.get("follow_up_date", "") and c.get("follow_up_date", "") < today_str),
+        weekly_stats=stats["weekly_stats"],
+        weekly_total=stats["weekly_total"],
+        max_daily=stats["max_daily"],
+        contact_monthly_avg=stats["monthly_avg"],
+        contact_yearly_avg=stats["yearly_avg"],
+        valid_tags=valid_tags,
+    )
+
+
+def _widget_entities():
+    try:
+        from sheets_entities import get_all_entities
+        from scoring import sort_entities_by_score
+        entities = sort_entities_by_score(get_all_entities())
+    except Exception:
+        entities = []
+
+    today = _kst_today()
+    today_str = today.isoformat()
     eligible_e = [e for e in entities if e.get("follow_up_priority") != "FU9"]
     overdue_e = [e for e in eligible_e if e.get("follow_up_date") and e["follow_up_date"] < today_str]
     not_overdue_e = [e for e in eligible_e if not (e.get("follow_up_date") and e["follow_up_date"] < today_str)]
@@ -958,69 +971,114 @@ def _build_dashboard_context():
             e["days_overdue"] = 0
     _esort = lambda e: (-e.get("score", 0), e.get("follow_up_date", "9999-99-99"))
     entity_top5 = sorted(overdue_e, key=_esort) + sorted(not_overdue_e, key=_esort)[:max(0, 5 - len(overdue_e))]
+    return dict(entity_top5=entity_top5)
 
-    incoming = [
-        c for c in contacts
-        if "입사 후보자" in (c.get("key_value_interest") or "")
-        or "입사 후보자" in (c.get("tag") or "")
-    ]
 
-    reading_books = MyBook.query.filter_by(shelf="reading").order_by(MyBook.added_at.desc()).all()
+def _widget_articles():
+    stats = _counter_stats(counters.ARTICLE_READ, _kst_today())
+    return dict(
+        article_weekly_stats=stats["weekly_stats"],
+        article_weekly_total=stats["weekly_total"],
+        article_max_daily=stats["max_daily"],
+        article_today_count=stats["today_count"],
+        article_monthly_avg=stats["monthly_avg"],
+        article_yearly_avg=stats["yearly_avg"],
+    )
 
-    # Habit stats: single pass over all habit rows
-    habit_date_sets = _build_habit_date_sets()
-    habits_data = [_habit_stats(h, logged_dates=habit_date_sets.get(h, set())) for h in HABITS]
-    family_stats = [_habit_stats(h, logged_dates=habit_date_sets.get(h, set())) for h in FAMILY_HABITS]
 
-    # Anki due widget: single query for both count and first card
-    anki_due_query = AnkiCard.query.filter(
-        AnkiCard.status == 'active',
-        AnkiCard.next_review <= today
-    ).order_by(AnkiCard.next_review.asc())
-    anki_due_cards = anki_due_query.all()
-    anki_due_count = len(anki_due_cards)
-    anki_first_card = anki_due_cards[0] if anki_due_cards else None
+def _widget_compliments():
+    stats = _counter_stats(counters.COMPLIMENT, _kst_today())
+    return dict(
+        compliment_weekly_stats=stats["weekly_stats"],
+        compliment_weekly_total=stats["weekly_total"],
+        compliment_max_daily=stats["max_daily"],
+        compliment_today_count=stats["today_count"],
+        total_compliments=stats["yearly_count"],
+        compliment_monthly_avg=stats["monthly_avg"],
+        compliment_yearly_avg=stats["yearly_avg"],
+    )
 
-    try:
-        from sheets import get_valid_tags
-        valid_tags = get_valid_tags()
-    except Exception:
-        valid_tags = []
 
+def _widget_habits():
+    # Logged days come from DailyCounter (synced from the Habit Log sheet)
+    return dict(
+        habits_data=[_habit_stats(h, logged_dates=counters.active_days(counters.habit_metric(h)))
+                     for h in HABITS],
+        family_stats=[_habit_stats(h, logged_dates=counters.active_days(counters.habit_metric(h)))
+                      for h in FAMILY_HABITS],
+    )
+
+
+def _widget_anki():
+    # Anki due widget: COUNT + LIMIT 1 on the (status, next_review) index
+    due_query = AnkiCard.query.filter(
+        AnkiCard.status == 'active',
+        AnkiCard.next_review <= _kst_today()
+    )
+    anki_due_count = due_query.count()
+    first = None
+    if anki_due_count:
+        first = (
+            due_query.with_entities(AnkiCard.front, AnkiCard.back)
+            .order_by(AnkiCard.next_review.asc())
+            .first()
+        )
     return dict(
-        top5=top5,
-        entity_top5=entity_top5,
-        incoming=incoming,
-        reading_books=reading_books,
-        weekly_stats=weekly_stats,
-        weekly_total=weekly_total,
-        max_daily=max_daily,
-        article_weekly_stats=article_weekly_stats,
-        article_weekly_total=article_weekly_total,
-        article_max_daily=article_max_daily,
-        article_today_count=article_today_count,
-        total_contacts=total_contacts,
-        fu0_count=fu0_count,
-        overdue_count=overdue_count,
-        habits_data=habits_data,
-        family_stats=family_stats,
-        today_str=today.strftime("%Y년 %m월 %d일"),
-        today_str_iso=today.isoformat(),
-        contact_monthly_avg=contact_monthly_avg,
-        contact_yearly_avg=contact_yearly_avg,
-        article_monthly_avg=article_monthly_avg,
-        article_yearly_avg=article_yearly_avg,
-        compliment_weekly_stats=compliment_weekly_stats,
-        compliment_weekly_total=compliment_weekly_total,
-        compliment_max_daily=compliment_max_daily,
-        compliment_today_count=compliment_today_count,
-        total_compliments=total_compliments,
-        compliment_monthly_avg=compliment_monthly_avg,
-        compliment_yearly_avg=compliment_yearly_avg,
         anki_due_count=anki_due_count,
-        anki_first_card=anki_first_card,
-        valid_tags=valid_tags,
+        anki_first_card={"front": first.front, "back": first.back} if first else None,
+    )
+
+
+def _widget_books():
+    # Plain dicts (not ORM rows) so the context can live in the shared cache
+    return dict(reading_books=[
+        {"title": b.title, "author": b.author, "added_at": b.added_at}
+        for b in MyBook.query.filter_by(shelf="reading").order_by(MyBook.added_at.desc()).all()
+    ])
+
+
+DASHBOARD_WIDGETS = {
+    "contacts": _widget_contacts,
+    "entities": _widget_entities,
+    "habits": _widget_habits,
+    "articles": _widget_articles,
+    "compliments": _widget_compliments,
+    "anki": _widget_anki,
+    "books": _widget_books,
+}
+
+# These widgets hold decrypted names — kept out of the shared cache file
+shared_cache.keep_local("dashboard.contacts", "dashboard.entities")
+
+# Template fragments (templates/_dashboard_<slot>.html) rendered per widget
+DASHBOARD_WIDGET_SLOTS = {
+    "contacts": ["contact_stats", "contact_top5", "contact_incoming"],
+    "entities": ["entity_top5"],
+    "habits": ["habits", "family"],
+    "articles": ["article_stats"],
+    "compliments": ["compliment_stats"],
+    "anki": ["anki"],
+    "books": ["reading_books"],
+}
+
+
+def _sync_sheet_counters():
+    """Reconcile Sheets-backed DailyCounter metrics (contacts, habits) with the sheets."""
+    from sheets import _get_all_habit_rows, get_all_contacts
+    changed = counters.sync_metric(
+        counters.CONTACT_LAST,
+        counters.count_by_day(c.get("last_contact", "") for c in get_all_contacts()),
     )
+    if changed:
+        _invalidate_dashboard_cache("contacts")
+    habit_dates = _build_habit_date_sets(_get_all_habit_rows())
+    habit_changed = 0
+    for habit in HABITS + FAMILY_HABITS:
+        habit_changed += counters.sync_metric(
+            counters.habit_metric(habit), counters.count_by_day(habit_dates.get(habit, ()))
+        )
+    if habit_changed:
+        _invalidate_dashboard_cache("habits")
 
 
 @app.route("/contacts")
@@ -1044,8 +1102,8 @@ def contact_chat():
 @app.route("/news")
 @login_required
 def daily_news():
-    for src in NEWS_SOURCES:
-        auto_scrape(src)
+    # One cheap lease check; the per-source throttling happens on the job queue.
+    job_queue.submit("scrape:auto", _auto_scrape_news_sources, min_interval=60)
 
     selected = request.args.get('source', '')
 
@@ -1142,24 +1200,7 @@ def bestsellers_kr():
 @app.route("/books")
 @login_required
 def my_books():
-    all_read = MyBook.query.filter_by(shelf="read").all()
-    total_read = len(all_read)
-    rated_books = [b for b in all_read if b.my_rating > 0]
-    avg_rating = sum(b.my_rating for b in rated_books) / len(rated_books) if rated_books else 0
-    # 연도별 통계
-    yearly = {}
-    for b in all_read:
-        if b.date_read and '/' in b.date_read:
-            year = b.date_read.split('/')[0]
-            if year.isdigit():
-                yearly[int(year)] = yearly.get(int(year), 0) + 1
-    yearly_stats = sorted(yearly.items(), reverse=True)
-    hall_of_fame_count = MyBook.query.filter_by(hall_of_fame=True).count()
-    return render_template("books.html",
-                           total_read=total_read,
-                           avg_rating=round(avg_rating, 1),
-                           yearly_stats=yearly_stats,
-                           hall_of_fame_count=hall_of_fame_count)
+    return render_template("books.html", **library_stats.get("books"))
 
 
 @app.route("/books/library")
@@ -1183,34 +1224,39 @@ def book_hall_of_fame():
     return render_template("book_hall_of_fame.html", books=books)
 
 
-@app.route("/api/books/search")
-@login_required
-def api_book_search():
-    q = request.args.get("q", "").strip()
-    if not q:
-        return jsonify({"results": []})
+BOOK_SEARCH_CACHE_TTL = 6 * 3600
+BOOK_SEARCH_MAX_RESULTS = 20
+BOOK_SEARCH_MIN_PREFIX = 3
+
+
+def _normalize_book_query(q):
+    return " ".join(q.lower().split())
+
+
+def _fetch_google_books(q):
+    """Google Books volumes search for the add-book wizard.
 
-    params = {"q": q, "maxResults": 20, "printType": "books"}
+    Returns {"results": result dicts, "total": the API's totalItems,
+    "text": per result, the lowercased text Google may have matched}.
+    """
+    params = {"q": q, "maxResults": BOOK_SEARCH_MAX_RESULTS, "printType": "books"}
     api_key = os.environ.get("GOOGLE_BOOKS_API_KEY")
     if api_key:
         params["key"] = api_key
-    try:
-        r = http_requests.get("https://www.googleapis.com/books/v1/volumes",
-                              params=params, timeout=10)
-        r.raise_for_status()
-        data = r.json()
-        items = data.get("items", [])
-    except Exception as e:
-        logger.error("Google Books API error: %s", e)
-        return jsonify({"results": [], "error": "처리 중 오류가 발생했습니다."})
+    r = http_requests.get("https://www.googleapis.com/books/v1/volumes",
+                          params=params, timeout=10)
+    r.raise_for_status()
+    data = r.json()
+    items = data.get("items", [])
 
     results = []
+    texts = []
     for item in items:
         info = item.get("volumeInfo", {})
         isbns = {i["type"]: i["identifier"] for i in info.get("industryIdentifiers", [])}
         pub_date = info.get("publishedDate", "")
         year = int(pub_date[:4]) if pub_date and pub_date[:4].isdigit() else 0
-        results.append({
+        result = {
             "title": info.get("title", ""),
             "author": ", ".join(info.get("authors", [])),
             "publisher": info.get("publisher", ""),
@@ -1219,8 +1265,73 @@ def api_book_search():
             "isbn13": isbns.get("ISBN_13", ""),
             "average_rating": info.get("averageRating", 0.0),
             "thumbnail": info.get("imageLinks", {}).get("thumbnail", ""),
-        })
-    return jsonify({"results": results})
+        }
+        results.append(result)
+        texts.append(" ".join([
+            result["title"], info.get("subtitle", ""), result["author"], result["publisher"],
+            result["isbn"], result["isbn13"], " ".join(info.get("categories", [])), info.get("description", ""),
+        ]).lower())
+    return {"results": results, "total": data.get("totalItems", len(results)), "text": texts}
+
+
+def _search_stem(term):
+    """term without a common English suffix, so narrowing errs toward keeping hits."""
+    for suffix in ("ing", "ed", "es", "s"):
+        if term.endswith(suffix) and len(term) - len(suffix) >= 3:
+            return term[:-len(suffix)]
+    return term
+
+
+def _book_search_from_prefix(query):
+    """Results for query narrowed from a cached shorter query, or None.
+
+    Google Books matches whole words, so only a prefix made of query's leading
+    words (query adds whole terms to it) has a result set containing query's.
+    Only a prefix result holding every match (totalItems == items returned) is
+    narrowed: a hit is kept if every term, suffix-stripped, appears in the text
+    Google matches on (title, subtitle, author, publisher, ISBN, categories,
+    description). Stemming there can't be mirrored exactly, so the narrowed
+    list errs toward keeping a hit rather than dropping one.
+    """
+    stems = [_search_stem(t) for t in query.split()]
+    for end in range(len(query) - 1, BOOK_SEARCH_MIN_PREFIX - 1, -1):
+        if query[end] != " ":
+            continue
+        cached = shared_cache.get("books.search", key=query[:end])
+        if cached is None:
+            continue
+        if cached["total"] != len(cached["results"]):
+            return None
+        narrowed = [r for r, text in zip(cached["results"], cached["text"]) if all(s in text for s in stems)]
+        return narrowed or None
+    return None
+
+
+@app.route("/api/books/search")
+@login_required
+def api_book_search():
+    """Google Books search for the add-book wizard.
+
+    Results are cached per normalized query across workers; concurrent misses
+    for the same query share one API call (shared_cache.get_or_set), and a
+    query extending a cached complete result set is answered from it.
+    """
+    q = _normalize_book_query(request.args.get("q", ""))
+    if not q:
+        return jsonify({"results": []})
+
+    cached = shared_cache.get("books.search", key=q)
+    results = cached["results"] if cached is not None else _book_search_from_prefix(q)
+    if results is None:
+        try:
+            results = shared_cache.get_or_set(
+                "books.search", lambda: _fetch_google_books(q), BOOK_SEARCH_CACHE_TTL, key=q
+            )["results"]
+        except Exception as e:
+            logger.error("Google Books API error: %s", e)
+            return jsonify({"results": [], "error": "처리 중 오류가 발생했습니다."})
+    # Thumbnails are display-only in the wizard, so they can go through the proxy
+    return jsonify({"results": [dict(r, thumbnail=images.proxy_url(r["thumbnail"])) for r in results]})
 
 
 @app.route("/books/library/add", methods=["POST"])
@@ -1261,6 +1372,52 @@ def book_add():
     return redirect(url_for("book_library"))
 
 
+@app.route("/api/books/import/goodreads", methods=["POST"])
+@login_required
+@limiter.limit("5 per minute")
+def api_books_import_goodreads():
+    """Import a Goodreads library export CSV, streaming progress as SSE.
+
+    Events: progress {processed, inserted, updated, skipped, percent} after
+    each committed chunk except the last, then done with the final totals, or
+    error. Recommendations are refreshed once at the end.
+    """
+    if request.content_length and request.content_length > goodreads_import.MAX_IMPORT_BYTES:
+        return jsonify({"error": "파일 크기는 20MB 이하여야 합니다."}), 400
+    f = request.files.get("file")
+    if f is None or not f.filename:
+        return jsonify({"error": "파일이 없습니다."}), 400
+
+    stream = f.stream
+    size = stream.seek(0, os.SEEK_END) or 1
+    stream.seek(0)
+    try:
+        reader = goodreads_import.open_export(stream)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def generate():
+        totals = None
+        try:
+            for latest in goodreads_import.import_rows(reader):
+                # One chunk behind, so the final totals go out once, as done
+                if totals is not None:
+                    yield _sse("progress", {**totals, "percent": percent})
+                totals, percent = latest, min(99, stream.tell() * 100 // size)
+        except Exception as e:
+            db.session.rollback()
+            logger.error("Goodreads import failed: %s", e, exc_info=True)
+            yield _sse("error", {"message": "처리 중 오류가 발생했습니다."})
+        else:
+            yield _sse("done", {**totals, "percent": 100})
+        finally:
+            # Earlier chunks are committed even if a later one failed
+            if totals and (totals["inserted"] or totals["updated"]):
+                auto_regenerate_recommendations()
+
+    return _sse_response(generate())
+
+
 @app.route("/books/recommendations")
 @login_required
 def book_recommendations():
@@ -1354,18 +1511,19 @@ def api_delete_keyword(keyword_id):
 @app.route("/api/insights/generate", methods=["POST"])
 @login_required
 def api_generate_insights():
-    def _bg():
-        with app.app_context():
-            generate_all_insights()
-    thread = threading.Thread(target=_bg, daemon=True)
-    thread.start()
+    run, created = insights.start_run("sync")
+    if run is None:
+        return jsonify({"status": "ok", "message": "추적 중인 키워드가 없습니다."})
+    if not created:
+        return jsonify({"status": "ok", "message": "인사이트 생성이 이미 진행 중입니다."})
+    job_queue.submit("insights", insights.run_sync, run.id, lease_seconds=1800)
     return jsonify({"status": "ok", "message": "인사이트 생성을 시작했습니다."})
 
 
 @app.route("/api/insights/status")
 @login_required
 def api_insight_status():
-    return jsonify(_insight_status)
+    return jsonify(insights.run_status())
 
 
 @app.route("/api/insights/keywords/<int:keyword_id>/history")
@@ -1395,6 +1553,13 @@ def api_keyword_history(keyword_id):
 
 # --- API Routes ---
 
+@app.route("/api/jobs")
+@login_required
+def api_job_status():
+    """Background job status across all workers (optional ?prefix=scrape:)."""
+    return jsonify({"jobs": job_queue.status(request.args.get("prefix", ""))})
+
+
 @app.route("/api/scrape/<source>", methods=["POST"])
 @login_required
 def api_scrape(source):
@@ -1412,9 +1577,10 @@ def mark_read(article_id):
         # Record URL as read before deleting
         if not ReadArticle.query.filter_by(url=article.url).first():
             db.session.add(ReadArticle(url=article.url))
+            counters.bump(counters.ARTICLE_READ, _kst_today())
         db.session.delete(article)
         db.session.commit()
-        _invalidate_dashboard_cache()
+        _invalidate_dashboard_cache("articles")
         return jsonify({"status": "ok"})
     return jsonify({"status": "not_found"}), 404
 
@@ -1431,13 +1597,17 @@ def mark_all_read(source):
             ReadArticle.url.in_(article_urls)
         ).with_entities(ReadArticle.url).all()}
     count = 0
+    added = 0
     for article in articles:
         if article.url not in existing_read:
             db.session.add(ReadArticle(url=article.url))
+            existing_read.add(article.url)
+            added += 1
         db.session.delete(article)
         count += 1
+    counters.bump(counters.ARTICLE_READ, _kst_today(), added)
     db.session.commit()
-    _invalidate_dashboard_cache()
+    _invalidate_dashboard_cache("articles")
     return jsonify({"status": "ok", "cleared": count})
 
 
@@ -1509,22 +1679,63 @@ def api_generate_recommendations():
     if not books:
         return jsonify({"status": "error", "message": "책이 없습니다. 먼저 라이브러리에 책을 추가해 주세요."}), 400
     try:
-        recs = generate_recommendations(books)
+        # The button asks for fresh picks, so always run a full generation.
+        _mode, count = _refresh_recommendations(books, priority=INTERACTIVE, force=True)
     except Exception as e:
+        db.session.rollback()
         logger.error("Recommendation generation failed: %s", e)
         return jsonify({"status": "error", "message": "처리 중 오류가 발생했습니다."}), 500
+    return jsonify({"status": "ok", "count": count})
 
-    # Replace all existing recommendations
-    Recommendation.query.delete()
-    for r in recs:
-        db.session.add(Recommendation(
-            title=r["title"],
-            author=r["author"],
-            reason=r["reason"],
-            category=r["category"],
-        ))
+
+def _sse(event, data):
+    """Format one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _sse_response(events):
+    return Response(
+        stream_with_context(events),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _save_rec_chat(model, user_message, result):
+    db.session.add(model(role="user", content=user_message))
+    recs_json = json.dumps(result.get("recommendations", []), ensure_ascii=False) if result.get("recommendations") else ""
+    db.session.add(model(role="assistant", content=result["message"], recommendations_json=recs_json))
     db.session.commit()
-    return jsonify({"status": "ok", "count": len(recs)})
+
+
+def _stream_rec_chat_response(model, user_message, events, enrich=None):
+    """SSE response relaying text/rec events, persisting the turn on done.
+
+    enrich(rec) is applied to each rec as it arrives; the enriched recs are
+    reused for the final message rather than looked up a second time.
+    """
+    def generate():
+        enriched = []
+        try:
+            for event in events:
+                if event["type"] == "text":
+                    yield _sse("text", {"text": event["text"]})
+                elif event["type"] == "rec":
+                    rec = event["rec"]
+                    if enrich:
+                        rec.update(enrich(rec))
+                    enriched.append(rec)
+                    yield _sse("rec", {"rec": rec})
+                elif event["type"] == "done":
+                    result = {"message": event["message"], "recommendations": enriched or event["recommendations"]}
+                    _save_rec_chat(model, user_message, result)
+                    yield _sse("done", result)
+        except Exception as e:
+            db.session.rollback()
+            logger.error("Chat recommendation stream failed: %s", e, exc_info=True)
+            yield _sse("error", {"message": "처리 중 오류가 발생했습니다."})
+
+    return _sse_response(generate())
 
 
 @app.route("/api/books/chat", methods=["POST"])
@@ -1535,33 +1746,38 @@ def api_books_chat():
         return jsonify({"status": "error", "message": "메시지를 입력해 주세요."}), 400
 
     user_message = data["message"].strip()
-    books = MyBook.query.all()
-    saved_books = SavedBook.query.all()
-
-    # Load conversation history from DB (last 50 messages for context window management)
-    db_messages = (
-        ChatMessage.query
-        .order_by(ChatMessage.created_at.desc())
-        .limit(50).all()
-    )
-    history = [{"role": m.role, "content": m.content} for m in reversed(db_messages)]
+    history = load_history("books", ChatMessage)
 
     try:
-        result = chat_recommendation(user_message, history, books, saved_books=saved_books)
+        result = chat_recommendation(
+            user_message, history, profiles.title_rows("books"),
+            saved_books=profiles.title_rows("saved_books"), context=profiles.chat_context("books"),
+        )
     except Exception as e:
         logger.error("Chat recommendation failed: %s", e)
         return jsonify({"status": "error", "message": "처리 중 오류가 발생했습니다."}), 500
 
-    # Persist user message
-    db.session.add(ChatMessage(role="user", content=user_message))
-    # Persist assistant message with recommendations JSON
-    recs_json = json.dumps(result.get("recommendations", []), ensure_ascii=False) if result.get("recommendations") else ""
-    db.session.add(ChatMessage(role="assistant", content=result["message"], recommendations_json=recs_json))
-    db.session.commit()
-
+    _save_rec_chat(ChatMessage, user_message, result)
     return jsonify(result)
 
 
+@app.route("/api/books/chat/stream", methods=["POST"])
+@login_required
+def api_books_chat_stream():
+    """SSE variant of /api/books/chat: text and rec events, then done."""
+    data = request.get_json()
+    if not data or not data.get("message", "").strip():
+        return jsonify({"status": "error", "message": "메시지를 입력해 주세요."}), 400
+
+    user_message = data["message"].strip()
+    events = stream_chat_recommendation(
+        user_message, load_history("books", ChatMessage),
+        profiles.title_rows("books"), saved_books=profiles.title_rows("saved_books"),
+        context=profiles.chat_context("books"),
+    )
+    return _stream_rec_chat_response(ChatMessage, user_message, events)
+
+
 @app.route("/api/books/chat/history", methods=["GET"])
 @login_required
 def api_chat_history():
@@ -1586,6 +1802,7 @@ def api_chat_history():
 def api_chat_clear():
     """Clear all chat history for a fresh conversation."""
     count = ChatMessage.query.delete()
+    clear_summary("books")
     db.session.commit()
     return jsonify({"status": "ok", "cleared": count})
 
@@ -1656,72 +1873,10 @@ def api_book_saved_to_reading(book_id):
 
 # --- My Screens Routes ---
 
-TMDB_BASE_URL = "https://api.themoviedb.org/3"
-TMDB_IMAGE_BASE = "https://image.tmdb.org/t/p/w500"
-
-
-def _tmdb_params(extra=None):
-    params = {"api_key": os.environ.get("TMDB_API_KEY", "")}
-    if extra:
-        params.update(extra)
-    return params
-
-
-def _tmdb_poster_url(poster_path):
-    if poster_path:
-        return f"{TMDB_IMAGE_BASE}{poster_path}"
-    return ""
-
-
-def _tmdb_enrich(title, media_type="movie"):
-    """Search TMDB for title and return {tmdb_id, tmdb_title, year, poster_url}. Returns {} on failure."""
-    api_key = os.environ.get("TMDB_API_KEY", "")
-    if not api_key or not title:
-        return {}
-    try:
-        endpoint = f"{TMDB_BASE_URL}/search/{'movie' if media_type == 'movie' else 'tv'}"
-        params = {"query": title, "language": "ko-KR", "include_adult": False, "api_key": api_key}
-        r = http_requests.get(endpoint, params=params, headers={"accept": "application/json"}, timeout=5)
-        if not r.ok:
-            return {}
-        items = r.json().get("results", [])
-        if not items:
-            return {}
-        item = items[0]
-        if media_type == "movie":
-            tmdb_title = item.get("title") or item.get("original_title", "")
-            year_str = item.get("release_date", "")
-        else:
-            tmdb_title = item.get("name") or item.get("original_name", "")
-            year_str = item.get("first_air_date", "")
-        return {
-            "tmdb_id": item.get("id"),
-            "tmdb_title": tmdb_title,
-            "year": int(year_str[:4]) if year_str and year_str[:4].isdigit() else None,
-            "poster_url": _tmdb_poster_url(item.get("poster_path", "")),
-        }
-    except Exception:
-        return {}
-
-
 @app.route("/screens")
 @login_required
 def my_screens():
-    watched = MyScreen.query.filter_by(shelf="watched").all()
-    total_watched = len(watched)
-    rated = [s for s in watched if s.my_rating > 0]
-    avg_rating = sum(s.my_rating for s in rated) / len(rated) if rated else 0
-    hall_of_fame_count = MyScreen.query.filter_by(hall_of_fame=True).count()
-    watching_count = MyScreen.query.filter_by(shelf="watching").count()
-    want_count = MyScreen.query.filter_by(shelf="want-to-watch").count()
-    return render_template(
-        "screens.html",
-        total_watched=total_watched,
-        avg_rating=round(avg_rating, 1),
-        hall_of_fame_count=hall_of_fame_count,
-        watching_count=watching_count,
-        want_count=want_count,
-    )
+    return render_template("screens.html", **library_stats.get("screens"))
 
 
 @app.route("/screens/library")
@@ -1766,53 +1921,15 @@ def api_screen_search():
     if not q:
         return jsonify({"results": []})
 
-    api_key = os.environ.get("TMDB_API_KEY", "")
-    if not api_key:
+    if not tmdb.api_key():
         return jsonify({"results": [], "error": "TMDB_API_KEY가 설정되지 않았습니다."})
 
-    params = {"query": q, "language": "ko-KR", "include_adult": False, "api_key": api_key}
-
-    if media_type == "movie":
-        endpoint = f"{TMDB_BASE_URL}/search/movie"
-    elif media_type == "tv":
-        endpoint = f"{TMDB_BASE_URL}/search/tv"
-    else:
-        endpoint = f"{TMDB_BASE_URL}/search/multi"
-
     try:
-        r = http_requests.get(endpoint, params=params, headers={"accept": "application/json"}, timeout=10)
-        r.raise_for_status()
-        data = r.json()
-        items = data.get("results", [])
+        results = tmdb.search(q, media_type)
     except Exception as e:
         logger.error("TMDB API error: %s", e)
         return jsonify({"results": [], "error": "처리 중 오류가 발생했습니다."})
 
-    results = []
-    for item in items:
-        mtype = item.get("media_type", media_type)
-        if mtype not in ("movie", "tv"):
-            continue
-        if mtype == "movie":
-            title = item.get("title") or item.get("original_title", "")
-            original_title = item.get("original_title", "")
-            year_str = item.get("release_date", "")
-        else:
-            title = item.get("name") or item.get("original_name", "")
-            original_title = item.get("original_name", "")
-            year_str = item.get("first_air_date", "")
-        year = int(year_str[:4]) if year_str and year_str[:4].isdigit() else 0
-        results.append({
-            "tmdb_id": item.get("id"),
-            "title": title,
-            "original_title": original_title,
-            "media_type": mtype,
-            "year": year,
-            "overview": item.get("overview", ""),
-            "tmdb_rating": item.get("vote_average", 0.0),
-            "poster_url": _tmdb_poster_url(item.get("poster_path", "")),
-        })
-
     return jsonify({"results": results[:20]})
 
 
@@ -1920,33 +2037,45 @@ def api_screens_chat():
         return jsonify({"status": "error", "message": "메시지를 입력해 주세요."}), 400
 
     user_message = data["message"].strip()
-    screens = MyScreen.query.all()
-    saved_screens = SavedScreen.query.all()
-
-    db_messages = (
-        ScreenChatMessage.query
-        .order_by(ScreenChatMessage.created_at.desc())
-        .limit(50).all()
-    )
-    history = [{"role": m.role, "content": m.content} for m in reversed(db_messages)]
+    history = load_history("screens", ScreenChatMessage)
 
     try:
-        result = chat_screen_recommendation(user_message, history, screens, saved_screens=saved_screens)
+        result = chat_screen_recommendation(
+            user_message, history, profiles.title_rows("screens"),
+            saved_screens=profiles.title_rows("saved_screens"), context=profiles.chat_context("screens"),
+        )
     except Exception as e:
         logger.error("Screen chat recommendation failed: %s", e)
         return jsonify({"status": "error", "message": "처리 중 오류가 발생했습니다."}), 500
 
-    for rec in result.get("recommendations", []):
-        rec.update(_tmdb_enrich(rec["title"], rec.get("media_type", "movie")))
-
-    db.session.add(ScreenChatMessage(role="user", content=user_message))
-    recs_json = json.dumps(result.get("recommendations", []), ensure_ascii=False) if result.get("recommendations") else ""
-    db.session.add(ScreenChatMessage(role="assistant", content=result["message"], recommendations_json=recs_json))
-    db.session.commit()
+    recs = result.get("recommendations", [])
+    for rec, extra in zip(recs, tmdb.enrich_many([(r["title"], r.get("media_type", "movie")) for r in recs])):
+        rec.update(extra)
 
+    _save_rec_chat(ScreenChatMessage, user_message, result)
     return jsonify(result)
 
 
+@app.route("/api/screens/chat/stream", methods=["POST"])
+@login_required
+def api_screens_chat_stream():
+    """SSE variant of /api/screens/chat; each rec is TMDB-enriched as it arrives."""
+    data = request.get_json()
+    if not data or not data.get("message", "").strip():
+        return jsonify({"status": "error", "message": "메시지를 입력해 주세요."}), 400
+
+    user_message = data["message"].strip()
+    events = stream_chat_screen_recommendation(
+        user_message, load_history("screens", ScreenChatMessage),
+        profiles.title_rows("screens"), saved_screens=profiles.title_rows("saved_screens"),
+        context=profiles.chat_context("screens"),
+    )
+    return _stream_rec_chat_response(
+        ScreenChatMessage, user_message, events,
+        enrich=lambda rec: tmdb.enrich(rec["title"], rec.get("media_type", "movie")),
+    )
+
+
 @app.route("/api/screens/chat/history", methods=["GET"])
 @login_required
 def api_screen_chat_history():
@@ -1969,6 +2098,7 @@ def api_screen_chat_history():
 @login_required
 def api_screen_chat_clear():
     count = ScreenChatMessage.query.delete()
+    clear_summary("screens")
     db.session.commit()
     return jsonify({"status": "ok", "cleared": count})
 
@@ -2014,53 +2144,24 @@ def api_screen_saved_to_watching(screen_id):
     display_title = saved.tmdb_title or saved.title
 
     extra = {}
-    api_key = os.environ.get("TMDB_API_KEY", "")
-    if api_key:
-        try:
-            if saved.tmdb_id:
-                # Direct fetch by ID — exact match, no ambiguity
-                mtype = "movie" if media_type == "movie" else "tv"
-                endpoint = f"{TMDB_BASE_URL}/{mtype}/{saved.tmdb_id}"
-                params = _tmdb_params({"language": "ko-KR"})
-                r = http_requests.get(endpoint, params=params, headers={"accept": "application/json"}, timeout=5)
-                if r.ok:
-                    item = r.json()
-                    if media_type == "movie":
-                        fetched_title = item.get("title") or item.get("original_title", "")
-                        year_str = item.get("release_date", "")
-                    else:
-                        fetched_title = item.get("name") or item.get("original_name", "")
-                        year_str = item.get("first_air_date", "")
-                    if fetched_title:
-                        display_title = fetched_title
-                    extra = {
-                        "tmdb_id": item.get("id"),
-                        "original_title": item.get("original_title") or item.get("original_name", ""),
-                        "year": int(year_str[:4]) if year_str and year_str[:4].isdigit() else 0,
-                        "poster_url": _tmdb_poster_url(item.get("poster_path", "")),
-                        "overview": item.get("overview", ""),
-                        "tmdb_rating": item.get("vote_average", 0.0),
-                    }
-            else:
-                # Fallback: search by title (legacy — no tmdb_id stored)
-                endpoint = f"{TMDB_BASE_URL}/search/{'movie' if media_type == 'movie' else 'tv'}"
-                params = _tmdb_params({"query": saved.title, "language": "ko-KR", "include_adult": False})
-                r = http_requests.get(endpoint, params=params, headers={"accept": "application/json"}, timeout=5)
-                if r.ok:
-                    items = r.json().get("results", [])
-                    if items:
-                        item = items[0]
-                        year_str = item.get("release_date" if media_type == "movie" else "first_air_date", "")
-                        extra = {
-                            "tmdb_id": item.get("id"),
-                            "original_title": item.get("original_title") or item.get("original_name", ""),
-                            "year": int(year_str[:4]) if year_str and year_str[:4].isdigit() else 0,
-                            "poster_url": _tmdb_poster_url(item.get("poster_path", "")),
-                            "overview": item.get("overview", ""),
-                            "tmdb_rating": item.get("vote_average", 0.0),
-                        }
-        except Exception:
-            pass
+    if saved.tmdb_id:
+        # Direct lookup by ID — exact match, no ambiguity
+        record = tmdb.details(media_type, saved.tmdb_id)
+        if record and record["title"]:
+            display_title = record["title"]
+    else:
+        # Fallback: search by title (legacy — no tmdb_id stored)
+        hit = tmdb.enrich(saved.title, media_type)
+        record = tmdb.details(media_type, hit["tmdb_id"]) if hit else None
+    if record:
+        extra = {
+            "tmdb_id": record["tmdb_id"],
+            "original_title": record["original_title"],
+            "year": record["year"],
+            "poster_url": record["poster_url"],
+            "overview": record["overview"],
+            "tmdb_rating": record["tmdb_rating"],
+        }
 
     screen = MyScreen(title=display_title, media_type=media_type, shelf="watching", **extra)
     db.session.add(screen)
@@ -2098,8 +2199,9 @@ def api_add_compliment():
         return jsonify({"error": "invalid given_at date"}), 400
     c = Compliment(recipient=recipient, content=content, given_at=given_at)
     db.session.add(c)
+    counters.bump(counters.COMPLIMENT, given_at)
     db.session.commit()
-    _invalidate_dashboard_cache()
+    _invalidate_dashboard_cache("compliments")
     return jsonify({"id": c.id, "recipient": c.recipient, "content": c.content, "given_at": c.given_at.isoformat()}), 201
 
 
@@ -2109,9 +2211,10 @@ def api_delete_compliment(compliment_id):
     c = db.session.get(Compliment, compliment_id)
     if not c:
         return jsonify({"error": "not found"}), 404
+    counters.bump(counters.COMPLIMENT, c.given_at, -1)
     db.session.delete(c)
     db.session.commit()
-    _invalidate_dashboard_cache()
+    _invalidate_dashboard_cache("compliments")
     return jsonify({"ok": True})
 
 
@@ -2134,12 +2237,17 @@ def api_toggle_habit():
         target_date = _kst_today()
     if is_habit_logged(habit_name, target_date):
         delete_habit_log(habit_name, target_date)
+        counters.bump(counters.habit_metric(habit_name), target_date, -1)
         action = "undone"
     else:
         add_habit_log(habit_name, target_date)
+        counters.bump(counters.habit_metric(habit_name), target_date)
         action = "done"
-    _invalidate_dashboard_cache()
-    return jsonify({"action": action, **_habit_stats(habit_name)})
+    db.session.commit()
+    _invalidate_dashboard_cache("habits")
+    return jsonify({"action": action, **_habit_stats(
+        habit_name, logged_dates=counters.active_days(counters.habit_metric(habit_name))
+    )})
 
 
 # --- Entity API ---
@@ -2347,6 +2455,29 @@ def api_get_contacts():
         return jsonify({"error": "처리 중 오류가 발생했습니다."}), 500
 
 
+def _contact_last_before(name_hmac, fields):
+    """Current last_contact of a contact about to be updated ("" if not needed)."""
+    if "last_contact" not in fields:
+        return ""
+    from sheets import find_contact_by_hmac
+    contact = find_contact_by_hmac(name_hmac)
+    return (contact or {}).get("last_contact", "")
+
+
+def _bump_contact_last(old_value, new_value):
+    """Move one contact's last_contact between days in the DailyCounter table."""
+    if (old_value or "") == (new_value or ""):
+        return
+    try:
+        counters.bump(counters.CONTACT_LAST, old_value, -1)
+        counters.bump(counters.CONTACT_LAST, new_value)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.warning("contact_last counter update failed: %s", e)
+    _invalidate_dashboard_cache("contacts")
+
+
 @app.route("/api/contacts", methods=["POST"])
 @login_required
 def api_add_contact():
@@ -2365,6 +2496,7 @@ def api_add_contact():
             return jsonify({"error": "Validation failed", "errors": errors}), 400
 
         name_hmac = add_contact(data)
+        _bump_contact_last("", data.get("last_contact", ""))
         return jsonify({"success": True, "name_hmac": name_hmac})
     except Exception as e:
         logger.error("Failed to add contact: %s", e)
@@ -2388,9 +2520,12 @@ def api_update_contact(name_hmac):
         if not is_valid:
             return jsonify({"error": "Validation failed", "errors": errors}), 400
 
+        old_last = _contact_last_before(name_hmac, data)
         success, _ = update_contact(name_hmac, data)
         if not success:
             return jsonify({"error": "Contact not found"}), 404
+        if "last_contact" in data:
+            _bump_contact_last(old_last, data["last_contact"])
         return jsonify({"success": True})
     except Exception as e:
         logger.error("Failed to update contact: %s", e)
@@ -2430,8 +2565,7 @@ def api_scan_card():
 
     try:
         image_b64 = base64.standard_b64encode(file_bytes).decode("utf-8")
-        client = anthropic.Anthropic()
-        response = client.messages.create(
+        response = llm.create(
             model="claude-haiku-4-5-20251001",
             max_tokens=700,
             messages=[{
@@ -2587,166 +2721,169 @@ def api_add_tag():
 
 # --- Contact Chat API ---
 
-@app.route("/api/chat", methods=["POST"])
-@login_required
-def api_contact_chat():
-    """Process a chat message with the contact AI agent."""
-    try:
-        from ai_agent import chat_contact
-        from sheets import (
-            add_contact, add_interaction_log, find_contact_by_name,
-            update_contact, get_valid_tags,
-        )
-        from validation import validate_update_fields
+def _contact_chat_input():
+    """(user_message, error_response) for a contact chat POST."""
+    data = request.get_json() or {}
+    user_message = data.get("message", "").strip()
+    if not user_message:
+        return None, (jsonify({"error": "Message required"}), 400)
+    if len(user_message) < 2 or len(user_message) > 2000:
+        return None, (jsonify({"error": "메시지는 2자 이상 2000자 이하로 입력해 주세요."}), 400)
+    return user_message, None
 
-        data = request.get_json()
-        user_message = data.get("message", "").strip()
-        if not user_message:
-            return jsonify({"error": "Message required"}), 400
-        if len(user_message) < 2 or len(user_message) > 2000:
-            return jsonify({"error": "메시지는 2자 이상 2000자 이하로 입력해 주세요."}), 400
-
-        # Get conversation history from DB
-        history_msgs = (
-            ContactChatMessage.query
-            .order_by(ContactChatMessage.created_at.desc())
-            .limit(50).all()
-        )
-        conversation_history = [
-            {"role": m.role, "content": m.content} for m in reversed(history_msgs)
-        ]
 
-        # Call AI agent
-        result = chat_contact(user_message, conversation_history)
-
-        # Process actions
-        executed_actions = []
-        pending_actions = []
-
-        for action in result.get("actions", []):
-            action_type = action.get("action", "")
-            entity_type = action.get("entity_type", "contact")
-            name = action.get("name", "")
-
-            # --- Business Entity & Opportunity actions ---
-            if entity_type == "business_entity":
-                # search_entity는 읽기 전용 — 항상 실행
-                if action_type == "search_entity":
-                    from sheets_entities import find_entity_by_name
-                    matches = find_entity_by_name(name) if name else []
-                    executed_actions.append({
-                        "type": "search_entity",
-                        "name": name,
-                        "results": matches,
-                    })
-
-                # add_entity — 항상 사용자 확인 필요
-                elif action_type == "add_entity":
-                    pending_actions.append({**action, "reason": "새 비즈니스 엔티티 추가 — 확인 후 실행"})
-
-                # Entity CRUD — 모두 pending
-                elif action_type in ("update_entity", "delete_entity"):
-                    from sheets_entities import find_entity_by_name
-                    matches = find_entity_by_name(name)
-                    if len(matches) == 1:
-                        pending_actions.append({**action, "reason": "확인이 필요합니다"})
-                    else:
-                        pending_actions.append({**action, "reason": "엔티티를 찾을 수 없음"})
-
-                # Opportunity CRUD — 모두 pending
-                elif action_type == "add_opp_to_entity":
-                    from sheets_entities import find_entity_by_name
-                    matches = find_entity_by_name(name)
-                    opp_title = action.get("opp_title", "")
-                    if len(matches) == 1 and opp_title:
-                        pending_actions.append({**action, "reason": "확인이 필요합니다"})
-                    else:
-                        reason = "기회 제목(opp_title) 누락" if not opp_title else "엔티티를 찾을 수 없음"
-                        pending_actions.append({**action, "reason": reason})
-
-                elif action_type in ("update_opp", "delete_opp"):
-                    from sheets_entities import find_entity_by_name
-                    matches = find_entity_by_name(name)
-                    opp_id = action.get("opp_id", "")
-                    if len(matches) == 1 and opp_id:
-                        pending_actions.append({**action, "reason": "확인이 필요합니다"})
-                    else:
-                        pending_actions.append({**action, "reason": "엔티티 또는 opp_id를 찾을 수 없음"})
+def _process_contact_actions(result):
+    """Run read-only actions and queue write actions for confirmation.
 
-                else:
-                    logger.warning("Unknown business_entity action: %s", action_type)
-                    pending_actions.append({**action, "reason": "알 수 없는 액션"})
+    Returns (executed_actions, pending_actions).
+    """
+    from sheets import find_contact_by_name
+
+    # Process actions
+    executed_actions = []
+    pending_actions = []
 
-                continue  # business_entity 처리 완료 → contact 블록 skip
+    for action in result.get("actions", []):
+        action_type = action.get("action", "")
+        entity_type = action.get("entity_type", "contact")
+        name = action.get("name", "")
 
-            # --- Contact actions (READ-ONLY: search) ---
-            if action_type == "search":
-                matches = find_contact_by_name(name) if name else []
+        # --- Business Entity & Opportunity actions ---
+        if entity_type == "business_entity":
+            # search_entity는 읽기 전용 — 항상 실행
+            if action_type == "search_entity":
+                from sheets_entities import find_entity_by_name
+                matches = find_entity_by_name(name) if name else []
                 executed_actions.append({
-                    "type": "search",
+                    "type": "search_entity",
                     "name": name,
                     "results": matches,
                 })
-                continue
 
-            # --- Contact write actions (always pending) ---
-            if action_type == "update_contact":
-                matches = find_contact_by_name(name)
+            # add_entity — 항상 사용자 확인 필요
+            elif action_type == "add_entity":
+                pending_actions.append({**action, "reason": "새 비즈니스 엔티티 추가 — 확인 후 실행"})
+
+            # Entity CRUD — 모두 pending
+            elif action_type in ("update_entity", "delete_entity"):
+                from sheets_entities import find_entity_by_name
+                matches = find_entity_by_name(name)
                 if len(matches) == 1:
-                    contact = matches[0]
-                    current_values = {
-                        k: contact[k] for k in action.get("fields", {}) if contact.get(k)
-                    }
-                    pending_actions.append({
-                        **action,
-                        "reason": "확인이 필요합니다",
-                        "current_values": current_values,
-                    })
-                elif len(matches) > 1:
-                    pending_actions.append({
-                        **action,
-                        "reason": "동명이인 발견",
-                        "candidates": [
-                            {"name": m["name"], "employer": m.get("employer", ""), "name_hmac": m["name_hmac"]}
-                            for m in matches
-                        ],
-                    })
+                    pending_actions.append({**action, "reason": "확인이 필요합니다"})
                 else:
-                    executed_actions.append({"type": "not_found", "name": name, "reason": "연락처를 찾을 수 없음"})
+                    pending_actions.append({**action, "reason": "엔티티를 찾을 수 없음"})
 
-            elif action_type == "add_contact":
-                pending_actions.append({**action, "reason": "새 연락처 추가 — 확인 후 실행"})
+            # Opportunity CRUD — 모두 pending
+            elif action_type == "add_opp_to_entity":
+                from sheets_entities import find_entity_by_name
+                matches = find_entity_by_name(name)
+                opp_title = action.get("opp_title", "")
+                if len(matches) == 1 and opp_title:
+                    pending_actions.append({**action, "reason": "확인이 필요합니다"})
+                else:
+                    reason = "기회 제목(opp_title) 누락" if not opp_title else "엔티티를 찾을 수 없음"
+                    pending_actions.append({**action, "reason": reason})
 
-            elif action_type == "delete_contact":
-                matches = find_contact_by_name(name)
-                if len(matches) == 0:
-                    executed_actions.append({"type": "not_found", "name": name, "reason": "연락처를 찾을 수 없음"})
-                elif len(matches) == 1:
-                    pending_actions.append({**action, "reason": "삭제를 확인해 주세요"})
+            elif action_type in ("update_opp", "delete_opp"):
+                from sheets_entities import find_entity_by_name
+                matches = find_entity_by_name(name)
+                opp_id = action.get("opp_id", "")
+                if len(matches) == 1 and opp_id:
+                    pending_actions.append({**action, "reason": "확인이 필요합니다"})
                 else:
-                    pending_actions.append({
-                        **action,
-                        "reason": "동명이인 발견",
-                        "candidates": [
-                            {"name": m["name"], "employer": m.get("employer", ""), "name_hmac": m["name_hmac"]}
-                            for m in matches
-                        ],
-                    })
+                    pending_actions.append({**action, "reason": "엔티티 또는 opp_id를 찾을 수 없음"})
 
             else:
-                logger.warning("Unknown contact action: %s", action_type)
+                logger.warning("Unknown business_entity action: %s", action_type)
                 pending_actions.append({**action, "reason": "알 수 없는 액션"})
 
-        # Save messages to DB
-        user_msg = ContactChatMessage(role="user", content=user_message)
-        assistant_msg = ContactChatMessage(
-            role="assistant",
-            content=result["message"],
-            actions_json=json.dumps(result.get("actions", []), ensure_ascii=False),
-        )
-        db.session.add(user_msg)
-        db.session.add(assistant_msg)
-        db.session.commit()
+            continue  # business_entity 처리 완료 → contact 블록 skip
+
+        # --- Contact actions (READ-ONLY: search) ---
+        if action_type == "search":
+            matches = find_contact_by_name(name) if name else []
+            executed_actions.append({
+                "type": "search",
+                "name": name,
+                "results": matches,
+            })
+            continue
+
+        # --- Contact write actions (always pending) ---
+        if action_type == "update_contact":
+            matches = find_contact_by_name(name)
+            if len(matches) == 1:
+                contact = matches[0]
+                current_values = {
+                    k: contact[k] for k in action.get("fields", {}) if contact.get(k)
+                }
+                pending_actions.append({
+                    **action,
+                    "reason": "확인이 필요합니다",
+                    "current_values": current_values,
+                })
+            elif len(matches) > 1:
+                pending_actions.append({
+                    **action,
+                    "reason": "동명이인 발견",
+                    "candidates": [
+                        {"name": m["name"], "employer": m.get("employer", ""), "name_hmac": m["name_hmac"]}
+                        for m in matches
+                    ],
+                })
+            else:
+                executed_actions.append({"type": "not_found", "name": name, "reason": "연락처를 찾을 수 없음"})
+
+        elif action_type == "add_contact":
+            pending_actions.append({**action, "reason": "새 연락처 추가 — 확인 후 실행"})
+
+        elif action_type == "delete_contact":
+            matches = find_contact_by_name(name)
+            if len(matches) == 0:
+                executed_actions.append({"type": "not_found", "name": name, "reason": "연락처를 찾을 수 없음"})
+            elif len(matches) == 1:
+                pending_actions.append({**action, "reason": "삭제를 확인해 주세요"})
+            else:
+                pending_actions.append({
+                    **action,
+                    "reason": "동명이인 발견",
+                    "candidates": [
+                        {"name": m["name"], "employer": m.get("employer", ""), "name_hmac": m["name_hmac"]}
+                        for m in matches
+                    ],
+                })
+
+        else:
+            logger.warning("Unknown contact action: %s", action_type)
+            pending_actions.append({**action, "reason": "알 수 없는 액션"})
+
+    return executed_actions, pending_actions
+
+
+def _save_contact_chat(user_message, result):
+    db.session.add(ContactChatMessage(role="user", content=user_message))
+    db.session.add(ContactChatMessage(
+        role="assistant",
+        content=result["message"],
+        actions_json=json.dumps(result.get("actions", []), ensure_ascii=False),
+    ))
+    db.session.commit()
+
+
+@app.route("/api/chat", methods=["POST"])
+@login_required
+def api_contact_chat():
+    """Process a chat message with the contact AI agent."""
+    try:
+        from ai_agent import chat_contact
+
+        user_message, error = _contact_chat_input()
+        if error:
+            return error
+
+        result = chat_contact(user_message, load_history("contacts", ContactChatMessage))
+        executed_actions, pending_actions = _process_contact_actions(result)
+        _save_contact_chat(user_message, result)
 
         return jsonify({
             "message": result["message"],
@@ -2759,6 +2896,40 @@ def api_contact_chat():
         return jsonify({"error": "처리 중 오류가 발생했습니다."}), 500
 
 
+@app.route("/api/chat/stream", methods=["POST"])
+@login_required
+def api_contact_chat_stream():
+    """SSE variant of /api/chat: text deltas, then a done event with actions."""
+    from ai_agent import stream_chat_contact
+
+    user_message, error = _contact_chat_input()
+    if error:
+        return error
+    history = load_history("contacts", ContactChatMessage)
+
+    def generate():
+        try:
+            for event in stream_chat_contact(user_message, history):
+                data = {k: v for k, v in event.items() if k != "type"}
+                if event["type"] != "done":
+                    yield _sse(event["type"], data)
+                    continue
+                result = data
+                executed_actions, pending_actions = _process_contact_actions(result)
+                _save_contact_chat(user_message, result)
+                yield _sse("done", {
+                    "message": result["message"],
+                    "executed_actions": executed_actions,
+                    "pending_actions": pending_actions,
+                })
+        except Exception as e:
+            db.session.rollback()
+            logger.error("Contact chat stream error: %s", e, exc_info=True)
+            yield _sse("error", {"message": "처리 중 오류가 발생했습니다."})
+
+    return _sse_response(generate())
+
+
 @app.route("/api/chat/confirm", methods=["POST"])
 @login_required
 def api_contact_chat_confirm():
@@ -2796,7 +2967,10 @@ def api_contact_chat_confirm():
             if not is_valid:
                 return jsonify({"error": "Validation failed", "errors": errors}), 400
 
+            old_last = _contact_last_before(name_hmac, fields)
             update_contact(name_hmac, fields, changed_by="AI")
+            if "last_contact" in fields:
+                _bump_contact_last(old_last, fields["last_contact"])
 
             interaction_log = action.get("interaction_log", "")
             if interaction_log:
@@ -2824,6 +2998,7 @@ def api_contact_chat_confirm():
             fields = action.get("fields", {})
             new_contact = {"name": name, **fields}
             name_hmac = add_contact(new_contact)
+            _bump_contact_last("", new_contact.get("last_contact", ""))
             return jsonify({"success": True, "type": "add", "name_hmac": name_hmac})
 
         elif action_type == "delete_contact":
@@ -2961,6 +3136,7 @@ def api_contact_chat_history():
 def api_contact_chat_clear():
     """Clear contact chat history."""
     ContactChatMessage.query.delete()
+    clear_summary("contacts")
     db.session.commit()
     return jsonify({"success": True})
 
@@ -3162,11 +3338,22 @@ def clear_read_history(keyword):
     entries = ReadArticle.query.filter(ReadArticle.url.contains(keyword)).all()
     count = len(entries)
     for e in entries:
+        if e.read_at:
+            counters.bump(counters.ARTICLE_READ, counters.kst_day(e.read_at), -1)
         db.session.delete(e)
     db.session.commit()
+    _invalidate_dashboard_cache("articles")
     return jsonify({"status": "ok", "cleared": count, "keyword": keyword})
 
 
+@app.route("/api/admin/llm-stats")
+@login_required
+@admin_required
+def api_llm_stats():
+    """Connection reuse of this worker's shared Anthropic client."""
+    return jsonify(llm.connection_stats())
+
+
 # --- Anki SRS ---
 
 def _apply_srs_review(card, rating):
@@ -3202,27 +3389,32 @@ def _apply_srs_review(card, rating):
 @login_required
 def anki_hub():
     today = date.today()
-    due_count = AnkiCard.query.filter(
-        AnkiCard.status == 'active',
-        AnkiCard.next_review <= today
-    ).count()
-    total_active = AnkiCard.query.filter_by(status='active').count()
-    total_archived = AnkiCard.query.filter_by(status='archived').count()
     decks = AnkiDeck.query.order_by(AnkiDeck.created_at.desc()).all()
 
-    from sqlalchemy import func as sa_func
-    active_counts = dict(
-        db.session.query(AnkiCard.deck_id, sa_func.count(AnkiCard.id))
-        .filter_by(status='active')
-        .group_by(AnkiCard.deck_id)
-        .all()
+    # All card counts in one grouped query: (deck, status) -> total, due
+    from sqlalchemy import case, func as sa_func
+    is_due = case(
+        ((AnkiCard.status == 'active') & (AnkiCard.next_review <= today), 1),
+        else_=0,
     )
-    due_counts = dict(
-        db.session.query(AnkiCard.deck_id, sa_func.count(AnkiCard.id))
-        .filter(AnkiCard.status == 'active', AnkiCard.next_review <= today)
-        .group_by(AnkiCard.deck_id)
+    rows = (
+        db.session.query(
+            AnkiCard.deck_id, AnkiCard.status,
+            sa_func.count(AnkiCard.id), sa_func.sum(is_due),
+        )
+        .group_by(AnkiCard.deck_id, AnkiCard.status)
         .all()
     )
+    active_counts, due_counts = {}, {}
+    total_archived = 0
+    for deck_id, status, count, due in rows:
+        if status == 'active':
+            active_counts[deck_id] = count
+            due_counts[deck_id] = int(due or 0)
+        elif status == 'archived':
+            total_archived += count
+    total_active = sum(active_counts.values())
+    due_count = sum(due_counts.values())
     deck_stats = [
         {'deck': deck, 'active_count': active_counts.get(deck.id, 0),
          'due_count': due_counts.get(deck.id, 0)}
@@ -3580,6 +3772,10 @@ with app.app_context():
         if "position" not in ik_columns:
             conn.execute(sqlalchemy.text("ALTER TABLE insight_keyword ADD COLUMN position INTEGER DEFAULT 0"))
             conn.commit()
+        ni_columns = [r[1] for r in conn.execute(sqlalchemy.text("PRAGMA table_info(news_insight)"))]
+        if "news_fingerprint" not in ni_columns:
+            conn.execute(sqlalchemy.text("ALTER TABLE news_insight ADD COLUMN news_fingerprint VARCHAR(64) DEFAULT ''"))
+            conn.commit()
     # Migrate: create login_log table if missing
     from sqlalchemy import inspect as sa_inspect
     inspector = sa_inspect(db.engine)
@@ -3597,6 +3793,7 @@ with app.app_context():
         conn.execute(sqlalchemy.text("CREATE INDEX IF NOT EXISTS ix_article_url ON article(url)"))
         conn.execute(sqlalchemy.text("CREATE INDEX IF NOT EXISTS ix_article_source_scraped ON article(source, scraped_at)"))
         conn.execute(sqlalchemy.text("CREATE INDEX IF NOT EXISTS ix_anki_card_deck_id ON anki_card(deck_id)"))
+        conn.execute(sqlalchemy.text("CREATE INDEX IF NOT EXISTS ix_anki_card_status_next_review ON anki_card(status, next_review)"))
         conn.execute(sqlalchemy.text("CREATE INDEX IF NOT EXISTS ix_news_insight_keyword_id ON news_insight(keyword_id)"))
         conn.commit()
 
@@ -3629,6 +3826,10 @@ with app.app_context():
         db.session.commit()
         app.logger.info(f"Backfilled date_read for {len(books_no_date)} books")
 
+    # One-time: build dashboard DailyCounter rows for reads/compliments
+    counters.backfill_db_metrics()
+    profiles.ensure_rows()
+
 scheduler.start()
 
 # --- Contact List Startup Tasks ---
@@ -3666,6 +3867,11 @@ def _run_contact_startup_tasks():
             logger.info("Auto-upgraded %d entities' follow-up priority", len(upgraded_entities))
     except Exception as e:
         logger.warning("Contact startup tasks failed (sheets may not be configured): %s", e)
+    try:
+        _sync_sheet_counters()
+    except Exception as e:
+        db.session.rollback()
+        logger.warning("Sheets counter sync failed: %s", e)
 
 with app.app_context():
     _run_contact_startup_tasks()
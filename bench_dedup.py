@@ -0,0 +1,124 @@
+"""Benchmark recommender.LibraryIndex duplicate lookups on a synthetic library.
+
+Usage:
+    python bench_dedup.py [--titles 5000] [--queries 20000] [--seed 7]
+
+Builds a library of English and Korean titles (with subtitles, bracketed
+translations and shared authors), then times contains() for a mix of exact
+hits, edition/subtitle variants, near-misses and unrelated titles.
+"""
+
+import argparse
+import random
+import statistics
+import time
+from types import SimpleNamespace
+
+from recommender import LibraryIndex
+
+_COMMON = "of the and in a to for my your how why what".split()
+_SYLLABLES = [o + v + c for o in ("", "b", "c", "d", "f", "g", "h", "l", "m", "n", "p", "r", "s", "t", "v",
+                                   "w", "br", "ch", "cr", "fl", "gr", "pl", "sh", "st", "th", "tr")
+              for v in ("a", "e", "i", "o", "u", "ea", "ou", "ai") for c in ("", "", "n", "r", "s", "t", "ng")]
+_KO_SYLLABLES = [chr(0xAC00 + i) for i in range(0, 11172, 7)]  # every 7th Hangul syllable
+
+
+def _vocabulary(rng, size, syllables, min_len, max_len, sep=""):
+    words = set()
+    while len(words) < size:
+        words.add(sep.join(rng.choice(syllables) for _ in range(rng.randint(min_len, max_len))))
+    words = sorted(words)
+    rng.shuffle(words)
+    return words
+
+
+_FIRST = "James Mary Min-jun Ji-woo Hiroshi Elena Daniel Sofia Han Yuval Kim Lee".split()
+_LAST = [f"Author{i}" for i in range(600)]
+
+
+def _words(rng, vocab, n):
+    # Skewed: 40% of words come from the 300 most common
+    return [rng.choice(vocab[:300]) if rng.random() < 0.4 else rng.choice(vocab) for _ in range(n)]
+
+
+def _title(rng, en, ko):
+    if rng.random() < 0.25:
+        title = " ".join(_words(rng, ko, rng.randint(1, 3)))
+        if rng.random() < 0.3:
+            title += f" ({' '.join(_words(rng, en, 3)).title()})"
+        return title
+    words = _words(rng, en, rng.randint(1, 4))
+    if len(words) > 2 and rng.random() < 0.5:
+        words.insert(1, rng.choice(_COMMON))
+    title = " ".join(words).title()
+    if rng.random() < 0.3:
+        title = "The " + title
+    if rng.random() < 0.3:
+        title += ": " + " ".join(_words(rng, en, rng.randint(2, 4))).title()
+    return title
+
+
+def _variant(rng, title):
+    """An edition-style variant: dropped subtitle, typo, punctuation or suffix."""
+    kind = rng.randrange(4)
+    if kind == 0 and ":" in title:
+        return title.split(":")[0]
+    if kind == 1 and len(title) > 10:
+        i = rng.randrange(1, len(title) - 1)
+        return title[:i] + title[i + 1:]
+    if kind == 2:
+        return title.replace(" ", ", ", 1)
+    return title + " (Anniversary Edition)"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--titles", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    en = _vocabulary(rng, 6000, _SYLLABLES, 1, 3)
+    ko = _vocabulary(rng, 3000, _KO_SYLLABLES, 2, 3)
+    library = [
+        SimpleNamespace(title=_title(rng, en, ko), author=f"{rng.choice(_FIRST)} {rng.choice(_LAST)}")
+        for _ in range(args.titles)
+    ]
+
+    started = time.perf_counter()
+    index = LibraryIndex(library)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    queries = []
+    for _ in range(args.queries):
+        book = rng.choice(library)
+        roll = rng.random()
+        if roll < 0.25:
+            queries.append((book.title, book.author))
+        elif roll < 0.5:
+            queries.append((_variant(rng, book.title), book.author))
+        elif roll < 0.75:
+            queries.append((_variant(rng, book.title), f"{rng.choice(_FIRST)} {rng.choice(_LAST)}"))
+        else:
+            queries.append((_title(rng, en, ko), f"{rng.choice(_FIRST)} {rng.choice(_LAST)}"))
+
+    timings = []
+    hits = 0
+    for title, author in queries:
+        t0 = time.perf_counter()
+        hits += index.contains(title, author)
+        timings.append((time.perf_counter() - t0) * 1e6)
+
+    timings.sort()
+    print(f"library: {args.titles} titles, index built in {build_ms:.1f} ms")
+    print(f"lookups: {len(queries)}, duplicates found: {hits}")
+    print(
+        f"per lookup (us): mean {statistics.fmean(timings):.1f}, "
+        f"p50 {timings[len(timings) // 2]:.1f}, "
+        f"p99 {timings[int(len(timings) * 0.99)]:.1f}, max {timings[-1]:.1f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+"""Shared cache with pluggable backends and versioned, cross-worker invalidation.
+
+Values live under a namespace (e.g. "sheets.contacts"). Each namespace has a
+version number; invalidating a namespace bumps its version, which orphans every
+key written under the old version in every worker at once.
+
+Backends (CACHE_BACKEND env):
+    sqlite  — default. A small SQLite file shared by all gunicorn workers on the
+              host (CACHE_PATH, default instance/cache.db). Values are pickled.
+    memory  — per-process dict (single worker / local development).
+
+Namespaces registered with keep_local() (decrypted contact data) never reach
+the backend: their values stay in each worker's memory and only their version
+numbers are shared, so invalidation still crosses workers but no plaintext is
+written to disk.
+"""
+
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_PATH = os.path.join(os.path.abspath(os.path.dirname(__file__)), "instance", "cache.db")
+
+
+class MemoryBackend:
+    """Process-local backend. Invalidation is only visible inside this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions = {}
+        self._entries = {}
+        self._fill_locks = {}
+
+    def get_version(self, namespace):
+        return self._versions.get(namespace, 0)
+
+    def bump_version(self, namespace):
+        with self._lock:
+            self._versions[namespace] = self._versions.get(namespace, 0) + 1
+            stale = [k for k in self._entries if k.startswith(f"{namespace}:")]
+            for k in stale:
+                del self._entries[k]
+            return self._versions[namespace]
+
+    def drop_entries(self, namespace):
+        with self._lock:
+            for k in [k for k in self._entries if k.startswith(f"{namespace}:")]:
+                del self._entries[k]
+
+    def get(self, full_key):
+        hit = self._entries.get(full_key)
+        if hit and hit[0] > time.time():
+            return True, hit[1], hit[0]
+        return False, None, 0
+
+    def set(self, full_key, value, expires_at):
+        now = time.time()
+        with self._lock:
+            self._entries[full_key] = (expires_at, value)
+            for k in [k for k, (until, _) in self._entries.items() if until <= now]:
+                del self._entries[k]
+
+    def drop_other_versions(self, namespace, version):
+        """Drop namespace's entries written under any version but version."""
+        keep = f"{namespace}:{version}:"
+        with self._lock:
+            stale = [k for k in self._entries if k.startswith(f"{namespace}:") and not k.startswith(keep)]
+            for k in stale:
+                del self._entries[k]
+
+    def try_lock(self, name, ttl):
+        now = time.time()
+        with self._lock:
+            if self._fill_locks.get(name, 0) > now:
+                return False
+            self._fill_locks[name] = now + ttl
+            return True
+
+    def unlock(self, name):
+        self._fill_locks.pop(name, None)
+
+
+class SQLiteBackend:
+    """Host-wide backend on a shared SQLite file (one connection per thread)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = self._conn()
+        conn.executescript(
+            "CREATE TABLE IF NOT EXISTS cache_version (namespace TEXT PRIMARY KEY, version INTEGER NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS cache_entry (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS cache_lock (name TEXT PRIMARY KEY, expires_at REAL NOT NULL);"
+        )
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get_version(self, namespace):
+        row = self._conn().execute(
+            "SELECT version FROM cache_version WHERE namespace = ?", (namespace,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def bump_version(self, namespace):
+        conn = self._conn()
+        conn.execute(
+            "INSERT INTO cache_version (namespace, version) VALUES (?, 1) "
+            "ON CONFLICT(namespace) DO UPDATE SET version = version + 1",
+            (namespace,),
+        )
+        conn.execute("DELETE FROM cache_entry WHERE key LIKE ?", (f"{namespace}:%",))
+        return self.get_version(namespace)
+
+    def drop_entries(self, namespace):
+        self._conn().execute("DELETE FROM cache_entry WHERE key LIKE ?", (f"{namespace}:%",))
+
+    def get(self, full_key):
+        row = self._conn().execute(
+            "SELECT value, expires_at FROM cache_entry WHERE key = ? AND expires_at > ?",
+            (full_key, time.time()),
+        ).fetchone()
+        if row is None:
+            return False, None, 0
+        return True, pickle.loads(row[0]), row[1]
+
+    def set(self, full_key, value, expires_at):
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache_entry (key, value, expires_at) VALUES (?, ?, ?)",
+            (full_key, sqlite3.Binary(pickle.dumps(value, pickle.HIGHEST_PROTOCOL)), expires_at),
+        )
+        conn.execute("DELETE FROM cache_entry WHERE expires_at <= ?", (time.time(),))
+
+    def try_lock(self, name, ttl):
+        now = time.time()
+        conn = self._conn()
+        conn.execute("DELETE FROM cache_lock WHERE name = ? AND expires_at <= ?", (name, now))
+        cur = conn.execute(
+            "INSERT OR IGNORE INTO cache_lock (name, expires_at) VALUES (?, ?)", (name, now + ttl)
+        )
+        return cur.rowcount == 1
+
+    def unlock(self, name):
+        self._conn().execute("DELETE FROM cache_lock WHERE name = ?", (name,))
+
+
+class SharedCache:
+    """Namespaced cache on top of a backend, with a per-process L1 copy.
+
+    The L1 copy is only served while the namespace version in the backend still
+    matches, so a write in one worker invalidates every worker's L1 too. It is
+    an LRU of at most L1_MAX_ENTRIES keys, so many-keyed namespaces (search
+    queries) can't grow it without bound.
+    """
+
+    FILL_WAIT = 20  # seconds a worker waits for another worker's fill before loading itself
+    L1_MAX_ENTRIES = 2048
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._l1 = OrderedDict()  # (namespace, key) -> (version, expires_at, value), oldest first
+        self._l1_lock = threading.Lock()
+        self._local = MemoryBackend()  # values and fill locks of keep_local() namespaces
+        self._local_namespaces = set()
+
+    def keep_local(self, *namespaces):
+        """Never write these namespaces' values to the backend, only their versions.
+
+        Entries an older release stored in the backend are dropped.
+        """
+        self._local_namespaces.update(namespaces)
+        for namespace in namespaces:
+            try:
+                self.backend.drop_entries(namespace)
+            except Exception as e:
+                logger.warning("Cache purge failed for %s: %s", namespace, e)
+
+    def _store(self, namespace):
+        return self._local if namespace in self._local_namespaces else self.backend
+
+    def _l1_get(self, namespace, key):
+        with self._l1_lock:
+            hit = self._l1.get((namespace, key))
+            if hit:
+                self._l1.move_to_end((namespace, key))
+            return hit
+
+    def _l1_put(self, namespace, key, entry):
+        with self._l1_lock:
+            self._l1[(namespace, key)] = entry
+            self._l1.move_to_end((namespace, key))
+            while len(self._l1) > self.L1_MAX_ENTRIES:
+                self._l1.popitem(last=False)
+
+    def version(self, namespace):
+        """Current version of namespace (changes on every invalidate)."""
+        try:
+            return self.backend.get_version(namespace)
+        except Exception as e:
+            logger.warning("Cache version read failed for %s: %s", namespace, e)
+            return -1
+
+    def _lookup(self, namespace, key, version):
+        hit = self._l1_get(namespace, key)
+        if hit and hit[0] == version and hit[1] > time.time():
+            return True, hit[2]
+        try:
+            found, value, expires_at = self._store(namespace).get(f"{namespace}:{version}:{key}")
+        except Exception as e:
+            logger.warning("Cache read failed for %s: %s", namespace, e)
+            return False, None
+        if found:
+            self._l1_put(namespace, key, (version, expires_at, value))
+        return found, value
+
+    def get(self, namespace, key="default"):
+        """Return the cached value or None."""
+        found, value = self._lookup(namespace, key, self.version(namespace))
+        return value if found else None
+
+    def set(self, namespace, value, ttl, key="default", version=None):
+        """Store value for ttl seconds under the current (or given) namespace version."""
+        if version is None:
+            version = self.version(namespace)
+        expires_at = time.time() + ttl
+        self._l1_put(namespace, key, (version, expires_at, value))
+        if namespace in self._local_namespaces:
+            self._local.drop_other_versions(namespace, version)
+        try:
+            self._store(namespace).set(f"{namespace}:{version}:{key}", value, expires_at)
+        except Exception as e:
+            logger.warning("Cache write failed for %s: %s", namespace, e)
+
+    def get_or_set(self, namespace, loader, ttl, key="default"):
+        """Return the cached value, calling loader() on a miss.
+
+        Only one worker on the host runs loader() for a given key at a time; the
+        others wait (up to FILL_WAIT seconds) and pick up its result, so a cold
+        cache is warmed once rather than once per worker.
+        """
+        version = self.version(namespace)
+        found, value = self._lookup(namespace, key, version)
+        if found:
+            return value
+
+        store = self._store(namespace)
+        lock_name = f"{namespace}:{key}"
+        locked = self._try_lock(store, lock_name)
+        if not locked:
+            deadline = time.time() + self.FILL_WAIT
+            while time.time() < deadline:
+                time.sleep(0.2)
+                version = self.version(namespace)
+                found, value = self._lookup(namespace, key, version)
+                if found:
+                    return value
+                locked = self._try_lock(store, lock_name)
+                if locked:
+                    break
+        try:
+            # Version captured before loading: if a write invalidates the
+            # namespace mid-load, this result lands under the old version.
+            version = self.version(namespace)
+            value = loader()
+            self.set(namespace, value, ttl, key=key, version=version)
+            return value
+        finally:
+            if locked:
+                self._unlock(store, lock_name)
+
+    def invalidate(self, namespace):
+        """Drop every key in namespace, in every worker."""
+        with self._l1_lock:
+            for k in [k for k in self._l1 if k[0] == namespace]:
+                del self._l1[k]
+        if namespace in self._local_namespaces:
+            self._local.bump_version(namespace)
+        try:
+            self.backend.bump_version(namespace)
+        except Exception as e:
+            logger.warning("Cache invalidate failed for %s: %s", namespace, e)
+
+    def _try_lock(self, store, name):
+        try:
+            return store.try_lock(name, self.FILL_WAIT)
+        except Exception:
+            return True  # backend unavailable — just load
+
+    def _unlock(self, store, name):
+        try:
+            store.unlock(name)
+        except Exception:
+            pass
+
+
+def _make_backend():
+    kind = os.environ.get("CACHE_BACKEND", "sqlite").lower()
+    if kind == "sqlite":
+        path = os.environ.get("CACHE_PATH", _DEFAULT_PATH)
+        try:
+            return SQLiteBackend(path)
+        except (sqlite3.Error, OSError) as e:
+            logger.warning("SQLite cache unavailable at %s (%s) — falling back to memory", path, e)
+    elif kind != "memory":
+        logger.warning("Unknown CACHE_BACKEND %r — using memory", kind)
+    return MemoryBackend()
+
+
+shared_cache = SharedCache(_make_backend())
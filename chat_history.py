@@ -0,0 +1,146 @@
+"""Token-budgeted conversation history for the chat endpoints.
+
+Each chat kind ("books", "screens", "contacts") keeps recent messages verbatim
+and the older part of the conversation as a rolling summary (ChatSummary).
+The summary is only regenerated when the unsummarized tail grows past
+HISTORY_TOKEN_BUDGET, so between regenerations the prompt prefix is stable and
+stays prompt-cacheable.
+"""
+
+import logging
+
+from jobs import job_queue
+from llm import BACKGROUND, llm
+from models import ChatSummary, db
+
+logger = logging.getLogger(__name__)
+
+HISTORY_TOKEN_BUDGET = 6000  # verbatim history sent per request
+RECENT_TOKEN_TARGET = 2500  # verbatim history left after a fold
+MIN_RECENT_MESSAGES = 4
+MAX_LOAD = 200
+SUMMARY_MODEL = "claude-haiku-4-5-20251001"
+SUMMARY_MAX_TOKENS = 1024
+
+_KIND_LABELS = {
+    "books": "도서 추천 대화",
+    "screens": "영화/드라마 추천 대화",
+    "contacts": "연락처·비즈니스 관리 대화",
+}
+_SUMMARY_HEADER = "[이전 대화 요약]"
+_SUMMARY_ACK = "이전 대화 내용을 참고해서 이어가겠습니다."
+
+
+def estimate_tokens(text):
+    """Rough token count: ~4 ASCII chars per token, ~1 token per other char (Hangul)."""
+    text = text or ""
+    ascii_chars = sum(1 for c in text if c < "\x80")
+    return ascii_chars // 4 + (len(text) - ascii_chars) + 4
+
+
+def _recent_start(messages, token_limit):
+    """Index of the first message kept verbatim under token_limit.
+
+    Keeps at least MIN_RECENT_MESSAGES and always starts on a user turn, since
+    the API requires the conversation (after the summary pair) to open with one.
+    """
+    used = 0
+    start = len(messages)
+    for i in range(len(messages) - 1, -1, -1):
+        used += estimate_tokens(messages[i].content)
+        if used > token_limit and len(messages) - i > MIN_RECENT_MESSAGES:
+            break
+        start = i
+    while start < len(messages) and messages[start].role != "user":
+        start += 1
+    return start
+
+
+def load_history(kind, model):
+    """History for the next turn of chat kind, as [{"role", "content"}].
+
+    The stored summary (if any) leads as a user/assistant pair, followed by the
+    unsummarized messages. If those exceed HISTORY_TOKEN_BUDGET, the oldest are
+    left out of this request and a background job folds them into the summary.
+    """
+    row = ChatSummary.query.filter_by(kind=kind).first()
+    covered = row.covered_until_id if row else 0
+    messages = (
+        model.query
+        .filter(model.id > covered)
+        .order_by(model.id.desc())
+        .limit(MAX_LOAD).all()
+    )
+    messages.reverse()
+
+    if sum(estimate_tokens(m.content) for m in messages) > HISTORY_TOKEN_BUDGET:
+        job_queue.submit(f"chat_summary:{kind}", fold_history, kind, model, lease_seconds=300)
+        messages = messages[_recent_start(messages, HISTORY_TOKEN_BUDGET):]
+    else:
+        messages = messages[_recent_start(messages, float("inf")):]
+
+    history = []
+    if row and row.summary:
+        history.append({"role": "user", "content": f"{_SUMMARY_HEADER}\n{row.summary}"})
+        history.append({"role": "assistant", "content": _SUMMARY_ACK})
+    history.extend({"role": m.role, "content": m.content} for m in messages)
+    return history
+
+
+def fold_history(kind, model):
+    """Fold everything but the recent tail of chat kind into its summary."""
+    row = ChatSummary.query.filter_by(kind=kind).first()
+    if row is None:
+        row = ChatSummary(kind=kind, summary="", covered_until_id=0)
+        db.session.add(row)
+
+    messages = (
+        model.query
+        .filter(model.id > row.covered_until_id)
+        .order_by(model.id)
+        .limit(MAX_LOAD * 2).all()
+    )
+    if sum(estimate_tokens(m.content) for m in messages) <= HISTORY_TOKEN_BUDGET:
+        db.session.rollback()
+        return
+
+    older = messages[:_recent_start(messages, RECENT_TOKEN_TARGET)]
+    if not older:
+        db.session.rollback()
+        return
+
+    row.summary = _summarize(kind, row.summary, older)
+    row.covered_until_id = older[-1].id
+    db.session.commit()
+    logger.info("Folded %d %s chat messages into summary (up to id %d)",
+                len(older), kind, row.covered_until_id)
+
+
+def _summarize(kind, previous_summary, messages):
+    transcript = "\n\n".join(
+        f"{'사용자' if m.role == 'user' else 'AI'}: {m.content}" for m in messages
+    )
+    parts = []
+    if previous_summary:
+        parts.append(f"<기존_요약>\n{previous_summary}\n</기존_요약>")
+    parts.append(f"<새_대화>\n{transcript}\n</새_대화>")
+
+    response = llm.create(
+        priority=BACKGROUND,
+        model=SUMMARY_MODEL,
+        max_tokens=SUMMARY_MAX_TOKENS,
+        system=(
+            f"당신은 {_KIND_LABELS.get(kind, '대화')}의 이전 부분을 요약합니다. "
+            "기존 요약과 새 대화를 하나의 요약으로 합치세요. 이후 대화에 필요한 사실 — "
+            "사용자의 취향과 요청, 이미 추천하거나 언급한 항목(제목·이름), 결정되거나 "
+            "실행된 사항 — 을 빠짐없이 간결한 한국어 글머리표로 남기고, 인사말이나 "
+            "중복 설명은 버리세요. 요약만 출력하세요."
+        ),
+        messages=[{"role": "user", "content": "\n\n".join(parts)}],
+    )
+    return response.content[0].text.strip()
+
+
+def clear_summary(kind):
+    """Drop kind's summary (chat cleared). Does not commit."""
+    ChatSummary.query.filter_by(kind=kind).delete()
@@ -0,0 +1,275 @@
+"""End-to-end check of the batch insight path against a local Message Batches stub.
+
+Usage:
+    python check_insight_batches.py            # run the check, exit 1 on failure
+    python check_insight_batches.py --serve 8765
+        # only run the stub; point the app at it with
+        # ANTHROPIC_BASE_URL=http://127.0.0.1:8765 ANTHROPIC_API_KEY=test
+
+StubBatchServer implements the three endpoints insights.py uses:
+    POST /v1/messages/batches               create (records the requests)
+    GET  /v1/messages/batches/<id>          retrieve; "in_progress" on the first
+                                            poll, "ended" afterwards
+    GET  /v1/messages/batches/<id>/results  JSONL results
+    POST /v1/messages                       the sync path's messages.create
+
+A request's outcome is picked by its keyword: one containing "expired" or
+"errored" gets that result type, one containing "missing" is left out of the
+results, anything else succeeds with text naming the keyword. Direct
+messages.create calls always succeed.
+
+The check runs insights.start_batch_run() → advance_batch_run() on a temporary
+SQLite database until the run finishes, and verifies the custom_id → keyword
+mapping, the poll before collection, and that expired / errored / missing
+entries are resubmitted and fail after MAX_ATTEMPTS. It then starts a sync
+run while a second batch run is pending, checks that it completes, and that
+the batch skips the keywords the sync run covered. News fingerprints are
+replaced by a per-round value so the check needs no network access.
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubBatchServer:
+    """In-process stand-in for the Message Batches API."""
+
+    def __init__(self, port=0):
+        self.batches = {}  # id -> {"requests": [...], "polls": int, "created_at": str}
+        self.messages = []  # keywords of every generated message
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body, content_type="application/json"):
+                data = body if isinstance(body, bytes) else json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                path = self.path.split("?")[0].rstrip("/")
+                if path not in ("/v1/messages", "/v1/messages/batches"):
+                    return self._send(404, {"type": "error", "error": {"type": "not_found_error", "message": self.path}})
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                if path == "/v1/messages":
+                    return self._send(200, stub.message(body))
+                self._send(200, stub.create(body["requests"]))
+
+            def do_GET(self):
+                match = re.fullmatch(r"/v1/messages/batches/([^/?]+)(/results)?", self.path.split("?")[0])
+                if not match or match.group(1) not in stub.batches:
+                    return self._send(404, {"type": "error", "error": {"type": "not_found_error", "message": self.path}})
+                if match.group(2):
+                    return self._send(200, stub.results(match.group(1)), "application/binary")
+                self._send(200, stub.retrieve(match.group(1)))
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+    def _batch(self, batch_id, ended):
+        entry = self.batches[batch_id]
+        return {
+            "id": batch_id,
+            "type": "message_batch",
+            "processing_status": "ended" if ended else "in_progress",
+            "request_counts": {"processing": 0 if ended else len(entry["requests"]),
+                               "succeeded": 0, "errored": 0, "canceled": 0, "expired": 0},
+            "created_at": entry["created_at"],
+            "expires_at": entry["created_at"],
+            "ended_at": entry["created_at"] if ended else None,
+            "archived_at": None,
+            "cancel_initiated_at": None,
+            "results_url": f"{self.url}/v1/messages/batches/{batch_id}/results" if ended else None,
+        }
+
+    def create(self, requests):
+        batch_id = f"msgbatch_{uuid.uuid4().hex[:12]}"
+        with self.lock:
+            self.batches[batch_id] = {
+                "requests": requests, "polls": 0,
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            }
+        return self._batch(batch_id, ended=False)
+
+    def retrieve(self, batch_id):
+        with self.lock:
+            entry = self.batches[batch_id]
+            entry["polls"] += 1
+            # The SDK's results() retrieves again before downloading
+            return self._batch(batch_id, ended=entry["polls"] > 1)
+
+    @staticmethod
+    def keyword(request):
+        return request["params"]["messages"][0]["content"].splitlines()[0].removeprefix("키워드: ")
+
+    def message(self, params):
+        keyword = self.keyword({"params": params})
+        with self.lock:
+            self.messages.append(keyword)
+        return {
+            "id": f"msg_{uuid.uuid4().hex[:12]}", "type": "message", "role": "assistant",
+            "model": params["model"], "stop_reason": "end_turn", "stop_sequence": None,
+            "content": [{"type": "text", "text": f"## 한줄 요약\n{keyword} 요약"}],
+            "usage": {"input_tokens": 100, "output_tokens": 50},
+        }
+
+    def results(self, batch_id):
+        lines = []
+        for request in self.batches[batch_id]["requests"]:
+            keyword = self.keyword(request)
+            if "missing" in keyword:
+                continue
+            if "expired" in keyword:
+                result = {"type": "expired"}
+            elif "errored" in keyword:
+                result = {"type": "errored",
+                          "error": {"type": "error", "error": {"type": "api_error", "message": "stub error"}}}
+            else:
+                result = {"type": "succeeded", "message": self.message(request["params"])}
+            lines.append(json.dumps({"custom_id": request["custom_id"], "result": result}, ensure_ascii=False))
+        return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def _check(stub, workdir):
+    os.environ["ANTHROPIC_BASE_URL"] = stub.url
+    os.environ["ANTHROPIC_API_KEY"] = "test"
+    os.environ["LLM_LIMITS_PATH"] = os.path.join(workdir, "llm_limits.db")
+    os.environ.setdefault("CACHE_BACKEND", "memory")
+    os.environ.setdefault("SECRET_KEY", "check")
+
+    from flask import Flask
+
+    import insights
+    from models import InsightKeyword, InsightRun, InsightTask, NewsInsight, db
+
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{os.path.join(workdir, 'check.db')}"
+    db.init_app(app)
+    news = {"round": 1}
+    insights._news_fingerprint = lambda keyword: f"stub-news-{news['round']}"
+
+    failures = []
+
+    def expect(condition, message):
+        print(("ok    " if condition else "FAIL  ") + message)
+        if not condition:
+            failures.append(message)
+
+    with app.app_context():
+        db.create_all()
+        keywords = ["휴머노이드", "AI chips", "expired keyword", "errored keyword", "missing keyword"]
+        db.session.add_all([InsightKeyword(keyword=k, position=i) for i, k in enumerate(keywords)])
+        db.session.commit()
+        ids = {kw.keyword: kw.id for kw in InsightKeyword.query}
+
+        insights.start_batch_run()
+        run = InsightRun.query.one()
+        expect(run.mode == "batch" and run.batch_id in stub.batches, "start_batch_run submits one batch")
+        submitted = stub.batches[run.batch_id]["requests"]
+        tasks = {t.id: t for t in InsightTask.query.filter_by(run_id=run.id)}
+        expect(
+            sorted(stub.keyword(r) for r in submitted) == sorted(keywords)
+            and all(tasks[int(r["custom_id"].removeprefix("task-"))].keyword == stub.keyword(r) for r in submitted),
+            "custom_id task-<id> maps to the task's keyword",
+        )
+
+        first_batch = run.batch_id
+        insights.advance_batch_run(run.id)
+        db.session.refresh(run)
+        expect(run.batch_id == first_batch and NewsInsight.query.count() == 0,
+               "an in-progress batch is polled, not collected")
+
+        insights.advance_batch_run(run.id)
+        db.session.refresh(run)
+        saved = {i.keyword_id: i.insight_text for i in NewsInsight.query}
+        expect(set(saved) == {ids["휴머노이드"], ids["AI chips"]}
+               and all(text.endswith(f"{kw} 요약") for kw in ("휴머노이드", "AI chips") for text in [saved[ids[kw]]]),
+               "succeeded results are saved under their own keyword")
+        resubmitted = sorted(stub.keyword(r) for r in stub.batches.get(run.batch_id, {}).get("requests", []))
+        expect(run.batch_id != first_batch
+               and resubmitted == sorted(["expired keyword", "errored keyword", "missing keyword"]),
+               "expired, errored and missing entries go into the next batch")
+
+        for _ in range(2 * insights.MAX_ATTEMPTS):
+            if run.active_key is None:
+                break
+            insights.advance_batch_run(run.id)
+            db.session.refresh(run)
+        statuses = {t.keyword: (t.status, t.attempts) for t in InsightTask.query.filter_by(run_id=run.id)}
+        expect(run.active_key is None and run.status == "done", "the run finishes")
+        expect(all(statuses[k] == ("failed", insights.MAX_ATTEMPTS)
+                   for k in ("expired keyword", "errored keyword", "missing keyword"))
+               and statuses["AI chips"][0] == "done",
+               f"entries that never succeed fail after {insights.MAX_ATTEMPTS} attempts")
+        expect(NewsInsight.query.count() == 2, "no insight is saved for failed entries")
+
+        # Round 2: the "generate now" button while a scheduled batch is pending
+        news["round"] = 2
+        insights.start_batch_run()
+        batch_run = insights.active_run("batch")
+        expect(batch_run is not None and batch_run.batch_id in stub.batches, "a second batch run is pending")
+        sync_run, created = insights.start_run("sync")
+        expect(created and sync_run.id != batch_run.id, "a sync run starts while the batch run is active")
+        insights.run_sync(sync_run.id)
+        db.session.refresh(sync_run)
+        db.session.refresh(batch_run)
+        expect(sync_run.active_key is None and NewsInsight.query.count() == 2 + len(keywords),
+               "the sync run finishes with an insight per keyword")
+        expect(batch_run.active_key == "batch", "the batch run is still active")
+
+        for _ in range(2 * insights.MAX_ATTEMPTS):
+            if batch_run.active_key is None:
+                break
+            insights.advance_batch_run(batch_run.id)
+            db.session.refresh(batch_run)
+        statuses = {t.keyword: t.status for t in InsightTask.query.filter_by(run_id=batch_run.id)}
+        expect(batch_run.active_key is None and set(statuses.values()) == {"skipped"}
+               and NewsInsight.query.count() == 2 + len(keywords),
+               "the batch skips the keywords the sync run covered")
+
+    return not failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--serve", type=int, metavar="PORT", help="only run the stub server on PORT")
+    args = parser.parse_args()
+
+    if args.serve is not None:
+        stub = StubBatchServer(args.serve)
+        print(f"Message Batches stub on {stub.url}")
+        stub.server.serve_forever()
+        return
+
+    stub = StubBatchServer().start()
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            ok = _check(stub, workdir)
+    finally:
+        stub.stop()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -66,6 +66,9 @@ class Config:
     SCRAPE_HOUR_UTC = "21,3,9,15"
     SCRAPE_MINUTE = 0
 
+    # Background job queue (bounded worker threads per process)
+    JOB_QUEUE_WORKERS = int(os.environ.get("JOB_QUEUE_WORKERS", "2"))
+
     # Article retention limit
     MAX_ARTICLES = 2000
     MAX_ARTICLE_AGE_DAYS = 60  # 2개월
@@ -0,0 +1,142 @@
+"""Local retrieval over contacts and business entities for the contact agent.
+
+Records are indexed by character 2/3-grams (works for Korean names and
+English words alike, no tokenizer needed) with TF-IDF weights, plus exact
+name / employer / tag boosts on top of the text score.
+"""
+
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+
+_NGRAM_SIZES = (2, 3)
+_WS_RE = re.compile(r"\s+")
+_MIN_SCORE = 0.05
+
+CONTACT_FIELDS = {
+    "name": 3.0, "name_ko": 3.0, "name_en": 3.0,
+    "employer": 2.0, "title": 1.0, "tag": 1.5,
+    "key_value_interest": 1.0, "follow_up_note": 0.5, "referred_by": 0.5,
+}
+ENTITY_FIELDS = {
+    "name": 3.0, "tag": 1.5, "key_value_interest": 1.0,
+    "related_individuals": 1.0, "follow_up_note": 0.5, "assignee": 0.5,
+}
+
+
+def _normalize(text):
+    return _WS_RE.sub(" ", str(text or "").lower()).strip()
+
+
+def _grams(text):
+    counts = Counter()
+    for token in _normalize(text).split(" "):
+        if not token:
+            continue
+        padded = f" {token} "
+        for n in _NGRAM_SIZES:
+            for i in range(len(padded) - n + 1):
+                counts[padded[i:i + n]] += 1
+    return counts
+
+
+def _split_tags(value):
+    return [t for t in (_normalize(x) for x in str(value or "").split(",")) if t]
+
+
+class RecordIndex:
+    """TF-IDF n-gram index over one list of records (contacts or entities)."""
+
+    def __init__(self, records, fields, boost_fields=("employer",)):
+        self.records = records
+        self._postings = defaultdict(list)  # gram -> [(doc_id, weight)]
+        self._idf = {}
+        self._names = []
+        self._boost_values = []
+        self._tags = []
+
+        doc_grams = []
+        for rec in records:
+            grams = Counter()
+            for field, weight in fields.items():
+                for g, n in _grams(rec.get(field, "")).items():
+                    grams[g] += n * weight
+            doc_grams.append(grams)
+            self._names.append({
+                v for v in (_normalize(rec.get(f)) for f in ("name", "name_ko", "name_en"))
+                if len(v) >= 2
+            })
+            self._boost_values.append({
+                v for v in (_normalize(rec.get(f)) for f in boost_fields) if len(v) >= 2
+            })
+            self._tags.append(_split_tags(rec.get("tag")))
+
+        n_docs = len(records)
+        df = Counter(g for grams in doc_grams for g in grams)
+        self._idf = {g: math.log((n_docs + 1) / (d + 1)) + 1.0 for g, d in df.items()}
+        for doc_id, grams in enumerate(doc_grams):
+            vec = {g: (1.0 + math.log(tf)) * self._idf[g] for g, tf in grams.items() if tf > 0}
+            norm = math.sqrt(sum(w * w for w in vec.values())) or 1.0
+            for g, w in vec.items():
+                self._postings[g].append((doc_id, w / norm))
+
+    def _text_scores(self, text, weight, scores):
+        grams = _grams(text)
+        if not grams:
+            return
+        vec = {g: (1.0 + math.log(tf)) * self._idf[g] for g, tf in grams.items() if g in self._idf}
+        norm = math.sqrt(sum(w * w for w in vec.values())) or 1.0
+        for g, qw in vec.items():
+            for doc_id, dw in self._postings[g]:
+                scores[doc_id] += weight * dw * qw / norm
+
+    def search(self, query, k=10, context=""):
+        """Return [(record, score)] for the top k records matching query.
+
+        context (e.g. recent conversation turns) contributes at half weight.
+        """
+        scores = defaultdict(float)
+        self._text_scores(query, 1.0, scores)
+        if context:
+            self._text_scores(context, 0.5, scores)
+        if not scores:
+            return []
+
+        q = _normalize(query)
+        for doc_id in scores:
+            if any(name in q for name in self._names[doc_id]):
+                scores[doc_id] += 1.0
+            if any(v in q for v in self._boost_values[doc_id]):
+                scores[doc_id] += 0.5
+            if any(tag in q for tag in self._tags[doc_id]):
+                scores[doc_id] += 0.3
+
+        ranked = sorted(
+            ((doc_id, s) for doc_id, s in scores.items() if s >= _MIN_SCORE),
+            key=lambda x: -x[1],
+        )
+        return [(self.records[doc_id], round(s, 3)) for doc_id, s in ranked[:k]]
+
+
+class DirectoryIndex:
+    """Contacts + entities indexes, rebuilt only when the source lists change."""
+
+    _lock = threading.Lock()
+    _current = None
+
+    def __init__(self, contacts, entities):
+        self.contacts_src = contacts
+        self.entities_src = entities
+        self.contacts = RecordIndex(contacts, CONTACT_FIELDS)
+        self.entities = RecordIndex(entities, ENTITY_FIELDS, boost_fields=())
+
+    @classmethod
+    def for_records(cls, contacts, entities):
+        # The sheet getters return the same list objects until their cache
+        # reloads, so identity is enough to tell whether to rebuild.
+        with cls._lock:
+            cur = cls._current
+            if cur is None or cur.contacts_src is not contacts or cur.entities_src is not entities:
+                cur = cls._current = cls(contacts, entities)
+            return cur
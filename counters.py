@@ -0,0 +1,149 @@
+"""Daily counters for dashboard aggregates (DailyCounter table).
+
+Writes bump the counter for their day inside the caller's transaction, so the
+landing page reads O(days shown) rows instead of re-aggregating source tables.
+Sheets-backed metrics (contacts, habits) are also reconciled periodically with
+sync_metric(), which catches edits made outside the app.
+"""
+
+from datetime import date, timedelta, timezone
+
+from sqlalchemy import case, func, update
+from sqlalchemy.exc import IntegrityError
+
+from models import Compliment, DailyCounter, ReadArticle, db
+
+_KST = timezone(timedelta(hours=9))
+
+ARTICLE_READ = "article_read"
+COMPLIMENT = "compliment"
+CONTACT_LAST = "contact_last"
+
+
+def habit_metric(habit_name):
+    return f"habit:{habit_name}"
+
+
+def parse_day(value):
+    """Return a date for an ISO 'YYYY-MM-DD' string (or date), else None."""
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat((value or "").strip()[:10])
+    except ValueError:
+        return None
+
+
+def kst_day(dt):
+    """KST calendar day of a naive-UTC or aware datetime."""
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(_KST).date()
+
+
+def bump(metric, day, delta=1):
+    """Add delta to (metric, day). Does not commit — rides the caller's transaction."""
+    day = parse_day(day)
+    if not delta or day is None:
+        return
+    stmt = (
+        update(DailyCounter)
+        .where(DailyCounter.metric == metric, DailyCounter.day == day)
+        .values(count=DailyCounter.count + delta)
+    )
+    if db.session.execute(stmt).rowcount or delta < 0:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.add(DailyCounter(metric=metric, day=day, count=delta))
+    except IntegrityError:
+        # Another worker created the row first — add to it instead.
+        db.session.execute(stmt)
+
+
+def sync_metric(metric, counts):
+    """Make metric's rows match counts ({date: n}), writing only the differences."""
+    existing = {
+        row.day: row for row in DailyCounter.query.filter_by(metric=metric).all()
+    }
+    changed = 0
+    for day, n in counts.items():
+        row = existing.pop(day, None)
+        if row is None:
+            if n:
+                db.session.add(DailyCounter(metric=metric, day=day, count=n))
+                changed += 1
+        elif row.count != n:
+            row.count = n
+            changed += 1
+    for row in existing.values():
+        db.session.delete(row)
+        changed += 1
+    if changed:
+        db.session.commit()
+    return changed
+
+
+def daily_counts(metric, start, end):
+    """{iso_date: count} for start..end inclusive."""
+    rows = (
+        db.session.query(DailyCounter.day, DailyCounter.count)
+        .filter(DailyCounter.metric == metric,
+                DailyCounter.day >= start, DailyCounter.day <= end)
+        .all()
+    )
+    return {d.isoformat(): n for d, n in rows}
+
+
+def window_totals(metric, *since_days):
+    """Sum of counts on or after each given date, in one query."""
+    if not since_days:
+        return []
+    cols = [func.coalesce(func.sum(case((DailyCounter.day >= d, DailyCounter.count), else_=0)), 0)
+            for d in since_days]
+    row = db.session.query(*cols).filter(DailyCounter.metric == metric).one()
+    return [int(v or 0) for v in row]
+
+
+def active_days(metric):
+    """Set of ISO dates with a positive count (e.g. days a habit was logged)."""
+    rows = (
+        db.session.query(DailyCounter.day)
+        .filter(DailyCounter.metric == metric, DailyCounter.count > 0)
+        .all()
+    )
+    return {d.isoformat() for (d,) in rows}
+
+
+def count_by_day(values):
+    """Bucket ISO date strings into {date: n}, skipping blanks/unparseable values."""
+    counts = {}
+    for value in values:
+        day = parse_day(value)
+        if day:
+            counts[day] = counts.get(day, 0) + 1
+    return counts
+
+
+def backfill_db_metrics():
+    """Build article/compliment counters from their source tables if never built."""
+    for metric, loader in ((ARTICLE_READ, _article_read_counts), (COMPLIMENT, _compliment_counts)):
+        if DailyCounter.query.filter_by(metric=metric).first() is None:
+            sync_metric(metric, loader())
+
+
+def _article_read_counts():
+    counts = {}
+    for (read_at,) in db.session.query(ReadArticle.read_at).filter(ReadArticle.read_at.isnot(None)):
+        day = kst_day(read_at)
+        counts[day] = counts.get(day, 0) + 1
+    return counts
+
+
+def _compliment_counts():
+    rows = (
+        db.session.query(Compliment.given_at, func.count(Compliment.id))
+        .group_by(Compliment.given_at)
+        .all()
+    )
+    return {d: n for d, n in rows if d}
@@ -0,0 +1,159 @@
+"""Streaming import of a Goodreads library export into MyBook.
+
+The export ("My Books" → Import and export → Export Library) is read row by
+row from the uploaded file and written CHUNK_SIZE rows at a time: one query
+finds the existing books of a chunk by goodreads_id or ISBN13, matches are
+updated and the rest bulk-inserted, then the chunk is committed. Memory use
+is bounded by the chunk, not the file.
+
+Bulk statements skip the session flush hooks, so each chunk bumps the books
+chat profile itself. Recommendation refresh is left to the caller — once,
+after the whole file.
+"""
+
+import csv
+import io
+import logging
+import re
+
+from sqlalchemy import insert, or_, update
+
+import profiles
+from models import MyBook, db
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 500
+MAX_IMPORT_BYTES = 20 * 1024 * 1024
+REQUIRED_COLUMNS = {"Book Id", "Title", "Author"}
+
+# Goodreads exclusive shelf -> MyBook.shelf; custom exclusive shelves are skipped
+_SHELVES = {"read": "read", "to-read": "want-to-read", "currently-reading": "reading"}
+_ISBN_RE = re.compile(r"[^0-9X]")
+
+
+def _int(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _isbn(value):
+    """Strip the ="..." spreadsheet quoting Goodreads wraps ISBNs in."""
+    return _ISBN_RE.sub("", (value or "").upper())
+
+
+def open_export(stream):
+    """DictReader over a binary Goodreads export stream.
+
+    Raises ValueError (user-facing message) if the header isn't a Goodreads export.
+    """
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding="utf-8-sig", errors="replace", newline=""))
+    if not REQUIRED_COLUMNS.issubset(reader.fieldnames or ()):
+        raise ValueError("Goodreads 내보내기 CSV 형식이 아닙니다.")
+    return reader
+
+
+def parse_row(row):
+    """MyBook column values for one export row, or None if it can't be imported."""
+    title = (row.get("Title") or "").strip()
+    author = (row.get("Author") or "").strip()
+    shelf = _SHELVES.get((row.get("Exclusive Shelf") or "read").strip())
+    if not title or not author or shelf is None:
+        return None
+
+    my_rating = _int(row.get("My Rating"))
+    return {
+        "goodreads_id": (row.get("Book Id") or "").strip()[:20] or None,
+        "title": title[:500],
+        "author": author[:300],
+        "isbn": _isbn(row.get("ISBN"))[:20],
+        "isbn13": _isbn(row.get("ISBN13"))[:20],
+        "my_rating": my_rating if 0 <= my_rating <= 5 else 0,
+        "average_rating": _float(row.get("Average Rating")),
+        "publisher": (row.get("Publisher") or "").strip()[:200],
+        "year_published": _int(row.get("Original Publication Year")) or _int(row.get("Year Published")),
+        "date_read": (row.get("Date Read") or "").strip()[:20],
+        "shelf": shelf,
+    }
+
+
+def _write_chunk(rows):
+    """Upsert rows by goodreads_id, then ISBN13. Returns (inserted, updated)."""
+    gids = {r["goodreads_id"] for r in rows if r["goodreads_id"]}
+    isbns = {r["isbn13"] for r in rows if r["isbn13"]}
+    existing = (
+        db.session.query(MyBook.id, MyBook.goodreads_id, MyBook.isbn13)
+        .filter(or_(MyBook.goodreads_id.in_(gids), MyBook.isbn13.in_(isbns)))
+        .all()
+    )
+    by_gid = {gid: book_id for book_id, gid, _ in existing if gid}
+    by_isbn = {isbn: book_id for book_id, _, isbn in existing if isbn}
+    has_gid = {book_id for book_id, gid, _ in existing if gid}
+
+    updates = {}  # book id -> values
+    inserts = {}  # goodreads_id / isbn13 / position -> values; later duplicates win
+    for i, r in enumerate(rows):
+        book_id = by_gid.get(r["goodreads_id"]) or by_isbn.get(r["isbn13"])
+        if book_id is None:
+            inserts[r["goodreads_id"] or r["isbn13"] or i] = r
+            continue
+        values = dict(r, id=book_id)
+        if book_id in has_gid or not r["goodreads_id"]:
+            # Keep an existing Goodreads id; goodreads_id is unique
+            values.pop("goodreads_id")
+        else:
+            has_gid.add(book_id)
+            by_gid[r["goodreads_id"]] = book_id
+        updates[book_id] = values
+
+    if updates:
+        db.session.execute(update(MyBook), list(updates.values()))
+    if inserts:
+        db.session.execute(insert(MyBook), list(inserts.values()))
+    profiles.bump("books")
+    db.session.commit()
+    return len(inserts), len(updates)
+
+
+def import_rows(reader, chunk_size=CHUNK_SIZE):
+    """Import the rows of open_export(), yielding running totals after each chunk.
+
+    Totals: {"processed", "inserted", "updated", "skipped"}. Each chunk is
+    committed before its totals are yielded; the last totals yielded are the
+    final ones, and no totals are yielded twice.
+    """
+    totals = {"processed": 0, "inserted": 0, "updated": 0, "skipped": 0}
+    last = None
+    chunk = []
+    for row in reader:
+        totals["processed"] += 1
+        values = parse_row(row)
+        if values is None:
+            totals["skipped"] += 1
+        else:
+            chunk.append(values)
+        if len(chunk) >= chunk_size:
+            inserted, updated = _write_chunk(chunk)
+            totals["inserted"] += inserted
+            totals["updated"] += updated
+            chunk = []
+            last = dict(totals)
+            yield last
+    if chunk:
+        inserted, updated = _write_chunk(chunk)
+        totals["inserted"] += inserted
+        totals["updated"] += updated
+    logger.info("Goodreads import: %(processed)d rows, %(inserted)d inserted, "
+                "%(updated)d updated, %(skipped)d skipped", totals)
+    if totals != last:
+        # A partial last chunk, trailing skipped rows, or an empty export
+        yield dict(totals)
@@ -0,0 +1,266 @@
+"""Image proxy: third-party posters and covers, resized once and served from disk.
+
+Templates use the `proxied` filter (proxy_url) instead of hot-linking TMDB,
+Google Books, Amazon and Yes24 images. Each source is downloaded once, shrunk
+to the SIZES it is shown at (never enlarging), re-encoded as WebP and stored
+on disk for the /img/<size> endpoint:
+
+    IMAGE_CACHE_DIR/blobs/ab/<sha256 of the WebP bytes>.webp
+    IMAGE_CACHE_DIR/refs/<size>/cd/<sha256 of the source URL>   (holds the blob hash)
+
+Blobs are content-addressed, so identical images behind different URLs are
+stored once and the hash doubles as the ETag. Only ALLOWED_HOSTS are fetched
+(redirects included), so the endpoint can't be used to reach anything else.
+
+The endpoint itself never downloads: a miss is queued for the background
+pool and the browser is sent to the original image meanwhile.
+
+New MyScreen posters and bestseller covers are prefetched in the background:
+a session hook collects their URLs on flush and hands them to a small thread
+pool after commit, so the first page view is already served from disk.
+"""
+
+import hashlib
+import io
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+from urllib.parse import urljoin, urlparse
+
+import requests as http_requests
+from flask import url_for
+from PIL import Image, ImageOps
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from cache import shared_cache
+from models import Article, MyScreen
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_DIR = os.path.join(os.path.abspath(os.path.dirname(__file__)), "instance", "images")
+IMAGE_CACHE_DIR = os.environ.get("IMAGE_CACHE_DIR", _DEFAULT_DIR)
+
+# name -> bounding box in pixels, 2x the largest CSS box the templates draw it in
+SIZES = {
+    "thumb": (96, 144),  # screen library rows, search results
+    "poster": (140, 210),  # watching / hall of fame cards, book wizard
+    "cover": (300, 440),  # bestseller cards
+}
+ALLOWED_HOSTS = (
+    "image.tmdb.org",
+    "books.google.com",
+    "books.googleusercontent.com",
+    "m.media-amazon.com",
+    "images-na.ssl-images-amazon.com",
+    "image.yes24.com",
+)
+MAX_SOURCE_BYTES = 8 * 1024 * 1024
+MAX_REDIRECTS = 3
+FETCH_TIMEOUT = 10
+WEBP_QUALITY = 82
+CACHE_MAX_AGE = 365 * 24 * 3600
+FAILURE_TTL = 3600  # a source that failed isn't retried for this long
+PREFETCH_WORKERS = 2
+
+# model -> (image URL column, sizes its templates use)
+_PREFETCH = {
+    MyScreen: ("poster_url", ("thumb", "poster")),
+    Article: ("image_url", ("cover",)),
+}
+
+_executor = None
+_executor_pid = None
+_in_flight = set()
+_lock = threading.Lock()
+
+
+def allowed(url):
+    """True if url is an http(s) URL on one of ALLOWED_HOSTS."""
+    if not url:
+        return False
+    parsed = urlparse(url)
+    return parsed.scheme in ("http", "https") and parsed.hostname in ALLOWED_HOSTS
+
+
+def proxy_url(url, size="poster"):
+    """The proxied URL for url at size, or url unchanged if it can't be proxied."""
+    if size not in SIZES or not allowed(url):
+        return url
+    return url_for("image_proxy", size=size, u=url)
+
+
+def _url_hash(url):
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+
+def _ref_path(url, size):
+    h = _url_hash(url)
+    return os.path.join(IMAGE_CACHE_DIR, "refs", size, h[:2], h)
+
+
+def _blob_path(digest):
+    return os.path.join(IMAGE_CACHE_DIR, "blobs", digest[:2], f"{digest}.webp")
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def cached(url, size):
+    """(blob path, content hash) if url at size is on disk, else None."""
+    try:
+        with open(_ref_path(url, size)) as f:
+            digest = f.read().strip()
+    except OSError:
+        return None
+    path = _blob_path(digest)
+    return (path, digest) if os.path.exists(path) else None
+
+
+def _download(url):
+    """Source bytes, following only redirects that stay on ALLOWED_HOSTS."""
+    for _ in range(MAX_REDIRECTS + 1):
+        r = http_requests.get(url, timeout=FETCH_TIMEOUT, stream=True, allow_redirects=False,
+                              headers={"User-Agent": "Mozilla/5.0 (dashboard image proxy)"})
+        with r:
+            if r.is_redirect:
+                url = urljoin(url, r.headers.get("Location", ""))
+                if not allowed(url):
+                    raise ValueError(f"redirect off the allow-list: {url}")
+                continue
+            r.raise_for_status()
+            if not r.headers.get("Content-Type", "").startswith("image/"):
+                raise ValueError(f"not an image: {r.headers.get('Content-Type')}")
+            data = bytearray()
+            for chunk in r.iter_content(64 * 1024):
+                data.extend(chunk)
+                if len(data) > MAX_SOURCE_BYTES:
+                    raise ValueError("image too large")
+            return bytes(data)
+    raise ValueError("too many redirects")
+
+
+def _resize(data, size):
+    box = SIZES[size]
+    with Image.open(io.BytesIO(data)) as im:
+        im.draft("RGB", box)  # JPEG: decode at a reduced scale when possible
+        im = ImageOps.exif_transpose(im)
+        im.thumbnail(box, Image.Resampling.LANCZOS)
+        if im.mode not in ("RGB", "RGBA"):
+            im = im.convert("RGBA" if im.mode in ("LA", "PA", "P") else "RGB")
+        out = io.BytesIO()
+        im.save(out, "WEBP", quality=WEBP_QUALITY, method=4)
+    return out.getvalue()
+
+
+def fetch(url, sizes):
+    """Download url once and store it at each of sizes.
+
+    Returns {size: (blob path, content hash)}, empty on failure. A failed
+    source is remembered for FAILURE_TTL so broken images don't cost a
+    download on every page view.
+    """
+    key = _url_hash(url)
+    if shared_cache.get("images.failed", key=key):
+        return {}
+    try:
+        data = _download(url)
+        variants = {size: _resize(data, size) for size in sizes}
+    except Exception as e:
+        logger.warning("Image proxy fetch failed for %s: %s", url, e)
+        shared_cache.set("images.failed", True, FAILURE_TTL, key=key)
+        return {}
+
+    stored = {}
+    for size, webp in variants.items():
+        digest = hashlib.sha256(webp).hexdigest()
+        path = _blob_path(digest)
+        if not os.path.exists(path):
+            _write_atomic(path, webp)
+        _write_atomic(_ref_path(url, size), digest.encode("ascii"))
+        stored[size] = (path, digest)
+    return stored
+
+
+def get(url, size):
+    """(blob path, content hash) for url at size, or None on a miss.
+
+    A miss never downloads on the calling (request) thread: it queues one
+    background fetch of url at every size used alongside size, and the caller
+    falls back to the original URL until it lands.
+    """
+    found = cached(url, size)
+    if found is None:
+        sizes = next((s for _, s in _PREFETCH.values() if size in s), (size,))
+        prefetch((url, s) for s in sizes)
+    return found
+
+
+def _prefetch_one(url, sizes):
+    try:
+        missing = [size for size in sizes if cached(url, size) is None]
+        if missing:
+            fetch(url, missing)
+    finally:
+        with _lock:
+            _in_flight.discard(url)
+
+
+def prefetch(urls_and_sizes):
+    """Fetch (url, size) pairs in the background, one download per URL.
+
+    URLs already queued in this process are skipped; cached sizes aren't refetched.
+    """
+    global _executor, _executor_pid
+    by_url = {}
+    for url, size in urls_and_sizes:
+        by_url.setdefault(url, set()).add(size)
+    with _lock:
+        if _executor is None or _executor_pid != os.getpid():
+            # A pool inherited across a gunicorn fork has no threads
+            _executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="image-prefetch")
+            _executor_pid = os.getpid()
+            _in_flight.clear()
+        todo = {url: sizes for url, sizes in by_url.items() if url not in _in_flight}
+        _in_flight.update(todo)
+    for url, sizes in todo.items():
+        _executor.submit(_prefetch_one, url, sorted(sizes))
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_new_images(session, _flush_context):
+    for obj in chain(session.new, session.dirty):
+        spec = _PREFETCH.get(type(obj))
+        if spec is None:
+            continue
+        column, sizes = spec
+        url = getattr(obj, column)
+        if not allowed(url):
+            continue
+        if obj in session.dirty and not inspect(obj).attrs[column].history.has_changes():
+            continue
+        session.info.setdefault("image_prefetch", set()).update((url, size) for size in sizes)
+
+
+@event.listens_for(Session, "after_commit")
+def _prefetch_committed(session):
+    pairs = session.info.pop("image_prefetch", None)
+    if pairs:
+        prefetch(pairs)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_uncommitted(session):
+    session.info.pop("image_prefetch", None)
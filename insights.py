@@ -0,0 +1,479 @@
+"""Keyword insight generation as DB-backed runs with per-keyword tasks.
+
+An InsightRun holds one InsightTask per keyword. Tasks are claimed with a
+lease (conditional UPDATE), so status can be read from any worker, a run cut
+short by a crash or restart resumes from its unfinished tasks, and a task whose
+worker died is retried once its lease expires (up to MAX_ATTEMPTS).
+
+Runs come in two modes:
+    sync   — the "generate now" button; a few concurrent API calls.
+    batch  — the scheduled run; one Message Batches submission per round,
+             collected by a periodic check instead of a thread per keyword.
+At most one run per mode is unfinished at a time, so the button still works
+while a scheduled batch waits for its results (which can take up to a day).
+
+Before the expensive web-search call, each keyword's current top news URLs are
+fingerprinted; a keyword whose fingerprint matches its latest insight is
+skipped.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import socket
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import and_, func, or_, update
+from sqlalchemy.exc import IntegrityError
+
+from config import Config
+from llm import BACKGROUND, llm
+from models import InsightKeyword, InsightRun, InsightTask, NewsInsight, db
+from scraper import fetch_google_news_rss, fetch_naver_news
+
+logger = logging.getLogger(__name__)
+
+_OWNER = f"{socket.gethostname()}:{os.getpid()}"
+
+MAX_ATTEMPTS = 3
+TASK_LEASE = timedelta(minutes=10)
+SYNC_CONCURRENCY = 3
+BATCH_LEASE = timedelta(hours=25)  # batches expire after 24h
+FINGERPRINT_ARTICLES = 10
+MAX_SKIP_AGE = timedelta(days=3)  # regenerate at least this often, news or not
+RETENTION = timedelta(days=30)
+
+_UNFINISHED = ("pending", "running")
+
+
+# --- One keyword ---
+
+def _insight_request(keyword):
+    """messages.create params for one keyword's web-search insight."""
+    is_korean = bool(re.search(r'[가-힣]', keyword))
+    search_lang = "Search in Korean." if is_korean else "Search in English."
+    return dict(
+        model="claude-sonnet-4-20250514",
+        max_tokens=1500,
+        tools=[{"type": "web_search_20250305", "name": "web_search", "max_uses": 3}],
+        system=(
+            "You are a business intelligence analyst for a CEO. "
+            "Use web search to find recent news about the given keyword. "
+            f"{search_lang} "
+            "Write your analysis in Korean."
+        ),
+        messages=[{"role": "user", "content": (
+            f"키워드: {keyword}\n\n"
+            "이 키워드에 대한 최근 24시간의 주요 뉴스를 웹에서 검색하고 분석해주세요.\n\n"
+            "다음 형식으로 작성:\n"
+            "## 한줄 요약\n(이 키워드의 현재 상황을 한 문장으로)\n\n"
+            "## 주요 동향\n"
+            "- **[이슈명]**: 핵심 팩트 + 수치 (1-2문장)\n"
+            "- **[이슈명]**: 핵심 팩트 + 수치 (1-2문장)\n"
+            "- **[이슈명]**: 핵심 팩트 + 수치 (1-2문장)\n\n"
+            "## 액션 포인트\n"
+            "- 구체적 대응 방안 또는 모니터링 포인트 (1-2개)"
+        )}],
+    )
+
+
+def _parse_insight_response(keyword, response):
+    """(insight_text, source_articles) from a Message; (None, []) if empty."""
+    if response.stop_reason != "end_turn":
+        logger.warning(
+            "Insight for '%s' stopped with reason: %s",
+            keyword, response.stop_reason,
+        )
+
+    insight_text = ""
+    source_articles = []
+    seen_urls = set()
+
+    for block in response.content:
+        if block.type == "text":
+            insight_text += block.text
+            if hasattr(block, 'citations') and block.citations:
+                for cite in block.citations:
+                    if hasattr(cite, 'url') and cite.url not in seen_urls:
+                        seen_urls.add(cite.url)
+                        source_articles.append({
+                            "title": getattr(cite, 'title', cite.url),
+                            "url": cite.url,
+                        })
+
+    insight_text = insight_text.strip()
+    logger.info(
+        "Insight tokens for '%s': input=%d, output=%d",
+        keyword, response.usage.input_tokens, response.usage.output_tokens,
+    )
+
+    if not insight_text:
+        logger.warning(
+            "Empty insight for '%s' (stop_reason=%s, blocks=%d)",
+            keyword, response.stop_reason, len(response.content),
+        )
+        return None, []
+    return insight_text, source_articles
+
+
+def _generate_insight(keyword):
+    """Generate a structured insight for a keyword using Claude API with web search.
+
+    API errors propagate so the task can be retried.
+    """
+    response = llm.create(priority=BACKGROUND, **_insight_request(keyword))
+    return _parse_insight_response(keyword, response)
+
+
+def _news_fingerprint(keyword):
+    """Short hash of the keyword's current top news URLs, or "" if none were found."""
+    articles = []
+    if re.search(r'[가-힣]', keyword) and Config.NAVER_CLIENT_ID:
+        articles = fetch_naver_news(keyword, num_results=FINGERPRINT_ARTICLES)
+    if not articles:
+        articles = fetch_google_news_rss(keyword, num_results=FINGERPRINT_ARTICLES)
+    urls = sorted({a["url"] for a in articles[:FINGERPRINT_ARTICLES]})
+    if not urls:
+        return ""
+    return hashlib.sha1("\n".join(urls).encode("utf-8")).hexdigest()[:16]
+
+
+def _latest_insights(keyword_ids):
+    """{keyword_id: (news_fingerprint, generated_at)} of each keyword's latest insight."""
+    latest_subq = (
+        db.session.query(NewsInsight.keyword_id, func.max(NewsInsight.id).label("max_id"))
+        .filter(NewsInsight.keyword_id.in_(keyword_ids))
+        .group_by(NewsInsight.keyword_id)
+        .subquery()
+    )
+    rows = (
+        db.session.query(NewsInsight.keyword_id, NewsInsight.news_fingerprint, NewsInsight.generated_at)
+        .join(latest_subq, NewsInsight.id == latest_subq.c.max_id)
+        .all()
+    )
+    return {kw_id: (fp, generated_at) for kw_id, fp, generated_at in rows}
+
+
+def _unchanged(previous, fingerprint):
+    if not fingerprint or previous is None:
+        return False
+    prev_fp, generated_at = previous
+    age = datetime.now(timezone.utc) - generated_at.replace(tzinfo=timezone.utc)
+    return prev_fp == fingerprint and age < MAX_SKIP_AGE
+
+
+def _save_insight(kw_id, keyword_text, insight_text, source_articles, news_fingerprint=""):
+    """Add a NewsInsight row (caller commits). Returns True if one was added."""
+    if not insight_text:
+        logger.info("No insight generated for keyword '%s'", keyword_text)
+        return False
+    if db.session.get(InsightKeyword, kw_id) is None:
+        logger.info("Keyword '%s' was deleted during the run — insight dropped", keyword_text)
+        return False
+    db.session.add(NewsInsight(
+        keyword_id=kw_id,
+        insight_text=insight_text,
+        source_articles_json=json.dumps(source_articles, ensure_ascii=False),
+        news_fingerprint=news_fingerprint or "",
+    ))
+    logger.info("Generated insight for '%s'", keyword_text)
+    return True
+
+
+def _cleanup_old_insights():
+    cutoff = datetime.now(timezone.utc) - RETENTION
+    NewsInsight.query.filter(NewsInsight.generated_at < cutoff).delete()
+    db.session.commit()
+
+
+# --- Runs and tasks ---
+
+def active_run(mode):
+    """The unfinished run of mode, if any (at most one per mode exists at a time)."""
+    return InsightRun.query.filter_by(active_key=mode).first()
+
+
+def active_runs():
+    """Every unfinished run (one per mode at most)."""
+    return InsightRun.query.filter(InsightRun.active_key.isnot(None)).order_by(InsightRun.id).all()
+
+
+def start_run(mode):
+    """Start a run of mode with one pending task per keyword.
+
+    Returns (run, created). If a run of the same mode is already in progress
+    (in any worker), that run is returned with created=False; (None, False)
+    if there are no keywords.
+    """
+    existing = active_run(mode)
+    if existing is not None:
+        return existing, False
+    keywords = InsightKeyword.query.order_by(InsightKeyword.position.asc()).all()
+    if not keywords:
+        return None, False
+
+    run = InsightRun(mode=mode, active_key=mode, total=len(keywords))
+    db.session.add(run)
+    try:
+        db.session.flush()
+    except IntegrityError:
+        # Another worker started one first (unique active_key).
+        db.session.rollback()
+        return active_run(mode), False
+    db.session.add_all([
+        InsightTask(run_id=run.id, keyword_id=kw.id, keyword=kw.keyword) for kw in keywords
+    ])
+    db.session.commit()
+    logger.info("Started %s insight run %d (%d keywords)", mode, run.id, len(keywords))
+    return run, True
+
+
+def _fail_exhausted(run_id, now):
+    """Mark tasks whose lease ran out on their last attempt as failed."""
+    InsightTask.query.filter(
+        InsightTask.run_id == run_id,
+        InsightTask.status == "running",
+        InsightTask.lease_until < now,
+        InsightTask.attempts >= MAX_ATTEMPTS,
+    ).update({
+        "status": "failed", "lease_until": None, "finished_at": now,
+        "error": "lease expired on final attempt",
+    }, synchronize_session=False)
+
+
+def _claim_task(run_id):
+    """Lease the next pending (or lease-expired) task of run_id, or return None."""
+    now = datetime.utcnow()
+    _fail_exhausted(run_id, now)
+    claimable = and_(
+        InsightTask.run_id == run_id,
+        or_(InsightTask.status == "pending",
+            and_(InsightTask.status == "running", InsightTask.lease_until < now)),
+        InsightTask.attempts < MAX_ATTEMPTS,
+    )
+    for (task_id,) in db.session.query(InsightTask.id).filter(claimable).order_by(InsightTask.id).limit(10).all():
+        result = db.session.execute(
+            update(InsightTask)
+            .where(InsightTask.id == task_id, claimable)
+            .values(status="running", owner=_OWNER, lease_until=now + TASK_LEASE,
+                    attempts=InsightTask.attempts + 1)
+        )
+        db.session.commit()
+        if result.rowcount:
+            return db.session.get(InsightTask, task_id, populate_existing=True)
+    db.session.commit()
+    return None
+
+
+def _finish_task(task, status, error=""):
+    task.status = status
+    task.lease_until = None
+    task.finished_at = datetime.utcnow()
+    task.error = (error or "")[:2000]
+
+
+def _retry_or_fail(task, error):
+    if task.attempts >= MAX_ATTEMPTS:
+        _finish_task(task, "failed", error)
+    else:
+        task.status = "pending"
+        task.lease_until = None
+        task.error = (error or "")[:2000]
+
+
+def _finish_run_if_complete(run_id):
+    unfinished = (
+        InsightTask.query
+        .filter(InsightTask.run_id == run_id, InsightTask.status.in_(_UNFINISHED))
+        .count()
+    )
+    if unfinished:
+        return False
+    run = db.session.get(InsightRun, run_id)
+    if run is None or run.active_key is None:
+        return True
+    run.active_key = None
+    run.status = "done"
+    run.finished_at = datetime.utcnow()
+    db.session.commit()
+    counts = dict(
+        db.session.query(InsightTask.status, func.count(InsightTask.id))
+        .filter(InsightTask.run_id == run_id)
+        .group_by(InsightTask.status)
+        .all()
+    )
+    logger.info("Insight run %d finished: %s", run_id, counts)
+    _cleanup_old_insights()
+    return True
+
+
+def _process_keyword(keyword, previous):
+    """Worker: network/API calls only, no DB access.
+
+    Returns ("skipped" | "done", fingerprint, insight_text, source_articles).
+    """
+    fingerprint = _news_fingerprint(keyword)
+    if _unchanged(previous, fingerprint):
+        return "skipped", fingerprint, None, []
+    insight_text, source_articles = _generate_insight(keyword)
+    return "done", fingerprint, insight_text, source_articles
+
+
+def run_sync(run_id):
+    """Work through run_id's tasks with up to SYNC_CONCURRENCY keywords in flight.
+
+    Safe to call again for an interrupted run: only unfinished tasks are claimed.
+    """
+    run = db.session.get(InsightRun, run_id)
+    if run is None or run.active_key is None:
+        return
+
+    in_flight = {}
+    with ThreadPoolExecutor(max_workers=SYNC_CONCURRENCY) as executor:
+        while True:
+            while len(in_flight) < SYNC_CONCURRENCY:
+                task = _claim_task(run_id)
+                if task is None:
+                    break
+                previous = _latest_insights([task.keyword_id]).get(task.keyword_id)
+                future = executor.submit(_process_keyword, task.keyword, previous)
+                in_flight[future] = task.id
+            if not in_flight:
+                break
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                task = db.session.get(InsightTask, in_flight.pop(future))
+                try:
+                    status, fingerprint, insight_text, source_articles = future.result()
+                except Exception as e:
+                    logger.error("Insight for '%s' failed (attempt %d): %s", task.keyword, task.attempts, e)
+                    _retry_or_fail(task, str(e))
+                    db.session.commit()
+                    continue
+                task.fingerprint = fingerprint
+                if status == "done":
+                    _save_insight(task.keyword_id, task.keyword, insight_text, source_articles, fingerprint)
+                _finish_task(task, status)
+                db.session.commit()
+
+    _finish_run_if_complete(run_id)
+
+
+def _submit_batch(run):
+    """Fingerprint the run's pending tasks and submit the changed ones as one batch."""
+    tasks = InsightTask.query.filter_by(run_id=run.id, status="pending").order_by(InsightTask.id).all()
+    if not tasks:
+        return
+    previous = _latest_insights([t.keyword_id for t in tasks])
+    with ThreadPoolExecutor(max_workers=min(4, len(tasks))) as executor:
+        fingerprints = list(executor.map(lambda t: _news_fingerprint(t.keyword), tasks))
+
+    to_submit = []
+    for task, fingerprint in zip(tasks, fingerprints):
+        task.fingerprint = fingerprint
+        if _unchanged(previous.get(task.keyword_id), fingerprint):
+            _finish_task(task, "skipped")
+        else:
+            to_submit.append(task)
+    db.session.commit()
+    if not to_submit:
+        return
+
+    batch = llm.batches.create(requests=[
+        {"custom_id": f"task-{task.id}", "params": _insight_request(task.keyword)}
+        for task in to_submit
+    ])
+    now = datetime.utcnow()
+    for task in to_submit:
+        task.status = "running"
+        task.owner = batch.id
+        task.lease_until = now + BATCH_LEASE
+        task.attempts = (task.attempts or 0) + 1
+    run.batch_id = batch.id
+    db.session.commit()
+    logger.info("Submitted insight batch %s for run %d (%d keywords)", batch.id, run.id, len(to_submit))
+
+
+def _covered_since_submit(task, latest):
+    """True if a sync run saved an insight for the same news while task's batch was pending."""
+    if not task.fingerprint or latest is None or task.lease_until is None:
+        return False
+    fingerprint, generated_at = latest
+    return fingerprint == task.fingerprint and generated_at > task.lease_until - BATCH_LEASE
+
+
+def _collect_batch(run):
+    """Store results of the run's batch if it has ended."""
+    batch_id = run.batch_id
+    batch = llm.batches.retrieve(batch_id)
+    if batch.processing_status != "ended":
+        return
+
+    tasks = {t.id: t for t in InsightTask.query.filter_by(run_id=run.id, owner=batch_id).all()}
+    latest = _latest_insights([t.keyword_id for t in tasks.values()])
+    for entry in llm.batches.results(batch_id):
+        task = tasks.pop(int(entry.custom_id.removeprefix("task-")), None)
+        if task is None or task.status != "running":
+            continue
+        if entry.result.type != "succeeded":
+            logger.warning("Insight batch entry for '%s' %s", task.keyword, entry.result.type)
+            _retry_or_fail(task, f"batch result: {entry.result.type}")
+            continue
+        if _covered_since_submit(task, latest.get(task.keyword_id)):
+            _finish_task(task, "skipped")
+            continue
+        insight_text, source_articles = _parse_insight_response(task.keyword, entry.result.message)
+        _save_insight(task.keyword_id, task.keyword, insight_text, source_articles, task.fingerprint)
+        _finish_task(task, "done")
+    for task in tasks.values():
+        if task.status == "running":
+            _retry_or_fail(task, "missing from batch results")
+    run.batch_id = None
+    db.session.commit()
+    logger.info("Collected insight batch %s for run %d", batch_id, run.id)
+
+
+def advance_batch_run(run_id):
+    """Move a batch run forward: collect an ended batch, submit any pending tasks."""
+    run = db.session.get(InsightRun, run_id)
+    if run is None or run.active_key is None:
+        return
+    if run.batch_id:
+        _collect_batch(run)
+    if not run.batch_id:
+        _submit_batch(run)
+    _finish_run_if_complete(run_id)
+
+
+def start_batch_run():
+    """Scheduled entry point: start (or resume) a batch run."""
+    run, created = start_run("batch")
+    if run is None:
+        return
+    advance_batch_run(run.id)
+
+
+def run_status():
+    """JSON-ready progress of the unfinished sync run, else the latest run, read from the DB."""
+    run = active_run("sync") or InsightRun.query.order_by(InsightRun.id.desc()).first()
+    if run is None:
+        return {"running": False, "completed": [], "skipped": [], "failed": [], "total": 0}
+    tasks = InsightTask.query.filter_by(run_id=run.id).all()
+
+    def _iso(dt):
+        return dt.isoformat() + "Z" if dt else None
+
+    return {
+        "run_id": run.id,
+        "mode": run.mode,
+        "running": run.active_key is not None,
+        "total": run.total,
+        "completed": [t.keyword_id for t in tasks if t.status not in _UNFINISHED],
+        "skipped": [t.keyword_id for t in tasks if t.status == "skipped"],
+        "failed": [t.keyword_id for t in tasks if t.status == "failed"],
+        "started_at": _iso(run.created_at),
+        "finished_at": _iso(run.finished_at),
+    }
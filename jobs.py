@@ -0,0 +1,253 @@
+"""Background job queue — bounded worker pool + DB lease rows for cross-worker dedup.
+
+Jobs can also be debounced: debounce() pushes the key's due time back on every
+call, and the job runs once after the calls stop (the quiet period), on
+whichever worker fires first.
+"""
+
+import logging
+import os
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError
+
+from models import JobLease, db
+
+logger = logging.getLogger(__name__)
+
+_OWNER = f"{socket.gethostname()}:{os.getpid()}"
+
+
+class JobQueue:
+    """Run background jobs on a bounded thread pool, one live run per job key.
+
+    Every key has a ``JobLease`` row. ``submit`` only hands the job to the pool
+    after winning a conditional UPDATE on that row, so the same key is never
+    queued twice — not within this process, and not across gunicorn workers.
+    """
+
+    def __init__(self, app=None, max_workers=2):
+        self.app = None
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+        self._timers = {}  # debounced key -> this process's pending Timer
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.max_workers = app.config.get("JOB_QUEUE_WORKERS", self.max_workers)
+
+    def _get_executor(self):
+        # Created lazily so a forked gunicorn worker never inherits pool threads.
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="job"
+                )
+            return self._executor
+
+    def _acquire(self, key, lease_seconds, min_interval, due=False):
+        """Take the lease for key. Returns True if this worker now owns it.
+
+        due: only take it if a debounced run is due, and consume that request.
+        """
+        now = datetime.utcnow()
+        values = {
+            "status": "queued",
+            "owner": _OWNER,
+            "lease_until": now + timedelta(seconds=lease_seconds),
+            "queued_at": now,
+        }
+        conditions = [
+            JobLease.key == key,
+            or_(JobLease.lease_until.is_(None), JobLease.lease_until < now),
+            or_(JobLease.queued_at.is_(None),
+                JobLease.queued_at < now - timedelta(seconds=min_interval)),
+        ]
+        if due:
+            conditions.append(JobLease.due_at <= now)
+            values["due_at"] = None
+        result = db.session.execute(update(JobLease).where(*conditions).values(**values))
+        db.session.commit()
+        if result.rowcount:
+            return True
+        if due or db.session.query(JobLease.id).filter_by(key=key).first() is not None:
+            return False
+        try:
+            db.session.add(JobLease(key=key, **values))
+            db.session.commit()
+            return True
+        except IntegrityError:
+            # Another worker inserted the row first — it owns the lease.
+            db.session.rollback()
+            return False
+
+    def submit(self, key, func, *args, lease_seconds=600, min_interval=0):
+        """Queue func(*args) under key unless it is already queued/running.
+
+        min_interval throttles re-runs: the job is skipped if it was last queued
+        less than min_interval seconds ago. Must be called inside an app context.
+        Returns True if the job was queued.
+        """
+        return self._submit(key, func, args, lease_seconds, min_interval)
+
+    def _submit(self, key, func, args, lease_seconds, min_interval, due=False):
+        try:
+            acquired = self._acquire(key, lease_seconds, min_interval, due=due)
+        except Exception as e:
+            db.session.rollback()
+            logger.error("Job lease failed for %s: %s", key, e)
+            return False
+        if not acquired:
+            return False
+        try:
+            self._get_executor().submit(self._run, key, func, args)
+        except RuntimeError as e:
+            # Pool already shut down (interpreter exit) — give the lease back.
+            logger.warning("Job %s not queued: %s", key, e)
+            self._finish(key, "failed", str(e))
+            return False
+        return True
+
+    def debounce(self, key, func, *args, delay=30, lease_seconds=600):
+        """Run func(*args) under key once no debounce() call came for delay seconds.
+
+        Each call moves the key's due time to now + delay, so a burst of calls
+        coalesces into one run after the burst. A call made while the job is
+        running schedules exactly one follow-up run. Must be called inside an
+        app context.
+        """
+        due_at = datetime.utcnow() + timedelta(seconds=delay)
+        try:
+            updated = JobLease.query.filter_by(key=key).update(
+                {"due_at": due_at}, synchronize_session=False)
+            if not updated:
+                db.session.add(JobLease(key=key, due_at=due_at))
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()  # another worker created the row; retry once
+            JobLease.query.filter_by(key=key).update({"due_at": due_at}, synchronize_session=False)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error("Job debounce failed for %s: %s", key, e)
+            return
+        self._arm(delay, key, func, args, lease_seconds)
+
+    def submit_due(self, key, func, *args, lease_seconds=600):
+        """Start key's debounced run if it is due. Returns True if queued.
+
+        Called by the debounce timers, and periodically as a sweep for runs
+        whose timer died with its worker.
+        """
+        return self._submit(key, func, args, lease_seconds, 0, due=True)
+
+    def pending(self, key):
+        """True if a debounced run of key is waiting — a running job is superseded."""
+        lease = JobLease.query.filter_by(key=key).first()
+        return bool(lease and lease.due_at)
+
+    def _arm(self, delay, key, func, args, lease_seconds):
+        # One timer per key per process; a newer call replaces the pending one.
+        timer = threading.Timer(delay, self._fire, (key, func, args, lease_seconds))
+        timer.daemon = True
+        with self._lock:
+            previous = self._timers.get(key)
+            if previous is not None:
+                previous.cancel()
+            self._timers[key] = timer
+        timer.start()
+
+    def _fire(self, key, func, args, lease_seconds):
+        with self._lock:
+            if self._timers.get(key) is threading.current_thread():
+                del self._timers[key]
+        with self.app.app_context():
+            try:
+                if self.submit_due(key, func, *args, lease_seconds=lease_seconds):
+                    return
+                lease = JobLease.query.filter_by(key=key).first()
+                if lease is None or lease.due_at is None:
+                    return  # already run by another timer/worker
+                # Pushed back by a later call, or waiting for the current run.
+                wait = (lease.due_at - datetime.utcnow()).total_seconds()
+                if lease.lease_until and lease.lease_until > datetime.utcnow():
+                    wait = max(wait, 5)
+                db.session.rollback()
+            except Exception as e:
+                db.session.rollback()
+                logger.error("Debounced job %s failed to fire: %s", key, e)
+                return
+        self._arm(max(wait, 1), key, func, args, lease_seconds)
+
+    def _finish(self, key, status, error=""):
+        JobLease.query.filter_by(key=key, owner=_OWNER).update({
+            "status": status,
+            "lease_until": None,
+            "finished_at": datetime.utcnow(),
+            "last_error": error[:2000],
+        }, synchronize_session=False)
+        db.session.commit()
+
+    def _run(self, key, func, args):
+        with self.app.app_context():
+            try:
+                JobLease.query.filter_by(key=key, owner=_OWNER).update({
+                    "status": "running",
+                    "started_at": datetime.utcnow(),
+                    "run_count": JobLease.run_count + 1,
+                }, synchronize_session=False)
+                db.session.commit()
+                func(*args)
+            except Exception as e:
+                db.session.rollback()
+                logger.error("Job %s failed: %s", key, e, exc_info=True)
+                try:
+                    self._finish(key, "failed", str(e))
+                except Exception:
+                    db.session.rollback()
+                return
+            try:
+                self._finish(key, "done")
+            except Exception as e:
+                db.session.rollback()
+                logger.error("Failed to release job lease %s: %s", key, e)
+
+    def is_active(self, key):
+        """True while key is queued or running under a live lease (any worker)."""
+        lease = JobLease.query.filter_by(key=key).first()
+        return bool(lease and lease.lease_until and lease.lease_until > datetime.utcnow())
+
+    def status(self, prefix=""):
+        """Return job rows (optionally filtered by key prefix) as JSON-ready dicts."""
+        query = JobLease.query
+        if prefix:
+            query = query.filter(JobLease.key.startswith(prefix))
+        now = datetime.utcnow()
+
+        def _iso(dt):
+            return dt.isoformat() + "Z" if dt else None
+
+        return [
+            {
+                "key": j.key,
+                "status": j.status,
+                "active": bool(j.lease_until and j.lease_until > now),
+                "owner": j.owner,
+                "queued_at": _iso(j.queued_at),
+                "started_at": _iso(j.started_at),
+                "finished_at": _iso(j.finished_at),
+                "last_error": j.last_error or "",
+                "run_count": j.run_count or 0,
+            }
+            for j in query.order_by(JobLease.key).all()
+        ]
+
+
+job_queue = JobQueue()
@@ -0,0 +1,98 @@
+"""Landing page statistics for /books and /screens, kept in LibraryStats.
+
+The numbers are computed with SQL aggregates (COUNT/AVG/SUM over CASE, a
+GROUP BY on the year prefix of date_read) instead of loading every row, and
+stored as JSON tagged with the LibraryProfile version of the library part.
+That version is already bumped by every add/rate/delete flush and by bulk
+imports (see profiles.py), so a page view is a version lookup plus one row
+read; the aggregates only run again after the library changed.
+"""
+
+import json
+import logging
+
+from sqlalchemy import case, func
+from sqlalchemy.exc import IntegrityError
+
+import profiles
+from models import LibraryStats, MyBook, MyScreen, db
+
+logger = logging.getLogger(__name__)
+
+
+def _avg(value):
+    return round(float(value), 1) if value is not None else 0
+
+
+def book_stats():
+    """{total_read, avg_rating, yearly_stats: [[year, count], ...] newest first, hall_of_fame_count}."""
+    total_read, avg_rating = (
+        db.session.query(
+            func.count(MyBook.id),
+            func.avg(case((MyBook.my_rating > 0, MyBook.my_rating))),
+        )
+        .filter(MyBook.shelf == "read")
+        .one()
+    )
+    # date_read is YYYY/MM/DD
+    year = func.substr(MyBook.date_read, 1, 4)
+    yearly = (
+        db.session.query(year, func.count(MyBook.id))
+        .filter(MyBook.shelf == "read", MyBook.date_read.like("____/%"))
+        .group_by(year)
+        .all()
+    )
+    yearly_stats = sorted(([int(y), n] for y, n in yearly if y.isdigit()), reverse=True)
+    hall_of_fame_count = db.session.query(func.count(MyBook.id)).filter(MyBook.hall_of_fame.is_(True)).scalar()
+    return {
+        "total_read": total_read,
+        "avg_rating": _avg(avg_rating),
+        "yearly_stats": yearly_stats,
+        "hall_of_fame_count": hall_of_fame_count,
+    }
+
+
+def screen_stats():
+    """{total_watched, avg_rating, hall_of_fame_count, watching_count, want_count}."""
+    watched = MyScreen.shelf == "watched"
+    total_watched, avg_rating, hall_of_fame_count, watching_count, want_count = db.session.query(
+        func.sum(case((watched, 1), else_=0)),
+        func.avg(case((watched & (MyScreen.my_rating > 0), MyScreen.my_rating))),
+        func.sum(case((MyScreen.hall_of_fame.is_(True), 1), else_=0)),
+        func.sum(case((MyScreen.shelf == "watching", 1), else_=0)),
+        func.sum(case((MyScreen.shelf == "want-to-watch", 1), else_=0)),
+    ).one()
+    return {
+        "total_watched": total_watched or 0,
+        "avg_rating": _avg(avg_rating),
+        "hall_of_fame_count": hall_of_fame_count or 0,
+        "watching_count": watching_count or 0,
+        "want_count": want_count or 0,
+    }
+
+
+_BUILDERS = {"books": book_stats, "screens": screen_stats}
+
+
+def get(kind):
+    """Stats for kind ("books" | "screens"), recomputed only if the library changed."""
+    # Read the version before aggregating: a write landing in between leaves
+    # the row tagged with the older version, so the next view recomputes.
+    version = profiles.version(kind)
+    row = LibraryStats.query.filter_by(kind=kind).first()
+    if row is not None and row.built_version == version:
+        return json.loads(row.stats or "{}")
+
+    stats = _BUILDERS[kind]()
+    try:
+        if row is None:
+            row = LibraryStats(kind=kind)
+            db.session.add(row)
+        row.stats = json.dumps(stats)
+        row.built_version = version
+        db.session.commit()
+        logger.info("Rebuilt %s stats (version %d)", kind, version)
+    except IntegrityError:
+        # Another worker stored them first
+        db.session.rollback()
+    return stats
@@ -0,0 +1,485 @@
+"""Shared gateway for Anthropic API calls.
+
+Every feature (chats, card OCR, recommendations, insights, chat summaries)
+calls through ``llm`` instead of building its own client, so they share:
+
+- a cross-worker token bucket for requests/min and tokens/min, kept in a small
+  SQLite file (LLM_LIMITS_PATH, default instance/llm_limits.db) with a
+  per-process fallback, like cache.py;
+- adaptive concurrency per process (AIMD): the in-flight limit halves on a
+  429/529 and grows back by one per `limit` successes. A Retry-After pause is
+  shared with every worker through the same file;
+- priority lanes: INTERACTIVE calls (chat, OCR) go first when a slot frees,
+  and BACKGROUND calls (insights, recommendation runs, summaries) only use
+  BACKGROUND_SHARE of the bucket and of the concurrency limit, so a chat never
+  queues behind a run of background jobs.
+
+The client itself is created lazily, once per process (re-created after a
+fork, so gunicorn workers never share sockets), with explicit timeouts and
+keep-alive limits. Its connection pool is instrumented: connection_stats()
+reports how many requests reused a pooled connection versus opened a new one.
+
+Usage:
+    from llm import BACKGROUND, llm
+    response = llm.create(model=..., max_tokens=..., messages=[...])
+    with llm.stream(model=..., ...) as stream: ...
+    llm.create(priority=BACKGROUND, ...)
+    llm.batches.create(requests=[...])
+"""
+
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+import anthropic
+
+try:
+    import httpx
+except ImportError:  # SDK builds that ship the httpx2 fork
+    import httpx2 as httpx
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 0
+BACKGROUND = 1
+
+REQUESTS_PER_MINUTE = int(os.environ.get("LLM_REQUESTS_PER_MINUTE", "50"))
+TOKENS_PER_MINUTE = int(os.environ.get("LLM_TOKENS_PER_MINUTE", "80000"))
+MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "6"))
+BACKGROUND_SHARE = 0.7
+MAX_RETRIES = {INTERACTIVE: 2, BACKGROUND: 5}
+OUTPUT_RESERVE = 1024  # output tokens reserved up front; settled against real usage
+MEDIA_BLOCK_TOKENS = 1600  # flat estimate per image/document block (its base64 isn't text)
+
+CONNECT_TIMEOUT = float(os.environ.get("LLM_CONNECT_TIMEOUT", "10"))
+READ_TIMEOUT = float(os.environ.get("LLM_READ_TIMEOUT", "300"))  # long non-streamed generations
+MAX_CONNECTIONS = int(os.environ.get("LLM_MAX_CONNECTIONS", str(MAX_CONCURRENCY * 2)))
+KEEPALIVE_CONNECTIONS = int(os.environ.get("LLM_KEEPALIVE_CONNECTIONS", str(MAX_CONCURRENCY)))
+KEEPALIVE_EXPIRY = float(os.environ.get("LLM_KEEPALIVE_EXPIRY", "60"))
+STATS_LOG_EVERY = 100  # log pool stats every N requests
+
+_DEFAULT_PATH = os.path.join(os.path.abspath(os.path.dirname(__file__)), "instance", "llm_limits.db")
+
+# Older SDKs have no OverloadedError and report 529 as an InternalServerError
+_RETRYABLE = (anthropic.RateLimitError, anthropic.InternalServerError, anthropic.APIConnectionError,
+              getattr(anthropic, "OverloadedError", anthropic.InternalServerError))
+
+
+class MemoryBuckets:
+    """Process-local buckets (single worker / SQLite unavailable)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._levels = {}
+        self._pause_until = 0.0
+
+    def take(self, costs):
+        with self._lock:
+            return _take(costs, self._levels, time.time())
+
+    def settle(self, name, delta):
+        with self._lock:
+            level, updated = self._levels.get(name, (None, time.time()))
+            if level is not None:
+                self._levels[name] = (level - delta, updated)
+
+    def pause_until(self):
+        return self._pause_until
+
+    def pause(self, until):
+        self._pause_until = max(self._pause_until, until)
+
+
+class SQLiteBuckets:
+    """Host-wide buckets on a shared SQLite file (one connection per thread)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn().executescript(
+            "CREATE TABLE IF NOT EXISTS llm_bucket (name TEXT PRIMARY KEY, level REAL NOT NULL, updated REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS llm_pause (id INTEGER PRIMARY KEY CHECK (id = 1), until REAL NOT NULL);"
+        )
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def take(self, costs):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            names = [name for name, *_ in costs]
+            rows = conn.execute(
+                f"SELECT name, level, updated FROM llm_bucket WHERE name IN ({','.join('?' * len(names))})",
+                names,
+            ).fetchall()
+            levels = {name: (level, updated) for name, level, updated in rows}
+            wait = _take(costs, levels, time.time())
+            conn.executemany(
+                "INSERT OR REPLACE INTO llm_bucket (name, level, updated) VALUES (?, ?, ?)",
+                [(name, *levels[name]) for name in names],
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+    def settle(self, name, delta):
+        self._conn().execute("UPDATE llm_bucket SET level = level - ? WHERE name = ?", (delta, name))
+
+    def pause_until(self):
+        row = self._conn().execute("SELECT until FROM llm_pause WHERE id = 1").fetchone()
+        return row[0] if row else 0.0
+
+    def pause(self, until):
+        self._conn().execute(
+            "INSERT INTO llm_pause (id, until) VALUES (1, ?) "
+            "ON CONFLICT(id) DO UPDATE SET until = MAX(until, excluded.until)",
+            (until,),
+        )
+
+
+def _take(costs, levels, now):
+    """Refill and debit buckets in place. Returns 0 if taken, else seconds to wait.
+
+    costs: [(name, amount, rate_per_sec, capacity, floor)]. A take succeeds only
+    if every bucket stays at or above its floor; nothing is debited otherwise.
+    A request bigger than the headroom is let through once its bucket is full.
+    """
+    refilled = {}
+    wait = 0.0
+    for name, amount, rate, capacity, floor in costs:
+        level, updated = levels.get(name, (capacity, now))
+        level = min(capacity, level + (now - updated) * rate)
+        refilled[name] = level
+        if level - amount < floor and level < capacity:
+            wait = max(wait, (amount + floor - level) / rate)
+    for name, amount, *_ in costs:
+        levels[name] = (refilled[name] - (0 if wait else amount), now)
+    return wait
+
+
+class _Lanes:
+    """Per-process in-flight limit with AIMD sizing and interactive-first wakeups."""
+
+    def __init__(self, limit):
+        self.max_limit = limit
+        self.limit = float(limit)
+        self.in_flight = 0
+        self._waiting = {INTERACTIVE: 0, BACKGROUND: 0}
+        self._cond = threading.Condition()
+
+    def _cap(self, priority):
+        if priority == INTERACTIVE:
+            return max(1, int(self.limit))
+        return max(1, int(self.limit * BACKGROUND_SHARE))
+
+    def acquire(self, priority):
+        with self._cond:
+            self._waiting[priority] += 1
+            try:
+                while self.in_flight >= self._cap(priority) or (
+                    priority != INTERACTIVE and self._waiting[INTERACTIVE]
+                ):
+                    self._cond.wait(timeout=5)
+                self.in_flight += 1
+            finally:
+                self._waiting[priority] -= 1
+
+    def release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def on_success(self):
+        with self._cond:
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+
+    def on_limited(self):
+        with self._cond:
+            self.limit = max(1.0, self.limit / 2)
+            return self.limit
+
+
+class _PoolStats:
+    """Counts requests that opened a new connection vs reused a pooled one.
+
+    Fed by the httpx trace extension: a request whose trace has no
+    connection.connect_tcp event was sent on a kept-alive connection.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+        self.tls_handshakes = 0
+
+    def on_request(self, request):
+        def trace(name, info):
+            if name == "connection.connect_tcp.started":
+                with self._lock:
+                    self.new_connections += 1
+            elif name == "connection.start_tls.started":
+                with self._lock:
+                    self.tls_handshakes += 1
+            elif name.endswith("send_request_headers.started"):
+                with self._lock:
+                    self.requests += 1
+                    total = self.requests
+                if total % STATS_LOG_EVERY == 0:
+                    logger.info("Anthropic connection pool: %s", self.snapshot())
+
+        request.extensions["trace"] = trace
+
+    def snapshot(self):
+        with self._lock:
+            reused = max(0, self.requests - self.new_connections)
+            return {
+                "pid": os.getpid(),
+                "requests": self.requests,
+                "new_connections": self.new_connections,
+                "reused_connections": reused,
+                "tls_handshakes": self.tls_handshakes,
+                "reuse_ratio": round(reused / self.requests, 3) if self.requests else None,
+            }
+
+
+def _build_client(stats):
+    timeout = anthropic.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT)
+    http_client = anthropic.DefaultHttpxClient(
+        timeout=timeout,
+        limits=httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        ),
+        event_hooks={"request": [stats.on_request]},
+    )
+    # Retries happen in the gateway, so backoff feeds the limiter.
+    return anthropic.Anthropic(max_retries=0, timeout=timeout, http_client=http_client)
+
+
+def _without_media(value):
+    """(value with image/document blocks removed, number removed), at any depth."""
+    if isinstance(value, dict):
+        if value.get("type") in ("image", "document") and "source" in value:
+            return None, 1
+        count = 0
+        result = {}
+        for key, item in value.items():
+            result[key], n = _without_media(item)
+            count += n
+        return result, count
+    if isinstance(value, (list, tuple)):
+        count = 0
+        result = []
+        for item in value:
+            item, n = _without_media(item)
+            count += n
+            if item is not None:
+                result.append(item)
+        return result, count
+    return value, 0
+
+
+def _estimate_input_tokens(params):
+    messages, media = _without_media(params.get("messages"))
+    payload = json.dumps(
+        [params.get("system"), messages, params.get("tools")],
+        ensure_ascii=False, default=str,
+    )
+    return len(payload) // 3 + media * MEDIA_BLOCK_TOKENS
+
+
+def _usage_tokens(usage):
+    if usage is None:
+        return None
+    return (
+        (usage.input_tokens or 0)
+        + (getattr(usage, "cache_creation_input_tokens", 0) or 0)
+        + (usage.output_tokens or 0)
+    )
+
+
+def _retry_after(error):
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers.get("retry-after")) if response is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _is_limited(error):
+    """429, or 529 overloaded."""
+    return isinstance(error, anthropic.RateLimitError) or getattr(error, "status_code", None) == 529
+
+
+def _is_retryable(error):
+    """Rate limited, overloaded, any other 5xx, or a connection error / timeout."""
+    return isinstance(error, _RETRYABLE) or (getattr(error, "status_code", None) or 0) >= 500
+
+
+class LLMGateway:
+    """Rate-limited, priority-aware access to one shared Anthropic client."""
+
+    def __init__(self):
+        self._client = None
+        self._client_pid = None
+        self._client_lock = threading.Lock()
+        self._stats = _PoolStats()
+        self._lanes = _Lanes(MAX_CONCURRENCY)
+        self._buckets = None
+        self._buckets_lock = threading.Lock()
+
+    @property
+    def client(self):
+        """The process-wide Anthropic client (thread-safe; one pool per process)."""
+        if self._client is None or self._client_pid != os.getpid():
+            with self._client_lock:
+                if self._client is None or self._client_pid != os.getpid():
+                    # A client inherited over fork() shares sockets with the
+                    # parent; start this process on its own pool and counters.
+                    self._stats = _PoolStats()
+                    self._client = _build_client(self._stats)
+                    self._client_pid = os.getpid()
+        return self._client
+
+    @property
+    def buckets(self):
+        """The rate-limit buckets, opened on first use rather than at import."""
+        if self._buckets is None:
+            with self._buckets_lock:
+                if self._buckets is None:
+                    self._buckets = _make_buckets()
+        return self._buckets
+
+    def connection_stats(self):
+        """Connection reuse counters for this process's client."""
+        return self._stats.snapshot()
+
+    @property
+    def batches(self):
+        """Message Batches API (not rate limited here — batches have their own quota)."""
+        return self.client.messages.batches
+
+    def create(self, priority=INTERACTIVE, **params):
+        """messages.create with rate limiting, priority and retries."""
+        attempt = 0
+        while True:
+            reserved = self._reserve(priority, params)
+            self._lanes.acquire(priority)
+            try:
+                response = self.client.messages.create(**params)
+            except Exception as e:
+                error = e
+            else:
+                self._lanes.on_success()
+                self._settle(reserved, getattr(response, "usage", None))
+                return response
+            finally:
+                self._lanes.release()
+            attempt = self._after_error(error, reserved, priority, attempt)
+
+    @contextmanager
+    def stream(self, priority=INTERACTIVE, **params):
+        """messages.stream holding one concurrency slot for the whole stream.
+
+        Errors opening the stream are retried; errors mid-stream propagate.
+        """
+        attempt = 0
+        while True:
+            reserved = self._reserve(priority, params)
+            self._lanes.acquire(priority)
+            with ExitStack() as stack:
+                stack.callback(self._lanes.release)
+                try:
+                    stream = stack.enter_context(self.client.messages.stream(**params))
+                except Exception as e:
+                    error = e
+                else:
+                    yield stream
+                    self._lanes.on_success()
+                    snapshot = getattr(stream, "current_message_snapshot", None)
+                    self._settle(reserved, getattr(snapshot, "usage", None))
+                    return
+            attempt = self._after_error(error, reserved, priority, attempt)
+
+    def _reserve(self, priority, params):
+        """Wait for the shared pause and bucket capacity; returns tokens reserved."""
+        tokens = _estimate_input_tokens(params) + min(params.get("max_tokens", OUTPUT_RESERVE), OUTPUT_RESERVE)
+        share = 0.0 if priority == INTERACTIVE else 1.0 - BACKGROUND_SHARE
+        costs = [
+            ("requests", 1, REQUESTS_PER_MINUTE / 60, REQUESTS_PER_MINUTE, REQUESTS_PER_MINUTE * share),
+            ("tokens", tokens, TOKENS_PER_MINUTE / 60, TOKENS_PER_MINUTE, TOKENS_PER_MINUTE * share),
+        ]
+        while True:
+            try:
+                pause = self.buckets.pause_until() - time.time()
+                wait = pause if pause > 0 else self.buckets.take(costs)
+            except Exception as e:
+                logger.warning("LLM limiter unavailable (%s) — not throttling this call", e)
+                return 0
+            if wait <= 0:
+                return tokens
+            time.sleep(min(wait, 5.0))
+
+    def _settle(self, reserved, usage):
+        actual = _usage_tokens(usage)
+        if actual is None or not reserved:
+            return
+        try:
+            self.buckets.settle("tokens", actual - reserved)
+        except Exception as e:
+            logger.warning("LLM limiter settle failed: %s", e)
+
+    def _after_error(self, error, reserved, priority, attempt):
+        """Back off after a retryable error; re-raise other errors or when out of retries."""
+        try:
+            self.buckets.settle("tokens", -reserved)  # refund the failed call
+        except Exception:
+            pass
+        if not _is_retryable(error):
+            raise error
+        retry_after = _retry_after(error)
+        if _is_limited(error):
+            limit = self._lanes.on_limited()
+            logger.warning(
+                "Anthropic %s — concurrency limit now %.1f (retry-after=%s)",
+                getattr(error, "status_code", type(error).__name__), limit, retry_after,
+            )
+            if retry_after:
+                try:
+                    self.buckets.pause(time.time() + retry_after)
+                except Exception:
+                    pass
+        attempt += 1
+        if attempt > MAX_RETRIES[priority]:
+            raise error
+        delay = retry_after or min(30.0, 2 ** attempt)
+        time.sleep(delay * random.uniform(0.8, 1.2))
+        return attempt
+
+
+def _make_buckets():
+    path = os.environ.get("LLM_LIMITS_PATH", _DEFAULT_PATH)
+    try:
+        return SQLiteBuckets(path)
+    except (sqlite3.Error, OSError) as e:
+        logger.warning("SQLite LLM limiter unavailable at %s (%s) — using per-process buckets", path, e)
+        return MemoryBuckets()
+
+
+llm = LLMGateway()
@@ -70,6 +70,50 @@ class Recommendation(db.Model):
     generated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
 
 
+class RecommendationSnapshot(db.Model):
+    """Library state the current Recommendation rows were generated from (one row).
+
+    library is a JSON recommender.library_snapshot(); fingerprint hashes it.
+    full_generated_at is the last full (not top-up) generation, naive UTC.
+    version increases with every replacement of the recommendations.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, default=1, nullable=False)
+    fingerprint = db.Column(db.String(64), nullable=False)
+    library = db.Column(db.Text, default="{}")
+    full_generated_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class LibraryProfile(db.Model):
+    """Materialized chat prompt text for one library part (see profiles.py).
+
+    part: "books" | "saved_books" | "screens" | "saved_screens". version is
+    bumped by every flush that writes the part's table; text was built at
+    built_version and is current while the two match.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    part = db.Column(db.String(20), unique=True, nullable=False)
+    version = db.Column(db.Integer, default=0, nullable=False)
+    built_version = db.Column(db.Integer, default=-1, nullable=False)
+    text = db.Column(db.Text, default="")
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class LibraryStats(db.Model):
+    """Landing page statistics for the books or screens library (see library_stats.py).
+
+    kind: "books" | "screens". stats is a JSON object computed from SQL
+    aggregates at built_version, the LibraryProfile version of the library
+    part; it is current while the two match.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), unique=True, nullable=False)
+    built_version = db.Column(db.Integer, default=-1, nullable=False)
+    stats = db.Column(db.Text, default="{}")
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
 class SavedBook(db.Model):
     """찜한 책 — AI 추천에서 저장한 책."""
     id = db.Column(db.Integer, primary_key=True)
@@ -156,6 +200,9 @@ class AnkiDeck(db.Model):
 
 class AnkiCard(db.Model):
     """A single flashcard with SM-2 SRS scheduling fields."""
+    __table_args__ = (
+        db.Index('ix_anki_card_status_next_review', 'status', 'next_review'),
+    )
     id         = db.Column(db.Integer, primary_key=True)
     deck_id    = db.Column(db.Integer, db.ForeignKey('anki_deck.id'), nullable=False, index=True)
     card_type  = db.Column(db.String(20), default='highlight')  # 'highlight' | 'qa'
@@ -220,6 +267,23 @@ class ScreenChatMessage(db.Model):
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
 
 
+class TmdbTitle(db.Model):
+    """TMDB metadata by id, recorded from searches and detail fetches (see tmdb.py)."""
+    __table_args__ = (
+        db.UniqueConstraint('media_type', 'tmdb_id', name='uq_tmdb_title_media_type_id'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    media_type = db.Column(db.String(10), nullable=False)  # "movie" | "tv"
+    tmdb_id = db.Column(db.Integer, nullable=False)
+    title = db.Column(db.String(500), default="")
+    original_title = db.Column(db.String(500), default="")
+    year = db.Column(db.Integer, default=0)
+    overview = db.Column(db.Text, default="")
+    tmdb_rating = db.Column(db.Float, default=0.0)
+    poster_url = db.Column(db.String(500), default="")
+    fetched_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
 class InsightKeyword(db.Model):
     """User-defined keywords for news insight tracking."""
     id = db.Column(db.Integer, primary_key=True)
@@ -234,10 +298,89 @@ class NewsInsight(db.Model):
     keyword_id = db.Column(db.Integer, db.ForeignKey('insight_keyword.id'), nullable=False, index=True)
     insight_text = db.Column(db.Text, nullable=False)
     source_articles_json = db.Column(db.Text, default="")
+    news_fingerprint = db.Column(db.String(64), default="")  # top news URLs when generated
     generated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), index=True)
     keyword = db.relationship('InsightKeyword', backref=db.backref('insights', lazy=True, cascade='all, delete-orphan'))
 
 
+class DailyCounter(db.Model):
+    """Materialized per-day count for a dashboard metric, maintained on write.
+
+    metric: "article_read" | "compliment" | "contact_last" | "habit:<habit name>"
+    """
+    __table_args__ = (
+        db.UniqueConstraint('metric', 'day', name='uq_daily_counter_metric_day'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    metric = db.Column(db.String(200), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    count = db.Column(db.Integer, default=0, nullable=False)
+
+
+class JobLease(db.Model):
+    """Cross-worker lease + status for one background job key (e.g. 'scrape:mk').
+
+    Times are naive UTC. A worker owns the job while lease_until is in the future;
+    an expired lease (crashed worker) can be taken over by any other worker.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(100), unique=True, nullable=False)
+    status = db.Column(db.String(20), default="idle")  # idle|queued|running|done|failed
+    owner = db.Column(db.String(100), default="")  # host:pid of the worker holding the lease
+    lease_until = db.Column(db.DateTime, nullable=True)
+    queued_at = db.Column(db.DateTime, nullable=True)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, default="")
+    run_count = db.Column(db.Integer, default=0)
+    due_at = db.Column(db.DateTime, nullable=True)  # debounced run requested for this time
+
+
+class ChatSummary(db.Model):
+    """Rolling summary of the older part of one chat conversation.
+
+    kind: "books" | "screens" | "contacts". Messages with id <= covered_until_id
+    are folded into summary and no longer sent verbatim.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), unique=True, nullable=False)
+    summary = db.Column(db.Text, default="")
+    covered_until_id = db.Column(db.Integer, default=0, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class InsightRun(db.Model):
+    """One insight generation run over every keyword (see insights.py).
+
+    Times are naive UTC. active_key is the run's mode while it is unfinished
+    and NULL afterwards; its unique constraint keeps at most one run per mode
+    in progress across workers.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    mode = db.Column(db.String(10), nullable=False)  # sync|batch
+    status = db.Column(db.String(20), default="running")  # running|done
+    active_key = db.Column(db.String(10), unique=True, nullable=True)
+    total = db.Column(db.Integer, default=0)
+    batch_id = db.Column(db.String(100), nullable=True)  # batch in flight (batch mode)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+
+class InsightTask(db.Model):
+    """One keyword of an InsightRun, claimed under a lease and retried on failure."""
+    id = db.Column(db.Integer, primary_key=True)
+    run_id = db.Column(db.Integer, db.ForeignKey('insight_run.id'), nullable=False, index=True)
+    keyword_id = db.Column(db.Integer, nullable=False)
+    keyword = db.Column(db.String(200), nullable=False)
+    status = db.Column(db.String(20), default="pending")  # pending|running|done|skipped|failed
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    owner = db.Column(db.String(100), default="")  # host:pid, or the batch id in batch mode
+    lease_until = db.Column(db.DateTime, nullable=True)
+    fingerprint = db.Column(db.String(64), default="")
+    error = db.Column(db.Text, default="")
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+
 def init_default_user():
     """Create default user if not exists. Reads credentials from environment variables."""
     username = os.environ.get("DASHBOARD_USER")
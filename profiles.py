@@ -0,0 +1,124 @@
+"""Materialized chat prompt context for the book and screen libraries.
+
+The chat system prompts embed a profile and sectioned listing of the whole
+library plus the wishlist. Instead of loading every MyBook/MyScreen row and
+rebuilding that text on each message, each part is stored in a LibraryProfile
+row together with the version it was built at.
+
+A session hook bumps a part's version in the same transaction as any flush
+that inserts, updates or deletes rows of its table, so every write path
+(forms, imports, TMDB refreshes) invalidates it without explicit calls. Bulk
+Query.update()/delete() skip session events — call bump() after those.
+A read rebuilds only the parts whose version moved, from column-only queries.
+"""
+
+import logging
+from itertools import chain
+
+from sqlalchemy import event, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models import LibraryProfile, MyBook, MyScreen, SavedBook, SavedScreen, db
+from recommender import build_library_context, build_saved_books_section, build_saved_screens_section, build_watch_context
+
+logger = logging.getLogger(__name__)
+
+# part -> (model, columns the builder reads, builder)
+_PARTS = {
+    "books": (
+        MyBook,
+        ("title", "author", "shelf", "my_rating", "date_read", "hall_of_fame"),
+        build_library_context,
+    ),
+    "saved_books": (SavedBook, ("title", "author", "category"), build_saved_books_section),
+    "screens": (
+        MyScreen,
+        ("title", "media_type", "genres", "year", "my_rating", "shelf", "hall_of_fame"),
+        build_watch_context,
+    ),
+    "saved_screens": (SavedScreen, ("title", "media_type", "category"), build_saved_screens_section),
+}
+_PART_BY_MODEL = {model: part for part, (model, _, _) in _PARTS.items()}
+_CHAT_PARTS = {"books": ("books", "saved_books"), "screens": ("screens", "saved_screens")}
+_TITLE_COLUMNS = {"books": ("title", "author"), "saved_books": ("title", "author"),
+                  "screens": ("title",), "saved_screens": ("title",)}
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_changed_parts(session, _flush_context):
+    parts = {
+        _PART_BY_MODEL[type(obj)]
+        for obj in chain(session.new, session.dirty, session.deleted)
+        if type(obj) in _PART_BY_MODEL
+    }
+    if parts:
+        session.connection().execute(
+            update(LibraryProfile)
+            .where(LibraryProfile.part.in_(parts))
+            .values(version=LibraryProfile.version + 1)
+        )
+
+
+def bump(*parts):
+    """Mark parts stale after a bulk write that bypassed the session. Does not commit."""
+    db.session.execute(
+        update(LibraryProfile)
+        .where(LibraryProfile.part.in_(parts))
+        .values(version=LibraryProfile.version + 1)
+    )
+
+
+def version(part):
+    """Current version of part (0 before its row exists)."""
+    return db.session.query(LibraryProfile.version).filter_by(part=part).scalar() or 0
+
+
+def ensure_rows():
+    """Create the LibraryProfile rows (startup)."""
+    existing = {p for (p,) in db.session.query(LibraryProfile.part)}
+    for part in _PARTS:
+        if part not in existing:
+            db.session.add(LibraryProfile(part=part))
+    db.session.commit()
+
+
+def _rows(part, columns):
+    model = _PARTS[part][0]
+    return db.session.query(*(getattr(model, c) for c in columns)).order_by(model.id).all()
+
+
+def _part_text(part):
+    row = LibraryProfile.query.filter_by(part=part).first()
+    if row is not None and row.built_version == row.version:
+        return row.text or ""
+
+    _, columns, builder = _PARTS[part]
+    version = row.version if row is not None else 0
+    text = builder(_rows(part, columns))
+    try:
+        if row is None:
+            db.session.add(LibraryProfile(part=part, version=version, built_version=version, text=text))
+        else:
+            # Only if no write landed while building; otherwise the next read rebuilds.
+            db.session.execute(
+                update(LibraryProfile)
+                .where(LibraryProfile.part == part, LibraryProfile.version == version)
+                .values(text=text, built_version=version)
+            )
+        db.session.commit()
+        logger.info("Rebuilt %s profile (version %d, %d chars)", part, version, len(text))
+    except IntegrityError:
+        db.session.rollback()
+    return text
+
+
+def chat_context(kind):
+    """Prompt context for kind's chat ("books" | "screens"), rebuilt only where stale."""
+    library, saved = _CHAT_PARTS[kind]
+    return f"{_part_text(library)}\n{_part_text(saved)}"
+
+
+def title_rows(part):
+    """(title[, author]) rows of part — enough for LibraryIndex dedup, no ORM objects."""
+    return _rows(part, _TITLE_COLUMNS[part])
@@ -1,16 +1,38 @@
 """Utility module for Claude-powered book recommendations."""
 
+import hashlib
 import json
 import logging
+import math
 import re
-from collections import Counter
+import threading
+from collections import Counter, defaultdict
 
-import anthropic
+from llm import BACKGROUND, llm
 
 logger = logging.getLogger(__name__)
 
 _REC_MARKER = "[REC]"
 
+_PUNCT_RE = re.compile(r"[^\w\s]")
+_ARTICLE_RE = re.compile(r"^(the|a|an)\s+")
+_WS_RE = re.compile(r"\s+")
+_SUBTITLE_RE = re.compile(r"\s*[:]\s*|\s+[-\u2014\u2013]\s+")
+_PAREN_RE = re.compile(r"[(\[]([^)\]]*)[)\]]")
+
+# Fuzzy title matching (LibraryIndex) — similarity is Jaccard over character trigrams
+FUZZY_SIMILARITY = 0.8  # any author
+FUZZY_AUTHOR_SIMILARITY = 0.6  # same author last name
+SHORT_TITLE_CHARS = 8  # shorter titles: same author and at most FUZZY_MAX_EDITS edits
+FUZZY_MAX_EDITS = 1
+
+# Prompt context tiers — hall of fame and top-rated items are listed one per
+# line up to DETAIL_MAX_ITEMS; the rest is summarized, so prompts stay bounded.
+# Library titles are kept out of recommendations by LibraryIndex, not the prompt.
+DETAIL_MAX_ITEMS = 120
+TAIL_MAX_CLUSTERS = 20  # authors / genres named in the summarized tail
+WANT_MAX_ITEMS = 30
+
 
 def _extract_year(date_read):
     """Extract year from date_read string (e.g. '2024/01/15' or '2024-01-15')."""
@@ -40,7 +62,9 @@ def build_reader_profile(books):
         key=lambda x: x[1],
         reverse=True,
     )
-    fav_str = ", ".join(f"{a}({c})" for a, c in fav_authors) if fav_authors else "None"
+    fav_str = ", ".join(f"{a}({c})" for a, c in fav_authors[:TAIL_MAX_CLUSTERS]) if fav_authors else "None"
+    if len(fav_authors) > TAIL_MAX_CLUSTERS:
+        fav_str += f" \u2026and {len(fav_authors) - TAIL_MAX_CLUSTERS} more"
 
     # Reading period
     years = [y for b in read_books if (y := _extract_year(b.date_read))]
@@ -57,8 +81,54 @@ def build_reader_profile(books):
     return "\n".join(lines)
 
 
+def _split_detail(hof, highly_rated, others):
+    """Fill DETAIL_MAX_ITEMS in order hof → highly_rated → others; the rest is the tail."""
+    room = DETAIL_MAX_ITEMS
+    shown = []
+    tail = []
+    for group in (hof, highly_rated, others):
+        shown.append(group[:room])
+        tail.extend(group[room:])
+        room = max(room - len(group), 0)
+    return shown, tail
+
+
+def _rating_counts(items):
+    counts = Counter(i.my_rating for i in items)
+    parts = [f"\u2605{r}({counts[r]})" for r in sorted(counts, reverse=True) if r > 0]
+    if counts[0]:
+        parts.append(f"unrated({counts[0]})")
+    return " ".join(parts)
+
+
+def _top_clusters(items, key):
+    """'name (count, avg ★x.x)' for the TAIL_MAX_CLUSTERS most frequent key values."""
+    groups = defaultdict(list)
+    for i in items:
+        for name in key(i):
+            groups[name].append(i.my_rating)
+    top = sorted(groups.items(), key=lambda kv: (-len(kv[1]), kv[0]))[:TAIL_MAX_CLUSTERS]
+    clusters = []
+    for name, ratings in top:
+        rated = [r for r in ratings if r > 0]
+        avg = f", avg \u2605{sum(rated) / len(rated):.1f}" if rated else ""
+        clusters.append(f"{name} ({len(ratings)}{avg})")
+    return ", ".join(clusters)
+
+
+def _want_lines(items, fmt):
+    lines = [fmt(i) for i in items[:WANT_MAX_ITEMS]]
+    if len(items) > WANT_MAX_ITEMS:
+        lines.append(f"- \u2026and {len(items) - WANT_MAX_ITEMS} more")
+    return lines
+
+
 def build_book_sections(books):
-    """Classify books into sections: Hall of Fame, Highly Rated, Other."""
+    """Classify books into sections: Hall of Fame, Highly Rated, Other.
+
+    Up to DETAIL_MAX_ITEMS books are listed individually, hall of fame first;
+    the remainder is summarized as rating counts and author clusters.
+    """
     read_books = [b for b in books if b.shelf == "read"]
 
     hof = [b for b in read_books if b.hall_of_fame]
@@ -68,6 +138,7 @@ def build_book_sections(books):
     # Sort each group by rating desc, then title
     highly_rated.sort(key=lambda b: (-b.my_rating, b.title))
     others.sort(key=lambda b: (-b.my_rating, b.title))
+    (hof, highly_rated, others), tail = _split_detail(hof, highly_rated, others)
 
     lines = []
 
@@ -96,12 +167,18 @@ def build_book_sections(books):
             else:
                 lines.append(f'- "{b.title}" by {b.author} (unrated{year_str})')
 
+    if tail:
+        lines.append(f"\n## More Books Read ({len(tail)}, summarized)")
+        lines.append(f"- Ratings: {_rating_counts(tail)}")
+        authors = _top_clusters(tail, lambda b: [b.author] if b.author else [])
+        if authors:
+            lines.append(f"- Most-read authors: {authors}")
+
     # Want-to-read section
     want_to_read = [b for b in books if b.shelf == "want-to-read"]
     if want_to_read:
         lines.append("\n## Want to Read (읽고 싶은 책)")
-        for b in want_to_read:
-            lines.append(f'- "{b.title}" by {b.author}')
+        lines.extend(_want_lines(want_to_read, lambda b: f'- "{b.title}" by {b.author}'))
 
     return "\n".join(lines)
 
@@ -124,11 +201,11 @@ def _normalize_title(title):
     """
     t = title.lower()
     # Remove punctuation
-    t = re.sub(r"[^\w\s]", "", t)
+    t = _PUNCT_RE.sub("", t)
     # Remove leading articles
-    t = re.sub(r"^(the|a|an)\s+", "", t)
+    t = _ARTICLE_RE.sub("", t)
     # Collapse whitespace
-    t = re.sub(r"\s+", " ", t).strip()
+    t = _WS_RE.sub(" ", t).strip()
     return t
 
 
@@ -147,45 +224,173 @@ def _extract_last_name(author):
 def _core_title(title):
     """Extract core title before subtitle separators (colon, dash)."""
     # Split on ": " or " - " and take the first part
-    part = re.split(r"\s*[:]\s*|\s+[-\u2014\u2013]\s+", title)[0]
+    part = _SUBTITLE_RE.split(title)[0]
     return _normalize_title(part)
 
 
-def _is_duplicate(rec_title, rec_author, existing_books):
-    """Check if a recommended book is a duplicate of any existing book.
+def _title_variants(title):
+    """The title plus its bracketed parts and the title without them.
 
-    Uses normalized title comparison and author last-name matching.
+    Library titles often carry the original or translated title in brackets,
+    e.g. "채식주의자 (The Vegetarian)" or "Sapiens (사피엔스)".
+    """
+    variants = [title]
+    inner = [p.strip() for p in _PAREN_RE.findall(title)]
+    if inner:
+        outer = _PAREN_RE.sub(" ", title).strip()
+        variants.extend(v for v in [outer, *inner] if len(v) >= 4)
+    return variants
+
+
+def _trigrams(norm):
+    padded = f" {norm} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def _within_edits(a, b, k):
+    """True if Levenshtein(a, b) <= k (banded DP, O(len * k))."""
+    if abs(len(a) - len(b)) > k:
+        return False
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        lo, hi = max(1, i - k), min(len(b), i + k)
+        cur = [k + 1] * (len(b) + 1)
+        cur[0] = i
+        for j in range(lo, hi + 1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (a[i - 1] != b[j - 1]))
+        if min(cur[max(0, lo - 1):hi + 1]) > k:
+            return False
+        prev = cur
+    return prev[len(b)] <= k
+
+
+def _jaccard(a, b):
+    overlap = len(a & b)
+    return overlap / (len(a) + len(b) - overlap)
+
+
+class LibraryIndex:
+    """Normalized titles of a library, for duplicate checks against recommendations.
+
+    Titles are normalized once: full titles go in a set, and per author
+    last name a bucket holds that author's full and core titles. A candidate
+    is a duplicate if its normalized title is in the library, or — same
+    author — one title contains the other or the core titles (before any
+    subtitle) match.
+
+    Failing those, a fuzzy check catches near-identical variants (subtitle,
+    spacing, spelling or edition differences) by trigram Jaccard similarity:
+    against the same author's titles at FUZZY_AUTHOR_SIMILARITY, and against
+    the whole library at FUZZY_SIMILARITY through a trigram inverted index
+    with length and prefix filtering. Short titles only match the same author
+    within FUZZY_MAX_EDITS edits.
+    Bracketed original/translated titles are indexed as variants.
+    Items need .title and optionally .author.
     """
-    norm_rec = _normalize_title(rec_title)
-    core_rec = _core_title(rec_title)
-    rec_last = _extract_last_name(rec_author)
-
-    for book in existing_books:
-        norm_existing = _normalize_title(book.title)
 
-        # Exact normalized title match -> duplicate
-        if norm_rec == norm_existing:
+    _lock = threading.Lock()
+    _cached = {}  # kind -> (key, index)
+
+    def __init__(self, items=()):
+        self._titles = set()
+        # last name -> (titles, core titles, title trigrams)
+        self._by_author = defaultdict(lambda: ([], set(), []))
+        self._entries = []  # trigrams per indexed title variant
+        self._postings = defaultdict(list)  # trigram -> entry ids
+        for item in items:
+            self.add(item.title, getattr(item, "author", ""))
+
+    @classmethod
+    def for_items(cls, kind, items):
+        """Index for items, reused while kind's titles/authors are unchanged."""
+        key = tuple((item.title, getattr(item, "author", "")) for item in items)
+        with cls._lock:
+            cached = cls._cached.get(kind)
+            if cached is not None and cached[0] == key:
+                return cached[1]
+        index = cls(items)
+        with cls._lock:
+            cls._cached[kind] = (key, index)
+        return index
+
+    def __len__(self):
+        return len(self._titles)
+
+    def add(self, title, author=""):
+        title = title or ""
+        last = _extract_last_name(author)
+        for variant in _title_variants(title):
+            norm = _normalize_title(variant)
+            grams = _trigrams(norm)
+            if last:
+                titles, cores, title_grams = self._by_author[last]
+                titles.append(norm)
+                title_grams.append(grams)
+                core = _core_title(variant)
+                if core:
+                    cores.add(core)
+            if norm in self._titles:
+                continue
+            self._titles.add(norm)
+            entry_id = len(self._entries)
+            self._entries.append(grams)
+            for g in grams:
+                self._postings[g].append(entry_id)
+
+    def contains(self, title, author=""):
+        """True if title/author duplicates an indexed item."""
+        title = title or ""
+        last = _extract_last_name(author)
+        return any(self._contains(_normalize_title(v), _core_title(v), last)
+                   for v in _title_variants(title))
+
+    def _contains(self, norm, core, last):
+        if norm in self._titles:
             return True
-
-        # Same author last name -> check title similarity
-        if rec_last and _extract_last_name(book.author) == rec_last:
-            # One full title contains the other
-            if norm_rec in norm_existing or norm_existing in norm_rec:
+        bucket = self._by_author.get(last) if last else None
+        if bucket:
+            titles, cores, title_grams = bucket
+            if core and core in cores:
                 return True
-            # Core titles (before subtitle) match
-            core_existing = _core_title(book.title)
-            if core_rec and core_existing and core_rec == core_existing:
+            if any(norm in t or t in norm for t in titles):
                 return True
+            if len(norm) < SHORT_TITLE_CHARS:
+                return any(_within_edits(norm, t, FUZZY_MAX_EDITS) for t in titles)
+            q = _trigrams(norm)
+            if any(_jaccard(q, grams) >= FUZZY_AUTHOR_SIMILARITY for grams in title_grams):
+                return True
+        elif len(norm) < SHORT_TITLE_CHARS:
+            return False
+        return self._similar_anywhere(_trigrams(norm))
+
+    def _similar_anywhere(self, q):
+        """True if some indexed title has trigram Jaccard >= FUZZY_SIMILARITY with q."""
+        # Such a title shares one of the |q| - ceil(t*|q|) + 1 rarest query
+        # trigrams, so only those posting lists are scanned.
+        ranked = sorted(q, key=lambda g: len(self._postings.get(g, ())))
+        prefix = len(q) - math.ceil(FUZZY_SIMILARITY * len(q)) + 1
+        candidates = set().union(*(self._postings.get(g, ()) for g in ranked[:prefix]))
+        low, high = FUZZY_SIMILARITY * len(q), len(q) / FUZZY_SIMILARITY
+        for entry_id in candidates:
+            grams = self._entries[entry_id]
+            if low <= len(grams) <= high and _jaccard(q, grams) >= FUZZY_SIMILARITY:
+                return True
+        return False
+
 
-    return False
+def _is_duplicate(title, author, indexes):
+    return any(index.contains(title, author) for index in indexes)
 
 
-def generate_recommendations(books, num_recommendations=10):
+def generate_recommendations(books, num_recommendations=10, priority=BACKGROUND, saved_books=None):
     """Use Claude API to generate book recommendations based on the user's library.
 
     Args:
         books: list of MyBook model instances
         num_recommendations: how many books to recommend
+        priority: llm lane — BACKGROUND for queued regeneration, INTERACTIVE
+            when a user is waiting on the response
+        saved_books: SavedBook instances, also filtered out (optional)
 
     Returns:
         list of dicts with keys: title, author, reason, category
@@ -194,24 +399,14 @@ def generate_recommendations(books, num_recommendations=10):
     profile = build_reader_profile(books)
     sections = build_book_sections(books)
 
-    # Build exclusion list for prompt
-    exclusion_lines = []
-    for b in books:
-        author_str = b.author if b.author else "Unknown"
-        exclusion_lines.append(f"- {b.title} \u2014 {author_str}")
-    exclusion_section = "\n".join(exclusion_lines)
-
-    # Request extra books to compensate for filtering
-    request_count = num_recommendations + 5
+    # Request extra books to compensate for filtering; titles only summarized
+    # above can't be avoided by the model, so ask for more on large libraries.
+    request_count = _request_count(num_recommendations, len(books))
 
     user_prompt = (
         f"Here is a reader's book library:\n\n"
         f"{profile}\n"
         f"{sections}\n\n"
-        f"## EXCLUSION LIST (\uc808\ub300 \ucd94\ucc9c \uae08\uc9c0)\n"
-        f"The following books are already in the reader's library. "
-        f"Do NOT recommend any of these books or different editions/translations of them:\n"
-        f"{exclusion_section}\n\n"
         f"Based on this reader's taste, recommend exactly {request_count} books "
         "they would love. Do NOT recommend any book already in their library, "
         "including variant titles or different editions.\n"
@@ -228,11 +423,11 @@ def generate_recommendations(books, num_recommendations=10):
         'instead of broad ones (e.g. "business", "self-help", "science", "fiction").\n'
         "- Write the reason field in Korean (\ud55c\uad6d\uc5b4).\n"
         "- Provide diverse recommendations across different categories while staying aligned with the reader's demonstrated preferences.\n"
-        "- CRITICAL: Never recommend any book from the EXCLUSION LIST. This includes variant titles, subtitles, or different editions of the same work."
+        "- CRITICAL: Never recommend a book the reader has read or shelved, including variant titles, subtitles, or different editions of the same work."
     )
 
-    client = anthropic.Anthropic()  # reads ANTHROPIC_API_KEY from env
-    response = client.messages.create(
+    response = llm.create(
+        priority=priority,
         model="claude-sonnet-4-6",
         max_tokens=4096,
         system=system_prompt,
@@ -241,7 +436,21 @@ def generate_recommendations(books, num_recommendations=10):
         ],
     )
 
-    # Parse response
+    return _filter_book_recs(
+        _parse_rec_array(response),
+        LibraryIndex.for_items("books", books),
+        LibraryIndex.for_items("saved_books", saved_books or []),
+    )[:num_recommendations]
+
+
+def _request_count(num_recommendations, library_size):
+    """How many items to ask for so that num_recommendations survive dedup."""
+    hidden = max(library_size - DETAIL_MAX_ITEMS, 0)
+    return num_recommendations + 5 + min(hidden // 200, 10)
+
+
+def _parse_rec_array(response):
+    """Parse the JSON array of recommendations from a generation response."""
     raw = response.content[0].text
     if not raw:
         raise ValueError(f"Claude returned empty content. stop_reason={response.stop_reason}")
@@ -251,47 +460,141 @@ def generate_recommendations(books, num_recommendations=10):
     response_text = re.sub(r"\s*```$", "", response_text)
 
     parsed = json.loads(response_text)
-    recommendations = parsed if isinstance(parsed, list) else parsed.get("recommendations", parsed.get("books", []))
+    return parsed if isinstance(parsed, list) else parsed.get("recommendations", parsed.get("books", []))
+
 
-    # Filter out any books already in library using fuzzy matching
+def _filter_book_recs(recommendations, *indexes):
+    """Drop recommendations already in any of indexes (LibraryIndex)."""
     filtered = []
     for rec in recommendations:
         title = rec.get("title", "")
         author = rec.get("author", "")
-        if not _is_duplicate(title, author, books):
+        if not _is_duplicate(title, author, indexes):
             filtered.append({
                 "title": title,
                 "author": author,
                 "reason": rec.get("reason", ""),
                 "category": rec.get("category", ""),
             })
+    return filtered
 
-    return filtered[:num_recommendations]
 
+def prune_recommendations(recs, books):
+    """Stored recommendations (title/author objects) not yet in the library."""
+    index = LibraryIndex.for_items("books", books)
+    return [r for r in recs if not index.contains(r.title, r.author)]
 
-def chat_recommendation(user_message, conversation_history, books, saved_books=None):
-    """Interactive chat-based book recommendation using Claude API.
+
+def library_snapshot(books):
+    """{book id: [title, author, shelf, rating, hall_of_fame, year]} for the library.
+
+    These are exactly the per-book inputs build_reader_profile and
+    build_book_sections put in the generation prompt.
+    """
+    return {
+        str(b.id): [b.title, b.author or "", b.shelf, b.my_rating or 0,
+                    bool(b.hall_of_fame), _extract_year(b.date_read)]
+        for b in books
+    }
+
+
+def snapshot_fingerprint(snapshot):
+    """Short stable hash of a library_snapshot()."""
+    payload = json.dumps(sorted(snapshot.items()), ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def diff_snapshots(old, new):
+    """(added, changed, removed) book ids between two library snapshots."""
+    added = {k for k in new if k not in old}
+    removed = {k for k in old if k not in new}
+    changed = {k for k in new if k in old and list(old[k]) != list(new[k])}
+    return added, changed, removed
+
+
+def generate_topup_recommendations(books, touched_books, current_recs, count, priority=BACKGROUND,
+                                   saved_books=None):
+    """Recommend `count` more books after a small library change.
+
+    Cheaper than generate_recommendations: the prompt carries the reader
+    profile, the hall of fame, the books just added or re-rated and the
+    recommendations already shown, instead of the whole sectioned library.
 
     Args:
-        user_message: the user's current message
-        conversation_history: list of {"role": "user"|"assistant", "content": "..."}
-        books: list of MyBook model instances
-        saved_books: list of SavedBook model instances (optional)
+        books: list of MyBook model instances (the whole library)
+        touched_books: MyBook instances added or changed since the last run
+        current_recs: recommendations being kept (objects with title/author)
+        count: how many new books to recommend
+        saved_books: SavedBook instances, also filtered out (optional)
 
     Returns:
-        dict with keys: message (str), recommendations (list of dicts)
+        list of dicts with keys: title, author, reason, category
     """
     profile = build_reader_profile(books)
-    sections = build_book_sections(books)
+    hof = [b for b in books if b.shelf == "read" and b.hall_of_fame]
+
+    lines = [profile]
+    if hof:
+        lines.append("\n## Hall of Fame (All-time Favorites)")
+        lines.extend(f'- "{b.title}" by {b.author}' for b in hof[:DETAIL_MAX_ITEMS])
+    if touched_books:
+        lines.append("\n## Recently Added or Re-rated")
+        for b in touched_books:
+            rating_str = f"{b.my_rating}/5" if b.my_rating > 0 else "unrated"
+            shelf_str = "want to read" if b.shelf == "want-to-read" else rating_str
+            lines.append(f'- "{b.title}" by {b.author} ({shelf_str})')
+    if current_recs:
+        lines.append("\n## Already Recommended (do not repeat)")
+        lines.extend(f'- "{r.title}" by {r.author}' for r in current_recs)
+
+    user_prompt = (
+        "Here is a summary of a reader's book library:\n\n"
+        + "\n".join(lines)
+        + f"\n\nThe reader's library changed slightly. Recommend exactly {count + 2} NEW books "
+        "they would love, giving weight to the recently added or re-rated books. "
+        "Do NOT recommend any book the reader has read or shelved or that was already recommended, "
+        "including variant titles or different editions.\n"
+        "Respond with ONLY a JSON array, no markdown fences, no extra text:\n"
+        '[{"title": "...", "author": "...", "reason": "...", "category": "..."}]'
+    )
+
+    response = llm.create(
+        priority=priority,
+        model="claude-sonnet-4-6",
+        max_tokens=1024 + 256 * count,
+        system=(
+            "You are a book recommendation specialist topping up an existing recommendation list.\n"
+            '- Use specific, granular categories (e.g. "behavioral economics", "Korean modern literature").\n'
+            "- Write the reason field in Korean (\ud55c\uad6d\uc5b4)."
+        ),
+        messages=[{"role": "user", "content": user_prompt}],
+    )
+
+    return _filter_book_recs(
+        _parse_rec_array(response),
+        LibraryIndex.for_items("books", books),
+        LibraryIndex.for_items("saved_books", saved_books or []),
+        LibraryIndex(current_recs),
+    )[:count]
+
+
+def build_library_context(books):
+    """Reader profile plus sectioned library — the book part of the chat prompt."""
+    return f"{build_reader_profile(books)}\n{build_book_sections(books)}"
+
+
+def book_chat_context(books, saved_books=None):
+    """Library and wishlist context for the book chat system prompt."""
     saved_section = build_saved_books_section(saved_books) if saved_books else ""
+    return f"{build_library_context(books)}\n{saved_section}"
 
+
+def _book_chat_system_prompt(context):
     system_prompt = (
         "You are a world-class book recommendation assistant — friendly, deeply knowledgeable, "
         "and passionate about connecting readers with transformative books.\n\n"
-        "You have access to the reader's complete book library, reading history, and wishlist.\n\n"
-        f"{profile}\n"
-        f"{sections}\n"
-        f"{saved_section}\n\n"
+        "You have access to the reader's book library (long tails summarized), reading history, and wishlist.\n\n"
+        f"{context}\n\n"
         "## Recommendation Philosophy\n"
         "- **Prioritize truly great books**: award winners (Pulitzer, Nobel, Booker, National Book Award), "
         "timeless classics, and modern masterpieces that have stood the test of time.\n"
@@ -317,8 +620,11 @@ def chat_recommendation(user_message, conversation_history, books, saved_books=N
         '- Use specific categories (e.g. "behavioral economics", "leadership", "Korean modern literature") '
         'instead of broad ones (e.g. "business", "fiction").'
     )
+    return system_prompt
+
 
-    # Build messages list from history + current message
+def _chat_request(system_prompt, user_message, conversation_history):
+    """messages.create/stream kwargs shared by the book and screen chats."""
     messages = []
     for msg in conversation_history:
         messages.append({"role": msg["role"], "content": msg["content"]})
@@ -342,8 +648,7 @@ def chat_recommendation(user_message, conversation_history, books, saved_books=N
             }
         ]
 
-    client = anthropic.Anthropic()
-    response = client.messages.create(
+    return dict(
         model="claude-sonnet-4-6",
         max_tokens=4096,
         system=[
@@ -356,15 +661,80 @@ def chat_recommendation(user_message, conversation_history, books, saved_books=N
         messages=messages,
     )
 
-    raw = response.content[0].text or ""
 
-    # Parse: split on [REC] marker
-    if _REC_MARKER in raw:
-        parts = raw.split(_REC_MARKER, 1)
-        message_text = parts[0].strip()
-        rec_text = parts[1].strip()
-        # Remove markdown fences if present
-        rec_text = re.sub(r"^```(?:json)?\s*", "", rec_text)
+class RecStreamSplitter:
+    """Split a (possibly streamed) reply into display text and [REC] items.
+
+    Text is released as it arrives, except for a short tail that could be the
+    start of the marker. After the marker, each JSON object in the array is
+    decoded as soon as it is complete.
+    """
+
+    _SKIP_RE = re.compile(r"(?:\s|```(?:json)?|\[|,)*")
+    _decoder = json.JSONDecoder()
+
+    def __init__(self):
+        self.text = ""
+        self.rec_text = ""
+        self.items = []
+        self._pending = ""
+        self._in_recs = False
+        self._rec_pos = 0
+
+    def feed(self, delta):
+        """Add a chunk; returns (display_text, newly_completed_items)."""
+        if self._in_recs:
+            self.rec_text += delta
+            return "", self._drain()
+        self._pending += delta
+        idx = self._pending.find(_REC_MARKER)
+        if idx >= 0:
+            out = self._pending[:idx]
+            self.rec_text = self._pending[idx + len(_REC_MARKER):]
+            self._pending = ""
+            self._in_recs = True
+            self.text += out
+            return out, self._drain()
+        keep = 0
+        for n in range(min(len(_REC_MARKER) - 1, len(self._pending)), 0, -1):
+            if _REC_MARKER.startswith(self._pending[-n:]):
+                keep = n
+                break
+        out = self._pending[:len(self._pending) - keep]
+        self._pending = self._pending[len(self._pending) - keep:]
+        self.text += out
+        return out, []
+
+    def close(self):
+        """Flush held-back text; returns (display_text, items)."""
+        out, self._pending = self._pending, ""
+        self.text += out
+        items = self._drain()
+        if self._in_recs and not self.items:
+            items = self.items = self._parse_whole(self.rec_text)
+        return out, items
+
+    def _drain(self):
+        found = []
+        while True:
+            start = self._SKIP_RE.match(self.rec_text, self._rec_pos).end()
+            if start >= len(self.rec_text) or self.rec_text[start] != "{":
+                break
+            try:
+                obj, end = self._decoder.raw_decode(self.rec_text, start)
+            except json.JSONDecodeError:
+                break
+            self._rec_pos = end
+            if isinstance(obj, dict) and isinstance(obj.get("recommendations"), list):
+                found.extend(o for o in obj["recommendations"] if isinstance(o, dict))
+            elif isinstance(obj, dict):
+                found.append(obj)
+        self.items.extend(found)
+        return found
+
+    @staticmethod
+    def _parse_whole(rec_text):
+        rec_text = re.sub(r"^```(?:json)?\s*", "", rec_text.strip())
         rec_text = re.sub(r"\s*```$", "", rec_text)
         try:
             recommendations = json.loads(rec_text)
@@ -373,26 +743,116 @@ def chat_recommendation(user_message, conversation_history, books, saved_books=N
         except (json.JSONDecodeError, AttributeError):
             logger.warning("Failed to parse recommendations JSON: %s", rec_text[:200])
             recommendations = []
-    else:
-        message_text = raw.strip()
-        recommendations = []
+        return [rec for rec in recommendations if isinstance(rec, dict)]
 
-    # Sanitize recommendations
-    clean_recs = []
-    for rec in recommendations:
-        clean_recs.append({
-            "title": rec.get("title", ""),
-            "author": rec.get("author", ""),
-            "reason": rec.get("reason", ""),
-            "category": rec.get("category", ""),
-        })
 
+def _clean_book_rec(rec):
     return {
-        "message": message_text,
-        "recommendations": clean_recs,
+        "title": rec.get("title", ""),
+        "author": rec.get("author", ""),
+        "reason": rec.get("reason", ""),
+        "category": rec.get("category", ""),
     }
 
 
+def _clean_screen_rec(rec):
+    return {
+        "title": rec.get("title", ""),
+        "media_type": rec.get("media_type", "movie"),
+        "reason": rec.get("reason", ""),
+        "category": rec.get("category", ""),
+    }
+
+
+def _known_filter(*indexes):
+    """Predicate on a cleaned rec: False if it is already in one of indexes."""
+    return lambda rec: not _is_duplicate(rec["title"], rec.get("author", ""), indexes)
+
+
+def _run_rec_chat(request_kwargs, clean, keep):
+    response = llm.create(**request_kwargs)
+    raw = response.content[0].text or ""
+
+    splitter = RecStreamSplitter()
+    splitter.feed(raw)
+    splitter.close()
+    return {
+        "message": splitter.text.strip(),
+        "recommendations": [r for r in map(clean, splitter.items) if keep(r)],
+    }
+
+
+def _stream_rec_chat(request_kwargs, clean, keep):
+    """Yield {"type": "text"|"rec"|"done", ...} events for a streamed reply.
+
+    Recommendations failing keep (already in the library) are not emitted.
+    """
+    splitter = RecStreamSplitter()
+    kept = []
+
+    def _recs(items):
+        for rec in map(clean, items):
+            if keep(rec):
+                kept.append(rec)
+                yield {"type": "rec", "rec": rec}
+
+    with llm.stream(**request_kwargs) as stream:
+        for delta in stream.text_stream:
+            text, items = splitter.feed(delta)
+            if text:
+                yield {"type": "text", "text": text}
+            yield from _recs(items)
+    text, items = splitter.close()
+    if text:
+        yield {"type": "text", "text": text}
+    yield from _recs(items)
+    yield {
+        "type": "done",
+        "message": splitter.text.strip(),
+        "recommendations": kept,
+    }
+
+
+def chat_recommendation(user_message, conversation_history, books, saved_books=None, context=None):
+    """Interactive chat-based book recommendation using Claude API.
+
+    Args:
+        user_message: the user's current message
+        conversation_history: list of {"role": "user"|"assistant", "content": "..."}
+        books: MyBook instances, or rows with title/author when context is given
+        saved_books: SavedBook instances or title/author rows (optional)
+        context: prebuilt book_chat_context() text (optional)
+
+    Returns:
+        dict with keys: message (str), recommendations (list of dicts)
+    """
+    if context is None:
+        context = book_chat_context(books, saved_books)
+    system_prompt = _book_chat_system_prompt(context)
+    return _run_rec_chat(
+        _chat_request(system_prompt, user_message, conversation_history),
+        _clean_book_rec, _book_chat_filter(books, saved_books),
+    )
+
+
+def stream_chat_recommendation(user_message, conversation_history, books, saved_books=None, context=None):
+    """Streaming variant of chat_recommendation; yields text/rec/done events."""
+    if context is None:
+        context = book_chat_context(books, saved_books)
+    system_prompt = _book_chat_system_prompt(context)
+    return _stream_rec_chat(
+        _chat_request(system_prompt, user_message, conversation_history),
+        _clean_book_rec, _book_chat_filter(books, saved_books),
+    )
+
+
+def _book_chat_filter(books, saved_books):
+    return _known_filter(
+        LibraryIndex.for_items("books", books),
+        LibraryIndex.for_items("saved_books", saved_books or []),
+    )
+
+
 # ─────────────────────────────────────────────
 # My Screens recommendation functions
 # ─────────────────────────────────────────────
@@ -430,7 +890,11 @@ def build_viewer_profile(screens):
 
 
 def build_screen_sections(screens):
-    """Classify screens into sections: Hall of Fame, Highly Rated, Other."""
+    """Classify screens into sections: Hall of Fame, Highly Rated, Other.
+
+    Up to DETAIL_MAX_ITEMS titles are listed individually, hall of fame first;
+    the remainder is summarized as rating, type and genre counts.
+    """
     watched = [s for s in screens if s.shelf == "watched"]
 
     hof = [s for s in watched if s.hall_of_fame]
@@ -439,6 +903,7 @@ def build_screen_sections(screens):
 
     highly_rated.sort(key=lambda s: (-s.my_rating, s.title))
     others.sort(key=lambda s: (-s.my_rating, s.title))
+    (hof, highly_rated, others), tail = _split_detail(hof, highly_rated, others)
 
     def _fmt(s):
         type_tag = "영화" if s.media_type == "movie" else "드라마"
@@ -447,6 +912,10 @@ def build_screen_sections(screens):
         genre_str = f" [{s.genres}]" if s.genres else ""
         return f'- "{s.title}" [{type_tag}{year_str}] ({rating_str}){genre_str}'
 
+    def _fmt_want(s):
+        type_tag = "영화" if s.media_type == "movie" else "드라마"
+        return f'- "{s.title}" [{type_tag}]'
+
     lines = []
     if hof:
         lines.append("\n## Hall of Fame (All-time Favorites)")
@@ -463,12 +932,21 @@ def build_screen_sections(screens):
         for s in others:
             lines.append(_fmt(s))
 
+    if tail:
+        movies = sum(1 for s in tail if s.media_type == "movie")
+        lines.append(f"\n## More Watched ({len(tail)}, summarized)")
+        lines.append(f"- Movies: {movies}, TV: {len(tail) - movies}")
+        lines.append(f"- Ratings: {_rating_counts(tail)}")
+        genres = _top_clusters(
+            tail, lambda s: [g.strip() for g in (s.genres or "").split(",") if g.strip()]
+        )
+        if genres:
+            lines.append(f"- Genres: {genres}")
+
     want = [s for s in screens if s.shelf == "want-to-watch"]
     if want:
         lines.append("\n## Want to Watch (보고 싶은 콘텐츠)")
-        for s in want:
-            type_tag = "영화" if s.media_type == "movie" else "드라마"
-            lines.append(f'- "{s.title}" [{type_tag}]')
+        lines.extend(_want_lines(want, _fmt_want))
 
     return "\n".join(lines)
 
@@ -485,7 +963,7 @@ def build_saved_screens_section(saved_screens):
     return "\n".join(lines)
 
 
-def generate_screen_recommendations(screens, num_recommendations=10):
+def generate_screen_recommendations(screens, num_recommendations=10, priority=BACKGROUND):
     """Use Claude API to generate movie/TV recommendations based on the user's watch history.
 
     Args:
@@ -498,23 +976,15 @@ def generate_screen_recommendations(screens, num_recommendations=10):
     profile = build_viewer_profile(screens)
     sections = build_screen_sections(screens)
 
-    exclusion_lines = []
-    for s in screens:
-        type_tag = "영화" if s.media_type == "movie" else "드라마"
-        exclusion_lines.append(f"- {s.title} [{type_tag}]")
-    exclusion_section = "\n".join(exclusion_lines)
-
-    request_count = num_recommendations + 5
+    request_count = _request_count(num_recommendations, len(screens))
 
     user_prompt = (
         f"Here is a viewer's watch history:\n\n"
         f"{profile}\n"
         f"{sections}\n\n"
-        f"## EXCLUSION LIST (절대 추천 금지)\n"
-        f"Do NOT recommend any of these (including remakes/sequels/prequels of the same franchise):\n"
-        f"{exclusion_section}\n\n"
         f"Based on this viewer's taste, recommend exactly {request_count} movies or TV shows "
-        "they would love. Mix movies and TV dramas as appropriate.\n"
+        "they would love. Mix movies and TV dramas as appropriate. Do NOT recommend anything "
+        "they have watched or shelved, including remakes/sequels/prequels of the same franchise.\n"
         "Respond with ONLY a JSON array, no markdown fences, no extra text:\n"
         '[{"title": "...", "media_type": "movie|tv", "reason": "...", "category": "..."}]'
     )
@@ -530,11 +1000,11 @@ def generate_screen_recommendations(screens, num_recommendations=10):
         "- Write the reason field in Korean (한국어).\n"
         "- Provide diverse recommendations across genres while matching the viewer's taste.\n"
         "- media_type must be exactly 'movie' or 'tv'.\n"
-        "- CRITICAL: Never recommend anything from the EXCLUSION LIST."
+        "- CRITICAL: Never recommend anything the viewer has watched or shelved."
     )
 
-    client = anthropic.Anthropic()
-    response = client.messages.create(
+    response = llm.create(
+        priority=priority,
         model="claude-sonnet-4-6",
         max_tokens=4096,
         system=system_prompt,
@@ -552,11 +1022,11 @@ def generate_screen_recommendations(screens, num_recommendations=10):
     recommendations = parsed if isinstance(parsed, list) else parsed.get("recommendations", [])
 
     # Filter duplicates by normalized title
-    existing_titles = {_normalize_title(s.title) for s in screens}
+    index = LibraryIndex.for_items("screens", screens)
     filtered = []
     for rec in recommendations:
         title = rec.get("title", "")
-        if _normalize_title(title) not in existing_titles:
+        if not index.contains(title):
             filtered.append({
                 "title": title,
                 "media_type": rec.get("media_type", "movie"),
@@ -567,29 +1037,23 @@ def generate_screen_recommendations(screens, num_recommendations=10):
     return filtered[:num_recommendations]
 
 
-def chat_screen_recommendation(user_message, conversation_history, screens, saved_screens=None):
-    """Interactive chat-based screen recommendation using Claude API.
+def build_watch_context(screens):
+    """Viewer profile plus sectioned watch history — the screen part of the chat prompt."""
+    return f"{build_viewer_profile(screens)}\n{build_screen_sections(screens)}"
 
-    Args:
-        user_message: the user's current message
-        conversation_history: list of {"role": "user"|"assistant", "content": "..."}
-        screens: list of MyScreen model instances
-        saved_screens: list of SavedScreen model instances (optional)
 
-    Returns:
-        dict with keys: message (str), recommendations (list of dicts)
-    """
-    profile = build_viewer_profile(screens)
-    sections = build_screen_sections(screens)
+def screen_chat_context(screens, saved_screens=None):
+    """Watch history and wishlist context for the screen chat system prompt."""
     saved_section = build_saved_screens_section(saved_screens) if saved_screens else ""
+    return f"{build_watch_context(screens)}\n{saved_section}"
+
 
+def _screen_chat_system_prompt(context):
     system_prompt = (
         "You are a world-class movie and TV drama recommendation assistant — friendly, deeply knowledgeable, "
         "and passionate about connecting viewers with great content.\n\n"
-        "You have access to the viewer's complete watch history and wishlist.\n\n"
-        f"{profile}\n"
-        f"{sections}\n"
-        f"{saved_section}\n\n"
+        "You have access to the viewer's watch history (long tails summarized) and wishlist.\n\n"
+        f"{context}\n\n"
         "## Recommendation Philosophy\n"
         "- **Prioritize truly great content**: award winners (Oscar, Cannes, Baeksang, Emmy), "
         "critically acclaimed masterpieces, and modern classics.\n"
@@ -613,71 +1077,45 @@ def chat_screen_recommendation(user_message, conversation_history, screens, save
         '- media_type must be exactly "movie" or "tv".\n'
         '- Use specific categories (e.g. "느와르 범죄", "K-드라마", "SF 스릴러") instead of broad ones.'
     )
+    return system_prompt
 
-    messages = []
-    for msg in conversation_history:
-        messages.append({"role": msg["role"], "content": msg["content"]})
-    messages.append({"role": "user", "content": user_message})
 
-    last_assistant_idx = None
-    for i in range(len(messages) - 1, -1, -1):
-        if messages[i]["role"] == "assistant":
-            last_assistant_idx = i
-            break
+def chat_screen_recommendation(user_message, conversation_history, screens, saved_screens=None, context=None):
+    """Interactive chat-based screen recommendation using Claude API.
 
-    if last_assistant_idx is not None:
-        prior_content = messages[last_assistant_idx]["content"]
-        messages[last_assistant_idx]["content"] = [
-            {
-                "type": "text",
-                "text": prior_content,
-                "cache_control": {"type": "ephemeral"},
-            }
-        ]
+    Args:
+        user_message: the user's current message
+        conversation_history: list of {"role": "user"|"assistant", "content": "..."}
+        screens: MyScreen instances, or rows with title when context is given
+        saved_screens: SavedScreen instances or title rows (optional)
+        context: prebuilt screen_chat_context() text (optional)
 
-    client = anthropic.Anthropic()
-    response = client.messages.create(
-        model="claude-sonnet-4-6",
-        max_tokens=4096,
-        system=[
-            {
-                "type": "text",
-                "text": system_prompt,
-                "cache_control": {"type": "ephemeral"},
-            }
-        ],
-        messages=messages,
+    Returns:
+        dict with keys: message (str), recommendations (list of dicts)
+    """
+    if context is None:
+        context = screen_chat_context(screens, saved_screens)
+    system_prompt = _screen_chat_system_prompt(context)
+    return _run_rec_chat(
+        _chat_request(system_prompt, user_message, conversation_history),
+        _clean_screen_rec, _screen_chat_filter(screens, saved_screens),
     )
 
-    raw = response.content[0].text or ""
 
-    if _REC_MARKER in raw:
-        parts = raw.split(_REC_MARKER, 1)
-        message_text = parts[0].strip()
-        rec_text = parts[1].strip()
-        rec_text = re.sub(r"^```(?:json)?\s*", "", rec_text)
-        rec_text = re.sub(r"\s*```$", "", rec_text)
-        try:
-            recommendations = json.loads(rec_text)
-            if not isinstance(recommendations, list):
-                recommendations = recommendations.get("recommendations", [])
-        except (json.JSONDecodeError, AttributeError):
-            logger.warning("Failed to parse screen recommendations JSON: %s", rec_text[:200])
-            recommendations = []
-    else:
-        message_text = raw.strip()
-        recommendations = []
+def stream_chat_screen_recommendation(user_message, conversation_history, screens, saved_screens=None,
+                                      context=None):
+    """Streaming variant of chat_screen_recommendation; yields text/rec/done events."""
+    if context is None:
+        context = screen_chat_context(screens, saved_screens)
+    system_prompt = _screen_chat_system_prompt(context)
+    return _stream_rec_chat(
+        _chat_request(system_prompt, user_message, conversation_history),
+        _clean_screen_rec, _screen_chat_filter(screens, saved_screens),
+    )
 
-    clean_recs = []
-    for rec in recommendations:
-        clean_recs.append({
-            "title": rec.get("title", ""),
-            "media_type": rec.get("media_type", "movie"),
-            "reason": rec.get("reason", ""),
-            "category": rec.get("category", ""),
-        })
 
-    return {
-        "message": message_text,
-        "recommendations": clean_recs,
-    }
+def _screen_chat_filter(screens, saved_screens):
+    return _known_filter(
+        LibraryIndex.for_items("screens", screens),
+        LibraryIndex.for_items("saved_screens", saved_screens or []),
+    )
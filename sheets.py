@@ -1,9 +1,8 @@
-"""Google Sheets CRUD operations with in-memory caching."""
+"""Google Sheets CRUD operations with a shared (cross-worker) cache."""
 
 import json
 import logging
 import os
-import time
 from datetime import datetime
 
 import gspread
@@ -14,6 +13,7 @@ from tenacity import (
     retry_if_exception_type, before_sleep_log,
 )
 
+from cache import shared_cache
 from encryption import decrypt, encrypt, hmac_index
 
 logger = logging.getLogger(__name__)
@@ -63,18 +63,12 @@ _api_retry = retry(
     reraise=True,
 )
 
-# In-memory cache
-_cache = {
-    "contacts": None,
-    "contacts_time": 0,
-    "tags": None,
-    "tags_time": 0,
-    "deleted": None,
-    "deleted_time": 0,
-}
+# Shared cache namespaces: "sheets.<key>" in cache.shared_cache
+_CACHE_KEYS = ("contacts", "tags", "deleted")
+# Decrypted contact rows: kept in worker memory, never in the shared cache file
+shared_cache.keep_local("sheets.contacts", "sheets.deleted")
 CACHE_TTL = 300  # 5 minutes
 
-_habit_cache = {"data": None, "ts": 0}
 HABIT_LOG_CACHE_TTL = 60  # 1분
 
 
@@ -107,17 +101,9 @@ def _get_spreadsheet():
 
 
 def _invalidate_cache(key=None):
-    """Invalidate cache. If key is None, invalidate all."""
-    if key:
-        _cache[key] = None
-        _cache[f"{key}_time"] = 0
-    else:
-        _cache["contacts"] = None
-        _cache["contacts_time"] = 0
-        _cache["tags"] = None
-        _cache["tags_time"] = 0
-        _cache["deleted"] = None
-        _cache["deleted_time"] = 0
+    """Invalidate cache in every worker. If key is None, invalidate all."""
+    for k in ([key] if key else _CACHE_KEYS):
+        shared_cache.invalidate(f"sheets.{k}")
 
 
 def invalidate_contacts_cache():
@@ -125,8 +111,9 @@ def invalidate_contacts_cache():
     _invalidate_cache("contacts")
 
 
-def _is_cached(key):
-    return _cache[key] is not None and (time.time() - _cache[f"{key}_time"]) < CACHE_TTL
+def contacts_cache_version():
+    """Version of the contacts cache; changes whenever contacts are written."""
+    return shared_cache.version("sheets.contacts")
 
 
 # --- Sheet Setup ---
@@ -249,19 +236,18 @@ def _contact_to_row(contact):
     ]
 
 
-@_api_retry
 def get_all_contacts():
-    """Get all contacts from Master tab. Uses cache."""
-    if _is_cached("contacts"):
-        return _cache["contacts"]
+    """Get all contacts from Master tab. Uses shared cache."""
+    return shared_cache.get_or_set("sheets.contacts", _load_contacts, CACHE_TTL)
+
 
+@_api_retry
+def _load_contacts():
     sp = _get_spreadsheet()
     ws = sp.worksheet("Master")
     all_rows = ws.get_all_values()
 
     if len(all_rows) <= 1:
-        _cache["contacts"] = []
-        _cache["contacts_time"] = time.time()
         return []
 
     headers = all_rows[0]
@@ -273,8 +259,6 @@ def get_all_contacts():
             logger.warning("Failed to parse row: %s", e)
             continue
 
-    _cache["contacts"] = contacts
-    _cache["contacts_time"] = time.time()
     return contacts
 
 
@@ -495,19 +479,18 @@ def delete_contact(name_hmac, deleted_by="User"):
     return True
 
 
-@_api_retry
 def get_deleted_contacts():
-    """Get all contacts from Deleted tab. Uses cache."""
-    if _is_cached("deleted"):
-        return _cache["deleted"]
+    """Get all contacts from Deleted tab. Uses shared cache."""
+    return shared_cache.get_or_set("sheets.deleted", _load_deleted_contacts, CACHE_TTL)
+
 
+@_api_retry
+def _load_deleted_contacts():
     sp = _get_spreadsheet()
     ws = sp.worksheet("Deleted")
     all_rows = ws.get_all_values()
 
     if len(all_rows) <= 1:
-        _cache["deleted"] = []
-        _cache["deleted_time"] = time.time()
         return []
 
     headers = all_rows[0]
@@ -525,8 +508,6 @@ def get_deleted_contacts():
             logger.warning("Failed to parse deleted row: %s", e)
             continue
 
-    _cache["deleted"] = contacts
-    _cache["deleted_time"] = time.time()
     return contacts
 
 
@@ -628,12 +609,13 @@ def log_change(name_hmac, field, old_value, new_value, changed_by="User"):
 
 # --- Tags Tab ---
 
-@_api_retry
 def get_valid_tags():
-    """Get list of valid tags from Tags tab. Uses cache."""
-    if _is_cached("tags"):
-        return _cache["tags"]
+    """Get list of valid tags from Tags tab. Uses shared cache."""
+    return shared_cache.get_or_set("sheets.tags", _load_tags, CACHE_TTL)
+
 
+@_api_retry
+def _load_tags():
     sp = _get_spreadsheet()
     ws = sp.worksheet("Tags")
     all_rows = ws.get_all_values()
@@ -643,8 +625,6 @@ def get_valid_tags():
         if row and row[0].strip():
             tags.append(row[0].strip())
 
-    _cache["tags"] = tags
-    _cache["tags_time"] = time.time()
     return tags
 
 
@@ -665,19 +645,17 @@ def _get_habit_ws():
     return sp.worksheet("Habit Log")
 
 
-@_api_retry
 def _get_all_habit_rows():
-    """Get all Habit Log rows as list of dicts. Uses 1-minute cache."""
-    now = time.time()
-    if _habit_cache["data"] is not None and (now - _habit_cache["ts"]) < HABIT_LOG_CACHE_TTL:
-        return _habit_cache["data"]
+    """Get all Habit Log rows as list of dicts. Uses 1-minute shared cache."""
+    return shared_cache.get_or_set("sheets.habits", _load_habit_rows, HABIT_LOG_CACHE_TTL)
+
 
+@_api_retry
+def _load_habit_rows():
     ws = _get_habit_ws()
     all_rows = ws.get_all_values()
 
     if len(all_rows) <= 1:
-        _habit_cache["data"] = []
-        _habit_cache["ts"] = time.time()
         return []
 
     headers = all_rows[0]
@@ -688,8 +666,6 @@ def _get_all_habit_rows():
             row_data[h] = row[i] if i < len(row) else ""
         rows.append(row_data)
 
-    _habit_cache["data"] = rows
-    _habit_cache["ts"] = time.time()
     return rows
 
 
@@ -699,8 +675,7 @@ def add_habit_log(habit_name, target_date):
     created_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     row = [habit_name, target_date.isoformat(), created_at]
     ws.append_row(row, value_input_option="USER_ENTERED")
-    _habit_cache["data"] = None
-    _habit_cache["ts"] = 0
+    shared_cache.invalidate("sheets.habits")
     logger.info("Added habit log: %s on %s", habit_name, target_date)
 
 
@@ -720,8 +695,7 @@ def delete_habit_log(habit_name, target_date):
 
     if row_idx:
         ws.delete_rows(row_idx)
-        _habit_cache["data"] = None
-        _habit_cache["ts"] = 0
+        shared_cache.invalidate("sheets.habits")
         logger.info("Deleted habit log: %s on %s", habit_name, target_date)
         return True
     return False
@@ -1,12 +1,12 @@
 """Google Sheets CRUD for Business Entities and Opportunities."""
 
 import logging
-import time
 import uuid
 from datetime import datetime
 
 import gspread
 
+from cache import shared_cache
 from encryption import hmac_index
 from sheets import _get_spreadsheet
 
@@ -39,28 +39,21 @@ DELETED_ENTITY_HEADERS = ENTITY_HEADERS + ["Deleted Date", "Deleted By"]
 
 BP_VALUES = ["0-Critical", "1-High", "2-Medium", "3-Low"]
 
-# In-memory cache
-_ecache = {
-    "entities": None,
-    "entities_time": 0,
-    "deleted_entities": None,
-    "deleted_entities_time": 0,
-}
+# Shared cache namespaces: "sheets.<key>" in cache.shared_cache
+_ECACHE_KEYS = ("entities", "deleted_entities")
+# Decrypted entity rows: kept in worker memory, never in the shared cache file
+shared_cache.keep_local("sheets.entities", "sheets.deleted_entities")
 CACHE_TTL = 300  # 5 minutes
 
 
 def _invalidate_entity_cache(key=None):
-    if key:
-        _ecache[key] = None
-        _ecache[f"{key}_time"] = 0
-    else:
-        for k in ["entities", "deleted_entities"]:
-            _ecache[k] = None
-            _ecache[f"{k}_time"] = 0
+    for k in ([key] if key else _ECACHE_KEYS):
+        shared_cache.invalidate(f"sheets.{k}")
 
 
-def _is_ecached(key):
-    return _ecache[key] is not None and (time.time() - _ecache[f"{key}_time"]) < CACHE_TTL
+def entities_cache_version():
+    """Version of the entities cache; changes whenever entities are written."""
+    return shared_cache.version("sheets.entities")
 
 
 # --- Sheet Setup ---
@@ -153,17 +146,16 @@ def _find_entity_row(ws, entity_hmac):
 # --- Entity CRUD ---
 
 def get_all_entities():
-    """Get all entities from Business Entities tab. Uses cache."""
-    if _is_ecached("entities"):
-        return _ecache["entities"]
+    """Get all entities from Business Entities tab. Uses shared cache."""
+    return shared_cache.get_or_set("sheets.entities", _load_entities, CACHE_TTL)
 
+
+def _load_entities():
     sp = _get_spreadsheet()
     ws = sp.worksheet("Business Entities")
     all_rows = ws.get_all_values()
 
     if len(all_rows) <= 1:
-        _ecache["entities"] = []
-        _ecache["entities_time"] = time.time()
         return []
 
     headers = all_rows[0]
@@ -174,8 +166,6 @@ def get_all_entities():
         except Exception as e:
             logger.warning("Failed to parse entity row: %s", e)
 
-    _ecache["entities"] = entities
-    _ecache["entities_time"] = time.time()
     return entities
 
 
@@ -298,17 +288,16 @@ def delete_entity(entity_hmac, deleted_by="User"):
 
 
 def get_deleted_entities():
-    """Get all entities from Deleted Entities tab. Uses cache."""
-    if _is_ecached("deleted_entities"):
-        return _ecache["deleted_entities"]
+    """Get all entities from Deleted Entities tab. Uses shared cache."""
+    return shared_cache.get_or_set("sheets.deleted_entities", _load_deleted_entities, CACHE_TTL)
+
 
+def _load_deleted_entities():
     sp = _get_spreadsheet()
     ws = sp.worksheet("Deleted Entities")
     all_rows = ws.get_all_values()
 
     if len(all_rows) <= 1:
-        _ecache["deleted_entities"] = []
-        _ecache["deleted_entities_time"] = time.time()
         return []
 
     headers = all_rows[0]
@@ -324,8 +313,6 @@ def get_deleted_entities():
         except Exception as e:
             logger.warning("Failed to parse deleted entity row: %s", e)
 
-    _ecache["deleted_entities"] = entities
-    _ecache["deleted_entities_time"] = time.time()
     return entities
 
 
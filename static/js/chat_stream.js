@@ -0,0 +1,54 @@
+// POST a chat message to an SSE endpoint and dispatch its events.
+//
+// handlers: {text(data), rec(data), tool(data), done(data), error(data)} —
+// each optional; any other event name is dispatched the same way. Resolves
+// once the stream ends. Non-2xx responses are reported through
+// handlers.error with the JSON body when there is one. body is sent as JSON,
+// or as multipart when it is a FormData (file uploads).
+async function streamChat(url, body, handlers) {
+    const isForm = body instanceof FormData;
+    const headers = {'Accept': 'text/event-stream'};
+    if (!isForm) headers['Content-Type'] = 'application/json';
+    const resp = await fetch(url, {
+        method: 'POST',
+        headers,
+        body: isForm ? body : JSON.stringify(body),
+    });
+
+    if (!resp.ok || !resp.body) {
+        let data = {};
+        try { data = await resp.json(); } catch (e) { /* non-JSON error page */ }
+        if (handlers.error) handlers.error({message: data.message || data.error || 'Unknown error'});
+        return;
+    }
+
+    const reader = resp.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    const dispatch = (chunk) => {
+        let event = 'message';
+        const dataLines = [];
+        chunk.split('\n').forEach(line => {
+            if (line.startsWith('event:')) event = line.slice(6).trim();
+            else if (line.startsWith('data:')) dataLines.push(line.slice(5).replace(/^ /, ''));
+        });
+        if (!dataLines.length || !handlers[event]) return;
+        let data;
+        try { data = JSON.parse(dataLines.join('\n')); } catch (e) { return; }
+        handlers[event](data);
+    };
+
+    while (true) {
+        const {value, done} = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, {stream: true});
+        let sep;
+        while ((sep = buffer.indexOf('\n\n')) !== -1) {
+            dispatch(buffer.slice(0, sep));
+            buffer = buffer.slice(sep + 2);
+        }
+    }
+    buffer += decoder.decode();
+    if (buffer.trim()) dispatch(buffer);
+}
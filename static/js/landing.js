@@ -50,14 +50,47 @@ function setBtnFeedback(btn, state, msg) {
     }
 }
 
+// --- Dashboard widgets: each one is fetched on its own so a slow Sheets call only delays its card ---
+const dashboardWidgets = {};
+
+function loadDashboardWidget(name) {
+    const slots = document.querySelectorAll(`[data-widget="${name}"]`);
+    dashboardWidgets[name] = fetch(`/api/dashboard/widgets/${name}`)
+        .then((res) => {
+            if (!res.ok) throw new Error(`HTTP ${res.status}`);
+            return res.json();
+        })
+        .then((data) => {
+            Object.assign(window.__LANDING_DATA, data.data || {});
+            slots.forEach((el) => {
+                const html = (data.html || {})[el.dataset.slot];
+                if (html !== undefined) el.innerHTML = html;
+            });
+            document.dispatchEvent(new CustomEvent('dashboard:widget-loaded', {detail: {name, slots}}));
+            return data;
+        })
+        .catch(() => {
+            slots.forEach((el) => {
+                el.innerHTML = `<div class="text-center text-muted small py-4">불러오지 못했습니다.
+                    <a href="#" onclick="loadDashboardWidget('${name}'); return false;">다시 시도</a></div>`;
+            });
+            return null;
+        });
+    return dashboardWidgets[name];
+}
+
+new Set(Array.from(document.querySelectorAll('[data-widget]'), (el) => el.dataset.widget))
+    .forEach(loadDashboardWidget);
+
 (async function initDashboardEditableModal() {
+    // Quick-view rows and seed data arrive with the contacts/entities widgets
+    await Promise.all([dashboardWidgets.contacts, dashboardWidgets.entities]);
     const contactQuickRows = document.querySelectorAll('.quickview-contact-row');
     const entityQuickRows = document.querySelectorAll('.quickview-entity-row');
     const editContactModalEl = document.getElementById('editContactModal');
     const viewEntityModalEl = document.getElementById('viewEntityModal');
     const oppModalEl = document.getElementById('oppModal');
 
-    if (!contactQuickRows.length && !entityQuickRows.length) return;
     if (!editContactModalEl || !viewEntityModalEl || !oppModalEl || typeof bootstrap === 'undefined') return;
 
     const style = document.createElement('style');
@@ -411,7 +444,7 @@ function setBtnFeedback(btn, state, msg) {
                 return;
             }
             setBtnFeedback(btn, 'success', '저장됨');
-            setTimeout(() => { editContactModal.hide(); refreshContacts(); }, 600);
+            setTimeout(() => { editContactModal.hide(); refreshContacts(); loadDashboardWidget('contacts'); }, 600);
         } catch (e) {
             setBtnFeedback(btn, 'error', '오류');
         }
@@ -560,6 +593,18 @@ function setBtnFeedback(btn, state, msg) {
     bindQuickRows(contactQuickRows, 'contactId', openContactEdit);
     bindQuickRows(entityQuickRows, 'entityId', openEntityEdit);
 
+    // Re-bind when a widget is reloaded (retry or refresh after a save)
+    document.addEventListener('dashboard:widget-loaded', (event) => {
+        const {name, slots} = event.detail;
+        if (name === 'contacts') {
+            indexContacts(_ld.contactSeed);
+            slots.forEach((el) => bindQuickRows(el.querySelectorAll('.quickview-contact-row'), 'contactId', openContactEdit));
+        } else if (name === 'entities') {
+            indexEntities(_ld.entitySeed);
+            slots.forEach((el) => bindQuickRows(el.querySelectorAll('.quickview-entity-row'), 'entityId', openEntityEdit));
+        }
+    });
+
     editContactModalEl.addEventListener('hidden.bs.modal', () => {
         const params = new URLSearchParams(window.location.search);
         if (params.get('modal') === 'contact') updateUrlState(null, null, 'replace');
@@ -746,7 +791,7 @@ document.getElementById('saveComplimentBtn').addEventListener('click', async fun
             bootstrap.Modal.getInstance(document.getElementById('addComplimentModal')).hide();
             document.getElementById('complimentRecipient').value = '';
             document.getElementById('complimentContent').value = '';
-            location.reload();
+            loadDashboardWidget('compliments');
         } else {
             const err = await res.json();
             alert(err.error || '저장 실패');
@@ -0,0 +1,209 @@
+"""TMDB lookups for the screens pages, with persistent caching.
+
+TMDB ids, titles, years and posters effectively never change, so:
+    search results   — shared_cache "tmdb.search", keyed by endpoint, language
+                       and normalized query, for SEARCH_CACHE_TTL (new releases
+                       do show up in searches, so not forever).
+    id -> metadata   — TmdbTitle rows, recorded from every fresh search and
+                       detail fetch; details() reads them before the API.
+
+enrich_many() looks up a chat reply's recommendations concurrently. As in
+insights.run_sync, the worker threads only touch the network and the cache;
+the TmdbTitle rows are written from the calling thread afterwards.
+"""
+
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests as http_requests
+from sqlalchemy.exc import IntegrityError
+
+from cache import shared_cache
+from models import TmdbTitle, db
+
+logger = logging.getLogger(__name__)
+
+TMDB_BASE_URL = "https://api.themoviedb.org/3"
+TMDB_IMAGE_BASE = "https://image.tmdb.org/t/p/w500"
+SEARCH_CACHE_TTL = 24 * 3600
+ENRICH_CONCURRENCY = 5
+LANGUAGE = "ko-KR"
+
+_RECORD_FIELDS = ("title", "original_title", "year", "overview", "tmdb_rating", "poster_url")
+
+
+def api_key():
+    return os.environ.get("TMDB_API_KEY", "")
+
+
+def params(extra=None):
+    result = {"api_key": api_key()}
+    if extra:
+        result.update(extra)
+    return result
+
+
+def poster_url(poster_path):
+    if poster_path:
+        return f"{TMDB_IMAGE_BASE}{poster_path}"
+    return ""
+
+
+def _record(item, media_type):
+    """Normalize a TMDB movie/tv result or detail payload."""
+    if media_type == "movie":
+        title = item.get("title") or item.get("original_title", "")
+        original_title = item.get("original_title", "")
+        year_str = item.get("release_date", "")
+    else:
+        title = item.get("name") or item.get("original_name", "")
+        original_title = item.get("original_name", "")
+        year_str = item.get("first_air_date", "")
+    return {
+        "tmdb_id": item.get("id"),
+        "title": title,
+        "original_title": original_title,
+        "media_type": media_type,
+        "year": int(year_str[:4]) if year_str and year_str[:4].isdigit() else 0,
+        "overview": item.get("overview", ""),
+        "tmdb_rating": item.get("vote_average", 0.0),
+        "poster_url": poster_url(item.get("poster_path", "")),
+    }
+
+
+def _fetch_search(kind, query):
+    r = http_requests.get(
+        f"{TMDB_BASE_URL}/search/{kind}",
+        params=params({"query": query, "language": LANGUAGE, "include_adult": False}),
+        headers={"accept": "application/json"},
+        timeout=10,
+    )
+    r.raise_for_status()
+    records = []
+    for item in r.json().get("results", []):
+        media_type = item.get("media_type", kind)
+        if media_type in ("movie", "tv"):
+            records.append(_record(item, media_type))
+    return records
+
+
+def _search(query, media_type):
+    """(records, fetched) — fetched is True when this call hit the API. Raises on API errors."""
+    kind = media_type if media_type in ("movie", "tv") else "multi"
+    fetched = []
+
+    def load():
+        fetched.append(True)
+        return _fetch_search(kind, query)
+
+    key = f"{kind}:{LANGUAGE}:{' '.join(query.lower().split())}"
+    records = shared_cache.get_or_set("tmdb.search", load, SEARCH_CACHE_TTL, key=key)
+    return records, bool(fetched)
+
+
+def search(query, media_type="all"):
+    """Search results as normalized records (media_type movie | tv | all). Raises on API errors."""
+    records, fetched = _search(query, media_type)
+    if fetched:
+        remember(records)
+    return records
+
+
+def remember(records):
+    """Record search/detail results in TmdbTitle, newest data winning. Commits."""
+    keys = {(r["media_type"], r["tmdb_id"]) for r in records if r.get("tmdb_id")}
+    if not keys:
+        return
+    existing = {
+        (row.media_type, row.tmdb_id): row
+        for row in TmdbTitle.query.filter(TmdbTitle.tmdb_id.in_({k[1] for k in keys}))
+    }
+    now = datetime.utcnow()
+    for r in records:
+        key = (r["media_type"], r.get("tmdb_id"))
+        if key not in keys:
+            continue
+        keys.discard(key)
+        row = existing.get(key)
+        if row is None:
+            row = TmdbTitle(media_type=key[0], tmdb_id=key[1])
+            db.session.add(row)
+        for field in _RECORD_FIELDS:
+            setattr(row, field, r[field])
+        row.fetched_at = now
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Another worker recorded the same title first — its copy is as good
+        db.session.rollback()
+
+
+def details(media_type, tmdb_id):
+    """Normalized record for a TMDB id, from TmdbTitle or the API. None on failure."""
+    media_type = "movie" if media_type == "movie" else "tv"
+    row = TmdbTitle.query.filter_by(media_type=media_type, tmdb_id=tmdb_id).first()
+    if row is not None:
+        record = {field: getattr(row, field) for field in _RECORD_FIELDS}
+        return dict(record, tmdb_id=row.tmdb_id, media_type=media_type)
+    if not api_key():
+        return None
+    try:
+        r = http_requests.get(
+            f"{TMDB_BASE_URL}/{media_type}/{tmdb_id}",
+            params=params({"language": LANGUAGE}),
+            headers={"accept": "application/json"},
+            timeout=5,
+        )
+        if not r.ok:
+            return None
+        record = _record(r.json(), media_type)
+    except Exception as e:
+        logger.warning("TMDB detail fetch failed for %s/%s: %s", media_type, tmdb_id, e)
+        return None
+    remember([record])
+    return record
+
+
+def _enrich_fields(record):
+    return {
+        "tmdb_id": record["tmdb_id"],
+        "tmdb_title": record["title"],
+        "year": record["year"] or None,
+        "poster_url": record["poster_url"],
+    }
+
+
+def _top_hit(title, media_type):
+    """Worker: (first search record or None, fetched). Network/cache only, no DB access."""
+    try:
+        records, fetched = _search(title, "movie" if media_type == "movie" else "tv")
+    except Exception as e:
+        logger.warning("TMDB search failed for %r: %s", title, e)
+        return None, False
+    return (records[0] if records else None), fetched
+
+
+def enrich_many(items):
+    """{tmdb_id, tmdb_title, year, poster_url} for each (title, media_type), {} when not found.
+
+    Distinct titles are looked up concurrently (up to ENRICH_CONCURRENCY).
+    """
+    if not api_key() or not items:
+        return [{} for _ in items]
+    keys = list(dict.fromkeys((title, media_type) for title, media_type in items if title))
+    if len(keys) <= 1:
+        hits = [_top_hit(*key) for key in keys]
+    else:
+        with ThreadPoolExecutor(max_workers=min(ENRICH_CONCURRENCY, len(keys))) as executor:
+            hits = list(executor.map(lambda key: _top_hit(*key), keys))
+
+    remember([record for record, fetched in hits if record and fetched])
+    found = {key: _enrich_fields(record) for key, (record, _) in zip(keys, hits) if record}
+    return [dict(found.get((title, media_type), {})) for title, media_type in items]
+
+
+def enrich(title, media_type="movie"):
+    """Search TMDB for title and return {tmdb_id, tmdb_title, year, poster_url}. Returns {} on failure."""
+    return enrich_many([(title, media_type)])[0]